@@ -76,6 +76,11 @@ class AgentConfig:
     
     # Common settings
     timeout_seconds: int = 300
+    idle_timeout_seconds: int = 0  # Kill an agent silent this long as hung (0 = off; --print agents are silent until done)
+    adaptive_timeout: bool = True  # Use p99 of past runs x margin once known
+    retry_attempts: int = 2  # Retries of a throttled run (429, 529, "rate limit")
+    requests_per_minute: int = 0  # Shared by all parallel workers (0 = unlimited)
+    tokens_per_minute: int = 0  # Estimated prompt tokens, shared likewise (0 = unlimited)
     max_tokens: int = 4096
     temperature: float = 0.0
 
@@ -132,6 +137,11 @@ class GlobalConfig:
                 "api_key": self.agent.api_key,
                 "base_url": self.agent.base_url,
                 "timeout_seconds": self.agent.timeout_seconds,
+                "idle_timeout_seconds": self.agent.idle_timeout_seconds,
+                "adaptive_timeout": self.agent.adaptive_timeout,
+                "retry_attempts": self.agent.retry_attempts,
+                "requests_per_minute": self.agent.requests_per_minute,
+                "tokens_per_minute": self.agent.tokens_per_minute,
                 "max_tokens": self.agent.max_tokens,
                 "temperature": self.agent.temperature,
             },
@@ -154,6 +164,11 @@ class GlobalConfig:
                 api_key=agent_data.get("api_key"),
                 base_url=agent_data.get("base_url"),
                 timeout_seconds=agent_data.get("timeout_seconds", 300),
+                idle_timeout_seconds=agent_data.get("idle_timeout_seconds", 0),
+                adaptive_timeout=agent_data.get("adaptive_timeout", True),
+                retry_attempts=agent_data.get("retry_attempts", 2),
+                requests_per_minute=agent_data.get("requests_per_minute", 0),
+                tokens_per_minute=agent_data.get("tokens_per_minute", 0),
                 max_tokens=agent_data.get("max_tokens", 4096),
                 temperature=agent_data.get("temperature", 0.0),
             ),
@@ -14,8 +14,10 @@ import json
 import subprocess
 import shutil
 import glob
+import functools
+import time
 from pathlib import Path
-from typing import Optional, Tuple, List
+from typing import Iterator, Optional, Tuple, List
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -25,8 +27,14 @@ from rich.panel import Panel
 from rich.prompt import Confirm
 from rich.table import Table
 from rich.box import ROUNDED
+from rich.markup import escape
 
 from darkzloop.cli.detection import detect_configuration, ProjectConfig
+from darkzloop.cli.config import load_config
+from darkzloop.core.supervisor import run_supervised, is_hung_error
+from darkzloop.core.latency import AdaptiveTimeouts, AGENT_TIMEOUT_LIMITS, GATE_TIMEOUT_LIMITS
+from darkzloop.core.rate_limit import THROTTLED_OUTPUT, get_rate_limiter, estimate_tokens, backoff_delay
+from darkzloop.core.executors.streaming import LineStream
 
 app = typer.Typer(
     name="darkzloop",
@@ -137,6 +145,12 @@ def render_context_reminder(state: str, iteration: int, fails: int, tasks_done:
 # Agent Execution
 # =============================================================================
 
+@functools.lru_cache(maxsize=None)
+def get_latency_history() -> AdaptiveTimeouts:
+    """Agent and gate latencies for this project (.darkzloop/latency.json)."""
+    return AdaptiveTimeouts(Path.cwd())
+
+
 def run_agent(cmd: str, args: List[str], prompt: str, cwd: Path) -> Tuple[bool, str]:
     """Execute the agent command with prompt via stdin to avoid shell escaping issues."""
     try:
@@ -147,53 +161,272 @@ def run_agent(cmd: str, args: List[str], prompt: str, cwd: Path) -> Tuple[bool,
         if not cmd_path:
             return False, f"Command not found: {cmd}"
         
-        # Use Rich spinner to show activity while Claude processes
-        with console.status("[bold cyan]🔄 Darkz Looping...[/bold cyan]", spinner="dots") as status:
-            # Pass prompt via stdin to bypass shell escaping entirely
-            # Claude with --print mode reads from stdin when no prompt arg is given
-            result = subprocess.run(
-                [cmd_path] + args,
-                input=prompt,  # Prompt goes to stdin - no escaping needed
-                cwd=cwd,
-                capture_output=True,
-                text=True,
-                timeout=300,
-                encoding='utf-8',
-                errors='replace'
+        agent_config = load_config().agent
+        latency_key = f"agent:{Path(cmd).stem}"
+        timeout = agent_config.timeout_seconds
+        if agent_config.adaptive_timeout:
+            timeout = get_latency_history().timeout(latency_key, timeout, *AGENT_TIMEOUT_LIMITS)
+        
+        # Parallel workers share one limiter per tool, so together they stay
+        # under the account's rate limits instead of failing files with 429s
+        limiter = None
+        if agent_config.requests_per_minute or agent_config.tokens_per_minute:
+            limiter = get_rate_limiter(
+                f"shell/{cmd}", agent_config.requests_per_minute, agent_config.tokens_per_minute
+            )
+        estimate = estimate_tokens(prompt)
+        
+        for attempt in range(agent_config.retry_attempts + 1):
+            queued = limiter.acquire(estimate) if limiter else 0.0
+            
+            # Use Rich spinner to show activity while Claude processes
+            with console.status("[bold cyan]🔄 Darkz Looping...[/bold cyan]", spinner="dots") as status:
+                # The spinner shows the agent's latest line of output, live
+                progress = LineStream(
+                    on_line=lambda line: status.update(f"[bold cyan]🔄 {escape(line.strip()[:80])}[/bold cyan]"),
+                    limit=0,  # display only; run_supervised keeps the output
+                )
+                # Pass prompt via stdin to bypass shell escaping entirely
+                # Claude with --print mode reads from stdin when no prompt arg is given
+                # The supervisor kills the agent's whole process tree on timeout,
+                # or once it has printed nothing for idle_timeout_seconds (hung)
+                result = run_supervised(
+                    [cmd_path] + args,
+                    timeout=timeout,
+                    idle_timeout=agent_config.idle_timeout_seconds or None,
+                    cwd=cwd,
+                    input=prompt.encode('utf-8'),  # Prompt goes to stdin - no escaping needed
+                    stdout_limit=200_000,
+                    stderr_limit=20_000,
+                    on_stdout=progress.feed,
+                )
+            queued_note = f", queued {queued:.1f}s" if queued else ""
+            console.print(f"[dim]  Agent: {result.usage_summary()}{queued_note}[/dim]")
+            if agent_config.adaptive_timeout:
+                get_latency_history().record_result(latency_key, result)
+            
+            throttled = (
+                not result.error and not result.success
+                and THROTTLED_OUTPUT.search(result.stderr or "")
             )
+            if not throttled or attempt >= agent_config.retry_attempts:
+                break
+            delay = backoff_delay(attempt)
+            console.print(f"[yellow]  Agent throttled, retrying in {delay:.1f}s[/yellow]")
+            time.sleep(delay)
+        
+        if result.error:
+            # stderr starts with the error (timed out, hung, ...)
+            return False, result.stderr + result.stdout
         
         # Combine stdout and stderr for complete output
         output = result.stdout + result.stderr
         
-        return result.returncode == 0, output
-    except subprocess.TimeoutExpired:
-        return False, "Timeout after 300s"
-    except FileNotFoundError as e:
-        return False, f"Command not found: {e}"
+        return result.success, output
     except Exception as e:
         return False, str(e)
 
 
 def run_gate(cmd: str, cwd: Path) -> Tuple[bool, str]:
-    """Run a quality gate command."""
+    """
+    Run a quality gate command (its whole process tree is killed on timeout).
+    
+    The timeout is 120s until the gate has a latency history, then its
+    p99 x margin.
+    """
     try:
-        result = subprocess.run(
-            cmd, shell=True, cwd=cwd, 
-            capture_output=True, text=True, timeout=120,
-            encoding='utf-8', errors='replace'  # UTF-8 for consistent encoding
-        )
-        return result.returncode == 0, result.stdout or result.stderr
+        history = get_latency_history()
+        timeout = history.timeout(f"gate:{cmd}", 120, *GATE_TIMEOUT_LIMITS)
+        result = run_supervised(cmd, timeout=timeout, cwd=cwd)
+        history.record_result(f"gate:{cmd}", result)
+        console.print(f"[dim]  {cmd}: {result.usage_summary()}[/dim]")
+        return result.success, result.stdout or result.stderr
     except Exception as e:
         return False, str(e)
 
 
+def run_agent_isolated(
+    pool,
+    cmd: str,
+    args: List[str],
+    prompt: str,
+    gates: List[str] = None
+) -> Tuple[bool, str]:
+    """
+    Run the agent in a pooled git worktree, gate it there, then merge back.
+    
+    Changes only reach the main tree if the agent and its gates succeed
+    and the patch applies cleanly on top of already-merged work.
+    """
+    with pool.checkout() as worktree:
+        cwd = pool.project_dir(worktree)
+        success, output = run_agent(cmd, args, prompt, cwd)
+        if not success:
+            return False, output
+        
+        for gate in gates or []:
+            passed, gate_output = run_gate(gate, cwd)
+            if not passed:
+                return False, f"Gate failed: {gate}\n{gate_output}"
+        
+        merge = pool.merge_back(worktree)
+        if not merge.success:
+            return False, merge.error
+        return True, output
+
+
+def create_worktree_pool_or_exit(size: int):
+    """Create a worktree pool for --isolate, exiting with a message on failure."""
+    from darkzloop.core.worktree import WorktreePool, WorktreeError
+    
+    try:
+        return WorktreePool(Path.cwd(), max_size=size)
+    except WorktreeError as e:
+        console.print(f"[red]❌ Worktree isolation unavailable: {e}[/red]")
+        raise typer.Exit(1)
+
+
+def run_workers(
+    files: List[str],
+    task: str,
+    workers: int,
+    backend_cmd: str,
+    backend_args: List[str],
+    pool=None,
+    gates: List[str] = None
+) -> Iterator[Tuple[str, bool, str]]:
+    """
+    Run the agent on each file in a thread pool; yields (filepath, success, output).
+    
+    With a worktree pool, each file's changes are merged back only after
+    the gates pass in its worktree.
+    """
+    cwd = Path.cwd()
+    
+    def process_file(filepath: str) -> Tuple[str, bool, str]:
+        """Process a single file - runs in a thread."""
+        try:
+            prompt = f"""Fix this file: {filepath}
+Task: {task}
+Make targeted fixes. Be concise."""
+            
+            if pool:
+                success, output = run_agent_isolated(pool, backend_cmd, backend_args, prompt, gates)
+            else:
+                success, output = run_agent(backend_cmd, backend_args, prompt, cwd)
+            return filepath, success, output[:200] if output else ""
+        except Exception as e:
+            return filepath, False, str(e)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_file, f): f for f in files}
+        
+        for future in as_completed(futures):
+            yield future.result()
+
+
+# =============================================================================
+# Provider Batch API
+# =============================================================================
+
+BATCH_API_PROMPT = """Task: {task}
+File: {path}
+
+```
+{content}
+```
+
+Respond with only a JSON action. To change the file, send its complete new content:
+{{"action": "write_file", "parameters": {{"path": "{path}", "content": "..."}}}}
+If the file needs no change:
+{{"action": "no_op", "reason": "..."}}"""
+
+
+def create_batch_executor():
+    """An API executor for the configured provider and model (agent settings)."""
+    from darkzloop.core.executors import ExecutorConfig, ExecutorType
+    from darkzloop.core.executors.api import APIExecutor
+    
+    agent = load_config().agent
+    return APIExecutor(ExecutorConfig(
+        type=ExecutorType.API,
+        provider=agent.provider,
+        model=agent.model,
+        api_key=agent.api_key,
+        base_url=agent.base_url,
+        max_tokens=agent.max_tokens,
+        temperature=agent.temperature,
+    ))
+
+
+def run_batch_api(
+    executor,
+    files: List[str],
+    task: str,
+    chunk_size: int,
+    poll_interval: float
+) -> Iterator[Tuple[str, bool, str]]:
+    """
+    Send one prompt per file as provider batch jobs.
+    
+    Yields (filepath, success, output) as each job's results land, after
+    applying the file's edit.
+    """
+    from darkzloop.core.executors.batch import BatchRequest, run_batches
+    
+    paths = {}
+    requests = []
+    for i, filepath in enumerate(files):
+        try:
+            content = Path(filepath).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError) as e:
+            yield filepath, False, f"Not a text file: {e}"
+            continue
+        custom_id = f"file-{i}"
+        paths[custom_id] = filepath
+        prompt = BATCH_API_PROMPT.format(task=task, path=filepath, content=content)
+        requests.append(BatchRequest(custom_id, prompt))
+    
+    for custom_id, response in run_batches(executor, requests, chunk_size, poll_interval):
+        filepath = paths[custom_id]
+        success, output = apply_batch_result(filepath, response)
+        yield filepath, success, output
+
+
+def apply_batch_result(filepath: str, response) -> Tuple[bool, str]:
+    """Apply a batch response's write_file action to filepath (and only to it)."""
+    if not response.success:
+        return False, response.error or "Batch request failed"
+    
+    action = response.get_action() or {}
+    name = action.get("action")
+    if name == "no_op":
+        return True, action.get("reason", "No change")
+    
+    params = action.get("parameters") or {}
+    if name != "write_file" or not isinstance(params.get("content"), str):
+        return False, f"Unexpected response: {response.content[:200]}"
+    if os.path.normpath(params.get("path", filepath)) != os.path.normpath(filepath):
+        return False, f"Refused write_file for another path: {params.get('path')}"
+    
+    # Write-then-rename, so an interrupted sweep never leaves half a file
+    import tempfile
+    target = Path(filepath)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(params["content"])
+    shutil.copymode(target, tmp)
+    os.replace(tmp, target)
+    return True, "Edited"
+
+
 # =============================================================================
 # Main Loop
 # =============================================================================
 
 def run_loop(task: str, backend: str, backend_args: List[str], config: ProjectConfig) -> bool:
     """Execute the FSM loop."""
-    from darkzloop.core.fsm import FSMContext, LoopState
+    from darkzloop.core.fsm import FSMContext, LoopState, FailureKind
     
     cwd = Path.cwd()
     fsm = FSMContext(max_iterations=10, max_consecutive_failures=3)
@@ -250,7 +483,8 @@ Iteration {iteration} of 10. Previous failures: {fsm.consecutive_failures}
             
             if not success:
                 console.print(f"[red dim]Agent error: {output[:300] if output else '(no output)'}[/red dim]")
-                fsm.fail_task(f"Agent error: {output[:100]}")
+                kind = FailureKind.AGENT_HUNG if is_hung_error(output) else FailureKind.AGENT_ERROR
+                fsm.fail_task(f"Agent error: {output[:100]}", kind=kind)
                 render_context_reminder("failed", iteration, fsm.consecutive_failures)
                 continue
             
@@ -274,7 +508,7 @@ Iteration {iteration} of 10. Previous failures: {fsm.consecutive_failures}
                 console.print(f"  [green]✓ {gate}[/green]")
             
             if not gates_passed:
-                fsm.fail_task("Gate failed")
+                fsm.fail_task("Gate failed", kind=FailureKind.GATE_FAILED)
                 continue
             
             # CRITIQUE -> CHECKPOINT
@@ -304,8 +538,14 @@ def execute_task(
     unattended: bool = False,
     no_gates: bool = False,
     workers: int = 1,
+    isolate: bool = False,
 ):
-    """Execute a task. If workers > 1, uses parallel batch processing."""
+    """
+    Execute a task. If workers > 1, uses parallel batch processing.
+    
+    With isolate, each parallel worker edits its own git worktree and its
+    changes are merged back only after the Tier 1 gates pass there.
+    """
     # Auto-detect project
     config = detect_configuration()
     
@@ -375,16 +615,8 @@ def execute_task(
         else:
             console.print(f"[bold]⚡ Parallel Mode: {len(files)} files with {workers} workers[/bold]\n")
             
-            cwd = Path.cwd()
             results = {"success": 0, "failed": 0}
-            
-            def process_file(filepath: str) -> Tuple[str, bool, str]:
-                try:
-                    prompt = f"Fix this file: {filepath}\nTask: {task}\nMake targeted fixes."
-                    success, output = run_agent(backend_cmd, backend_args, prompt, cwd)
-                    return filepath, success, output[:100] if output else ""
-                except Exception as e:
-                    return filepath, False, str(e)
+            pool = create_worktree_pool_or_exit(workers) if isolate else None
             
             with Progress(
                 SpinnerColumn(),
@@ -395,21 +627,20 @@ def execute_task(
             ) as progress:
                 task_id = progress.add_task("[cyan]Darkz Looping...", total=len(files))
                 
-                with ThreadPoolExecutor(max_workers=workers) as executor:
-                    futures = {executor.submit(process_file, f): f for f in files}
+                outcomes = run_workers(
+                    files, task, workers, backend_cmd, backend_args, pool, config.tier1_gates
+                )
+                for filepath, ok, _ in outcomes:
+                    filename = os.path.basename(filepath)
                     
-                    for future in as_completed(futures):
-                        filepath, ok, _ = future.result()
-                        filename = os.path.basename(filepath)
-                        
-                        if ok:
-                            results["success"] += 1
-                            progress.console.print(f"  [green]✓[/green] {filename}")
-                        else:
-                            results["failed"] += 1
-                            progress.console.print(f"  [red]✗[/red] {filename}")
-                        
-                        progress.advance(task_id)
+                    if ok:
+                        results["success"] += 1
+                        progress.console.print(f"  [green]✓[/green] {filename}")
+                    else:
+                        results["failed"] += 1
+                        progress.console.print(f"  [red]✗[/red] {filename}")
+                    
+                    progress.advance(task_id)
             
             console.print(f"\n[bold]Results:[/bold]")
             console.print(f"  [green]✓ Success:[/green] {results['success']}")
@@ -516,9 +747,10 @@ def run_cmd(
     unattended: bool = typer.Option(False, "--unattended", "-y", help="Skip prompts"),
     no_gates: bool = typer.Option(False, "--no-gates", help="Skip quality gates"),
     workers: int = typer.Option(1, "--workers", "-w", help="Parallel workers (auto-detects files)"),
+    isolate: bool = typer.Option(False, "--isolate", help="Give each parallel worker its own git worktree"),
 ):
     """🚀 Run a task."""
-    execute_task(task, backend, unattended, no_gates, workers)
+    execute_task(task, backend, unattended, no_gates, workers, isolate)
 
 
 @app.command("doctor")
@@ -555,12 +787,26 @@ def doctor():
 def batch_cmd(
     path: str = typer.Argument(..., help="File or directory to process"),
     task: str = typer.Option("Fix all security vulnerabilities", "--task", "-t", help="Task to apply to each file"),
-    workers: int = typer.Option(4, "--workers", "-w", help="Number of parallel workers"),
+    workers: int = typer.Option(4, "--workers", "-w", help="Number of parallel workers (not used with --batch-api)"),
     backend: Optional[str] = typer.Option(None, "--backend", "-b", help="LLM backend"),
+    isolate: bool = typer.Option(False, "--isolate", help="Give each worker its own git worktree; changes merge back once Tier 1 gates pass"),
+    batch_api: bool = typer.Option(False, "--batch-api", help="Send files as provider batch jobs (API key required); edits go straight to the working tree"),
+    chunk: int = typer.Option(1000, "--chunk", help="Files per batch job (--batch-api)"),
+    poll: float = typer.Option(30.0, "--poll", help="Seconds between batch status polls (--batch-api)"),
 ):
-    """⚡ Batch process files in parallel with multiple Ralph workers."""
+    """
+    ⚡ Batch process files in parallel with multiple Ralph workers.
+    
+    With --batch-api, per-file prompts go to the configured provider's
+    batch API instead (cheaper, not interactive); each file's edit is
+    applied as its job's results land.
+    """
     from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
     
+    if batch_api and isolate:
+        # Batch results are written into the main tree; there is no worktree to gate
+        raise typer.BadParameter("--isolate cannot be combined with --batch-api", param_hint="'--isolate'")
+    
     # Find files
     if os.path.isdir(path):
         files = [f for f in glob.glob(f"{path}/**/*", recursive=True) if os.path.isfile(f)]
@@ -574,35 +820,35 @@ def batch_cmd(
         console.print("[yellow]No files found[/yellow]")
         raise typer.Exit(0)
     
-    console.print(f"\n[bold]⚡ Batch Processing: {len(files)} files with {workers} workers[/bold]\n")
-    
-    # Detect backend
-    if backend:
-        backend_cmd = backend
-        backend_args = get_backend_args(backend)
-    else:
-        backend_cmd, backend_args = detect_backend()
-    
-    if not backend_cmd:
-        console.print("[red]No LLM backend found[/red]")
-        raise typer.Exit(1)
-    
-    cwd = Path.cwd()
     results = {"success": 0, "failed": 0, "errors": []}
     
-    def process_file(filepath: str) -> Tuple[str, bool, str]:
-        """Process a single file - runs in a thread."""
-        try:
-            prompt = f"""Fix this file: {filepath}
-Task: {task}
-Make targeted fixes. Be concise."""
-            
-            success, output = run_agent(backend_cmd, backend_args, prompt, cwd)
-            return filepath, success, output[:200] if output else ""
-        except Exception as e:
-            return filepath, False, str(e)
+    if batch_api:
+        console.print(f"\n[bold]⚡ Batch API: {len(files)} files in jobs of {chunk}[/bold]\n")
+        executor = create_batch_executor()
+        available, message = executor.is_available()
+        if not available:
+            console.print(f"[red]{message}[/red]")
+            raise typer.Exit(1)
+        outcomes = run_batch_api(executor, files, task, chunk, poll)
+    else:
+        console.print(f"\n[bold]⚡ Batch Processing: {len(files)} files with {workers} workers[/bold]\n")
+        
+        # Detect backend
+        if backend:
+            backend_cmd = backend
+            backend_args = get_backend_args(backend)
+        else:
+            backend_cmd, backend_args = detect_backend()
+        
+        if not backend_cmd:
+            console.print("[red]No LLM backend found[/red]")
+            raise typer.Exit(1)
+        
+        pool = create_worktree_pool_or_exit(workers) if isolate else None
+        gates = detect_configuration().tier1_gates if isolate else []
+        outcomes = run_workers(files, task, workers, backend_cmd, backend_args, pool, gates)
     
-    # Process files in parallel with progress bar
+    # Report results as they arrive, with a progress bar
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
@@ -612,11 +858,8 @@ Make targeted fixes. Be concise."""
     ) as progress:
         task_id = progress.add_task("[cyan]Processing...", total=len(files))
         
-        with ThreadPoolExecutor(max_workers=workers) as executor:
-            futures = {executor.submit(process_file, f): f for f in files}
-            
-            for future in as_completed(futures):
-                filepath, success, output = future.result()
+        try:
+            for filepath, success, output in outcomes:
                 filename = os.path.basename(filepath)
                 
                 if success:
@@ -628,6 +871,9 @@ Make targeted fixes. Be concise."""
                     progress.console.print(f"  [red]✗[/red] {filename}")
                 
                 progress.advance(task_id)
+        except Exception as e:
+            # Submitting or polling a batch job failed; report what landed
+            progress.console.print(f"[red]❌ {e}[/red]")
     
     # Summary
     console.print(f"\n[bold]Results:[/bold]")
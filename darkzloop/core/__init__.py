@@ -38,6 +38,7 @@ Components:
 from .fsm import (
     LoopState,
     FSMContext,
+    FailureKind,
     LoopController,
     InvalidTransitionError,
     create_loop,
@@ -66,6 +67,7 @@ from .context import (
     DetailedStep,
     ContextWindow,
     ContextManager,
+    PromptParts,
     create_iteration_summary,
     extract_relevant_spec_sections,
 )
@@ -84,8 +86,10 @@ from .dag import (
     NodeStatus,
     DAGNode,
     DAGExecutionResult,
+    DurationHistory,
     DAGExecutor,
     parse_plan_to_dag,
+    CommandResult,
     run_shell_command_async,
     run_shell_command_sync,
 )
@@ -112,10 +116,63 @@ from .locks import (
     FileLock,
     TaskFileClaims,
     FileLockManager,
+    TreeGuard,
     FileAwareDAGScheduler,
     create_file_aware_scheduler,
 )
 
+from .worktree import (
+    WorktreeError,
+    MergeResult,
+    WorktreePool,
+    create_worktree_pool,
+)
+
+from .journal import (
+    TaskJournal,
+)
+
+from .gate_cache import (
+    GateCache,
+)
+
+from .response_cache import (
+    ResponseCache,
+)
+
+from .rate_limit import (
+    RateLimiter,
+    get_rate_limiter,
+)
+
+from .output import (
+    OutputBuffer,
+    open_spool,
+)
+
+from .latency import (
+    LatencyHistogram,
+    AdaptiveTimeouts,
+)
+
+from .supervisor import (
+    ProcessResult,
+    SupervisedProcess,
+    AsyncSupervisedProcess,
+    run_supervised,
+    run_supervised_async,
+    kill_process_tree,
+    is_hung_error,
+)
+
+from .impact import (
+    ImpactSelection,
+    ImpactAnalyzer,
+    changed_files,
+    scope_to_files,
+    full_command,
+)
+
 from .visualize import (
     TaskState,
     TaskNode,
@@ -144,6 +201,7 @@ __all__ = [
     # FSM
     "LoopState",
     "FSMContext", 
+    "FailureKind",
     "LoopController",
     "InvalidTransitionError",
     "create_loop",
@@ -170,6 +228,7 @@ __all__ = [
     "DetailedStep",
     "ContextWindow",
     "ContextManager",
+    "PromptParts",
     "create_iteration_summary",
     "extract_relevant_spec_sections",
     
@@ -186,8 +245,10 @@ __all__ = [
     "NodeStatus",
     "DAGNode",
     "DAGExecutionResult",
+    "DurationHistory",
     "DAGExecutor",
     "parse_plan_to_dag",
+    "CommandResult",
     "run_shell_command_async",
     "run_shell_command_sync",
     
@@ -211,9 +272,51 @@ __all__ = [
     "FileLock",
     "TaskFileClaims",
     "FileLockManager",
+    "TreeGuard",
     "FileAwareDAGScheduler",
     "create_file_aware_scheduler",
     
+    # Worktree isolation (concurrent agents)
+    "WorktreeError",
+    "MergeResult",
+    "WorktreePool",
+    "create_worktree_pool",
+    
+    # Task journal (resumable runs)
+    "TaskJournal",
+    
+    # Gate result cache
+    "GateCache",
+    "ResponseCache",
+    
+    # Shared provider rate limits
+    "RateLimiter",
+    "get_rate_limiter",
+    
+    # Bounded command output
+    "OutputBuffer",
+    "open_spool",
+    
+    # Adaptive timeouts
+    "LatencyHistogram",
+    "AdaptiveTimeouts",
+    
+    # Subprocess supervision
+    "ProcessResult",
+    "SupervisedProcess",
+    "AsyncSupervisedProcess",
+    "run_supervised",
+    "run_supervised_async",
+    "kill_process_tree",
+    "is_hung_error",
+    
+    # Change-impact test selection
+    "ImpactSelection",
+    "ImpactAnalyzer",
+    "changed_files",
+    "scope_to_files",
+    "full_command",
+    
     # Visualization (dual-mode)
     "TaskState",
     "TaskNode",
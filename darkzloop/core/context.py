@@ -8,6 +8,8 @@ Strategies:
 1. Summarization Gate: Compress old iterations into summaries
 2. Rolling Window: Keep only N recent detailed steps
 3. Mermaid as Memory: Use the graph topology as compressed state
+4. Stable Prefix: Goal and spec lead the context, unchanged between
+   iterations, so providers can serve them from their prompt cache
 """
 
 from dataclasses import dataclass, field
@@ -16,6 +18,31 @@ from datetime import datetime
 import json
 
 
+@dataclass
+class PromptParts:
+    """
+    A prompt split at its cache boundary.
+    
+    The prefix is identical from one iteration to the next (instructions,
+    gates, goal, spec); the suffix holds everything that changes. Keeping
+    the prefix first lets providers cache it and bill it at a discount.
+    """
+    prefix: str = ""
+    suffix: str = ""
+    
+    @property
+    def text(self) -> str:
+        """The whole prompt."""
+        return "\n\n".join(p for p in (self.prefix, self.suffix) if p)
+    
+    def __add__(self, other: "PromptParts") -> "PromptParts":
+        """Prefixes join prefixes and suffixes join suffixes."""
+        return PromptParts(
+            prefix="\n\n".join(p for p in (self.prefix, other.prefix) if p),
+            suffix="\n\n".join(s for s in (self.suffix, other.suffix) if s),
+        )
+
+
 @dataclass
 class IterationSummary:
     """Compressed summary of a completed iteration."""
@@ -119,6 +146,14 @@ class ContextWindow:
         Build the complete context string for the agent.
         This is what gets sent to the LLM.
         """
+        return self.build_parts().text
+    
+    def build_parts(self) -> PromptParts:
+        """Build the context split into its stable prefix and volatile suffix."""
+        return PromptParts(prefix=self._build_prefix(), suffix=self._build_suffix())
+    
+    def _build_prefix(self) -> str:
+        """Sections that only change when the goal does."""
         sections = []
         
         # Goal anchor (always present)
@@ -128,6 +163,12 @@ class ContextWindow:
         if self.spec_excerpt:
             sections.append(f"=== SPEC (relevant) ===\n{self.spec_excerpt}")
         
+        return "\n\n".join(sections)
+    
+    def _build_suffix(self) -> str:
+        """Sections that change every iteration."""
+        sections = []
+        
         # FSM state (minimal)
         sections.append(f"=== STATE ===\n{self.fsm_compact}")
         
@@ -229,9 +270,13 @@ class ContextManager:
     
     def get_context_for_agent(self, fsm_compact: str, current_task_json: str) -> str:
         """Build and return the context string for the agent."""
+        return self.get_context_parts(fsm_compact, current_task_json).text
+    
+    def get_context_parts(self, fsm_compact: str, current_task_json: str) -> PromptParts:
+        """Like get_context_for_agent, split into stable prefix and volatile suffix."""
         self.window.update_fsm(fsm_compact)
         self.window.set_current_task(current_task_json)
-        return self.window.build_context()
+        return self.window.build_parts()
     
     def update_mermaid(self, mermaid: str):
         """
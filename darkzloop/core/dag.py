@@ -9,13 +9,23 @@ Uses Mermaid to visualize the DAG and detect parallel branches.
 """
 
 from dataclasses import dataclass, field
-from typing import List, Dict, Set, Optional, Callable, Any
+from typing import List, Dict, Set, Optional, Callable, Any, Iterable, Union
 from enum import Enum
+from pathlib import Path
 import asyncio
+import heapq
+import io
+import json
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import re
 
+from .supervisor import ProcessResult, run_supervised, run_supervised_async
+
+
+# DFS colors for find_cycle: unvisited, on the current path, finished
+_WHITE, _GREY, _BLACK = 0, 1, 2
+
 
 class NodeStatus(Enum):
     """Execution status of a DAG node."""
@@ -54,6 +64,49 @@ class DAGExecutionResult:
     parallel_groups: List[List[str]]  # How tasks were grouped
 
 
+class DurationHistory:
+    """
+    Per-task duration samples, persisted to .darkzloop/durations.json.
+    
+    Used to estimate how long each task will take so the scheduler can
+    start tasks on the critical path first.
+    """
+    
+    def __init__(self, project_root: Path = None, max_samples: int = 10):
+        self.path = Path(project_root or Path.cwd()) / ".darkzloop" / "durations.json"
+        self.max_samples = max_samples
+        self.samples: Dict[str, List[int]] = {}
+        self.load()
+    
+    def load(self):
+        """Load samples from disk (missing or corrupt file means no history)."""
+        if self.path.exists():
+            try:
+                with open(self.path) as f:
+                    self.samples = {k: list(v) for k, v in json.load(f).items()}
+            except (json.JSONDecodeError, AttributeError, TypeError):
+                self.samples = {}
+    
+    def save(self):
+        """Persist samples to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(self.samples, f, indent=2)
+    
+    def record(self, task_id: str, duration_ms: int):
+        """Record a duration sample, keeping only the most recent ones."""
+        samples = self.samples.setdefault(task_id, [])
+        samples.append(int(duration_ms))
+        del samples[:-self.max_samples]
+    
+    def estimate(self, task_id: str) -> Optional[float]:
+        """Mean of recent samples, or None if the task has never run."""
+        samples = self.samples.get(task_id)
+        if not samples:
+            return None
+        return sum(samples) / len(samples)
+
+
 class DAGExecutor:
     """
     Executes a DAG of tasks with parallel execution where possible.
@@ -65,12 +118,48 @@ class DAGExecutor:
         dag.add_node("2.1", task_data, dependencies=["1.1", "1.2"])
         
         result = dag.execute(executor_fn)
+    
+    Async execution runs nodes on one long-lived worker pool of
+    max_parallel workers. Call shutdown() (or use the executor as a
+    context manager) to release it.
     """
     
-    def __init__(self, max_parallel: int = 4):
+    def __init__(self, max_parallel: int = 4, history: Optional[DurationHistory] = None):
         self.nodes: Dict[str, DAGNode] = {}
         self.max_parallel = max_parallel
         self.execution_order: List[List[str]] = []
+        self.history = history
+        self._pool: Optional[Executor] = None
+        self._pool_is_process = False
+    
+    def __enter__(self) -> "DAGExecutor":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.shutdown()
+    
+    def _get_pool(self, use_process_pool: bool) -> Executor:
+        """
+        Return the shared worker pool, creating it on first use.
+        
+        Process pools keep their workers warm across nodes and runs, so
+        processes are forked once per executor rather than once per node.
+        """
+        if self._pool is not None and self._pool_is_process != use_process_pool:
+            self.shutdown()
+        
+        if self._pool is None:
+            PoolExecutor = ProcessPoolExecutor if use_process_pool else ThreadPoolExecutor
+            self._pool = PoolExecutor(max_workers=max(1, self.max_parallel))
+            self._pool_is_process = use_process_pool
+        
+        return self._pool
+    
+    def shutdown(self, wait: bool = True):
+        """Shut down the shared worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
     
     def add_node(
         self,
@@ -86,65 +175,129 @@ class DAGExecutor:
         )
     
     def validate(self) -> tuple[bool, str]:
-        """Validate the DAG structure."""
+        """
+        Validate the DAG structure.
+        
+        Cycle detection is an iterative DFS, so arbitrarily long dependency
+        chains do not hit Python's recursion limit. A cycle is reported as
+        the path of dependencies that closes it.
+        """
         # Check all dependencies exist
         for node_id, node in self.nodes.items():
             for dep in node.dependencies:
                 if dep not in self.nodes:
                     return False, f"Node {node_id} depends on non-existent {dep}"
         
-        # Check for cycles (topological sort)
-        visited = set()
-        rec_stack = set()
+        cycle = self.find_cycle()
+        if cycle:
+            return False, f"DAG contains a cycle: {' -> '.join(cycle)}"
         
-        def has_cycle(node_id: str) -> bool:
-            visited.add(node_id)
-            rec_stack.add(node_id)
-            
-            for dep in self.nodes[node_id].dependencies:
-                if dep not in visited:
-                    if has_cycle(dep):
-                        return True
-                elif dep in rec_stack:
-                    return True
-            
-            rec_stack.remove(node_id)
-            return False
+        return True, ""
+    
+    def find_cycle(self) -> Optional[List[str]]:
+        """
+        Find a dependency cycle, if any.
         
-        for node_id in self.nodes:
-            if node_id not in visited:
-                if has_cycle(node_id):
-                    return False, "DAG contains a cycle"
+        Returns the cycle as [a, b, ..., a] where each node depends on the
+        next, or None if the graph is acyclic.
+        """
+        color = {node_id: _WHITE for node_id in self.nodes}
         
-        return True, ""
+        for root in self.nodes:
+            if color[root] != _WHITE:
+                continue
+            
+            # Stack of (node_id, iterator over its dependencies); the stack
+            # itself is the current DFS path
+            color[root] = _GREY
+            path = [root]
+            stack = [iter(self.nodes[root].dependencies)]
+            
+            while stack:
+                dep = next(stack[-1], None)
+                if dep is None:
+                    color[path.pop()] = _BLACK
+                    stack.pop()
+                    continue
+                if dep not in color:
+                    continue  # Missing deps are reported separately
+                if color[dep] == _GREY:
+                    return path[path.index(dep):] + [dep]
+                if color[dep] == _WHITE:
+                    color[dep] = _GREY
+                    path.append(dep)
+                    stack.append(iter(self.nodes[dep].dependencies))
+        
+        return None
     
     def compute_execution_order(self) -> List[List[str]]:
         """
         Compute execution order with parallel groups.
         Each inner list can be executed in parallel.
+        
+        Kahn-style levelling with indegree counts, linear in the number of
+        nodes and edges (plus sorting each group back into plan order).
+        Nodes on a cycle or depending on a missing node never become ready
+        and are left out, as before.
         """
-        completed: Set[str] = set()
+        position = {node_id: i for i, node_id in enumerate(self.nodes)}
+        indegree: Dict[str, int] = {}
+        dependents: Dict[str, List[str]] = {node_id: [] for node_id in self.nodes}
+        for node_id, node in self.nodes.items():
+            deps = set(node.dependencies)
+            indegree[node_id] = len(deps)
+            for dep in deps:
+                if dep in dependents:
+                    dependents[dep].append(node_id)
+        
         groups: List[List[str]] = []
-        remaining = set(self.nodes.keys())
-        
-        while remaining:
-            # Find all nodes that are ready
-            ready = [
-                node_id for node_id in remaining
-                if self.nodes[node_id].is_ready(completed)
-            ]
-            
-            if not ready:
-                # No progress possible - remaining nodes have unmet deps
-                break
-            
+        ready = [node_id for node_id, count in indegree.items() if count == 0]
+        
+        while ready:
             groups.append(ready)
-            completed.update(ready)
-            remaining -= set(ready)
+            next_ready = []
+            for node_id in ready:
+                for child in dependents[node_id]:
+                    indegree[child] -= 1
+                    if indegree[child] == 0:
+                        next_ready.append(child)
+            ready = sorted(next_ready, key=position.__getitem__)
         
         self.execution_order = groups
         return groups
     
+    def compute_priorities(self) -> Dict[str, float]:
+        """
+        Compute longest-remaining-path priorities.
+        
+        A node's priority is its estimated duration plus the largest
+        priority among its dependents, i.e. the length of the longest path
+        from the node to the end of the plan. Estimates come from
+        DurationHistory; tasks without history use the mean of known
+        tasks (or 1, making the priority a count of downstream levels).
+        """
+        estimates = {
+            node_id: self.history.estimate(node_id) if self.history else None
+            for node_id in self.nodes
+        }
+        known = [e for e in estimates.values() if e is not None]
+        default = sum(known) / len(known) if known else 1.0
+        
+        dependents: Dict[str, List[str]] = {node_id: [] for node_id in self.nodes}
+        for node_id, node in self.nodes.items():
+            for dep in set(node.dependencies):
+                if dep in dependents:
+                    dependents[dep].append(node_id)
+        
+        priorities: Dict[str, float] = {}
+        for group in reversed(self.compute_execution_order()):
+            for node_id in group:
+                own = estimates[node_id]
+                downstream = [priorities[c] for c in dependents[node_id] if c in priorities]
+                priorities[node_id] = (own if own is not None else default) + max(downstream, default=0.0)
+        
+        return priorities
+    
     def execute_sync(
         self,
         executor_fn: Callable[[str, dict], tuple[bool, Any, str]],
@@ -192,6 +345,8 @@ class DAGExecutor:
                         node.result = result
                         completed_nodes.append(node_id)
                         completed_set.add(node_id)
+                        if self.history:
+                            self.history.record(node_id, node.duration_ms)
                     else:
                         node.status = NodeStatus.FAILED
                         node.error = error
@@ -204,7 +359,7 @@ class DAGExecutor:
                                     self.nodes[remaining_id].status = NodeStatus.SKIPPED
                                     skipped_nodes.append(remaining_id)
                             break
-                            
+                
                 except Exception as e:
                     node.status = NodeStatus.FAILED
                     node.error = str(e)
@@ -222,6 +377,9 @@ class DAGExecutor:
                             skipped_nodes.append(node_id)
                 break
         
+        if self.history:
+            self.history.save()
+        
         total_duration = int((time.time() - start_time) * 1000)
         
         return DAGExecutionResult(
@@ -242,9 +400,17 @@ class DAGExecutor:
         """
         Execute the DAG with true parallelism using asyncio.
         
+        Scheduling is barrier-free: each node keeps a count of unfinished
+        dependencies and is launched the moment that count reaches zero,
+        instead of waiting for its whole parallel group. Up to max_parallel
+        nodes are kept in flight at all times; if a DurationHistory is
+        attached, ready nodes are started in critical-path order and their
+        durations are recorded for future runs.
+        
         Args:
             executor_fn: Function(node_id, task_data) -> (success, result, error)
-            stop_on_failure: Whether to stop on first failure
+            stop_on_failure: Whether to stop on first failure. Nodes already
+                             running are allowed to finish; nothing new starts.
             use_process_pool: Use ProcessPoolExecutor for CPU-bound tasks.
                              Default False uses ThreadPoolExecutor (better for I/O-bound
                              like LLM API calls).
@@ -255,54 +421,97 @@ class DAGExecutor:
         
         For darkzloop, most executor_fn calls are LLM API requests (I/O-bound),
         so ThreadPoolExecutor is the default.
-        """
-        from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
         
+        executor_fn may also be a coroutine function (e.g. one awaiting
+        BaseExecutor.execute_async); it is then awaited on the event loop
+        and no pool thread is used.
+        """
         start_time = time.time()
         completed_nodes = []
         failed_nodes = []
         skipped_nodes = []
         
+        # Groups are still reported so callers can see the level structure
         groups = self.compute_execution_order()
-        completed_set: Set[str] = set()
-        should_stop = False
         
-        # Choose executor based on task type
-        PoolExecutor = ProcessPoolExecutor if use_process_pool else ThreadPoolExecutor
+        # Choose executor based on task type; the pool outlives this run
+        pool = self._get_pool(use_process_pool)
+        semaphore = asyncio.Semaphore(max(1, self.max_parallel))
         
-        for group in groups:
-            if should_stop:
-                for node_id in group:
-                    self.nodes[node_id].status = NodeStatus.SKIPPED
-                    skipped_nodes.append(node_id)
-                continue
+        # Dependency counting: node -> unfinished deps, node -> dependents
+        pending_deps: Dict[str, int] = {}
+        dependents: Dict[str, List[str]] = {node_id: [] for node_id in self.nodes}
+        for node_id, node in self.nodes.items():
+            deps = set(node.dependencies)
+            pending_deps[node_id] = len(deps)
+            for dep in deps:
+                if dep in dependents:
+                    dependents[dep].append(node_id)
+        
+        # Ready queue ordered by critical path: when there are more ready
+        # nodes than free slots, the longest remaining path goes first
+        priorities = self.compute_priorities()
+        ready: List[tuple] = []
+        sequence = 0
+        
+        def push_ready(node_id: str):
+            nonlocal sequence
+            self.nodes[node_id].status = NodeStatus.READY
+            heapq.heappush(ready, (-priorities.get(node_id, 0.0), sequence, node_id))
+            sequence += 1
+        
+        for node_id, count in pending_deps.items():
+            if count == 0:
+                push_ready(node_id)
+        
+        in_flight: Dict[asyncio.Future, str] = {}
+        slots = max(1, self.max_parallel)
+        should_stop = False
+        
+        while ready or in_flight:
+            # Fill every free slot with a ready node
+            while ready and not should_stop and len(in_flight) < slots:
+                _, _, node_id = heapq.heappop(ready)
+                future = asyncio.ensure_future(
+                    self._execute_node_async(self.nodes[node_id], executor_fn, pool, semaphore)
+                )
+                in_flight[future] = node_id
             
-            # Run this group in parallel
-            tasks = []
-            for node_id in group:
-                node = self.nodes[node_id]
-                if any(dep in failed_nodes for dep in node.dependencies):
-                    node.status = NodeStatus.SKIPPED
-                    skipped_nodes.append(node_id)
-                else:
-                    tasks.append(self._execute_node_async(node, executor_fn, PoolExecutor))
+            if not in_flight:
+                break
+            
+            done, _ = await asyncio.wait(in_flight.keys(), return_when=asyncio.FIRST_COMPLETED)
             
-            # Wait for all tasks in group
-            if tasks:
-                results = await asyncio.gather(*tasks, return_exceptions=True)
+            for future in done:
+                node_id = in_flight.pop(future)
+                try:
+                    success, _ = future.result()
+                except Exception as e:
+                    self.nodes[node_id].status = NodeStatus.FAILED
+                    self.nodes[node_id].error = str(e)
+                    success = False
                 
-                for result in results:
-                    if isinstance(result, Exception):
-                        failed_nodes.append(str(result))
-                        if stop_on_failure:
-                            should_stop = True
-                    elif result[0]:  # success
-                        completed_nodes.append(result[1])
-                        completed_set.add(result[1])
-                    else:
-                        failed_nodes.append(result[1])
-                        if stop_on_failure:
-                            should_stop = True
+                if success:
+                    completed_nodes.append(node_id)
+                    if self.history:
+                        self.history.record(node_id, self.nodes[node_id].duration_ms)
+                    for child in dependents[node_id]:
+                        pending_deps[child] -= 1
+                        if pending_deps[child] == 0:
+                            push_ready(child)
+                else:
+                    failed_nodes.append(node_id)
+                    if stop_on_failure:
+                        should_stop = True
+        
+        # Anything that never ran was cut off by a failure (or an unmet dependency)
+        for node_id, node in self.nodes.items():
+            if node.status in (NodeStatus.PENDING, NodeStatus.READY):
+                node.status = NodeStatus.SKIPPED
+                skipped_nodes.append(node_id)
+        
+        if self.history:
+            self.history.save()
         
         total_duration = int((time.time() - start_time) * 1000)
         
@@ -319,19 +528,23 @@ class DAGExecutor:
         self,
         node: DAGNode,
         executor_fn: Callable,
-        PoolExecutor: type
+        pool: Executor,
+        semaphore: asyncio.Semaphore
     ) -> tuple[bool, str]:
-        """Execute a single node asynchronously."""
-        node.status = NodeStatus.RUNNING
-        start = time.time()
-        
+        """Execute a single node on the shared pool, holding one of max_parallel slots."""
         try:
-            # Run in appropriate pool to not block event loop
-            loop = asyncio.get_event_loop()
-            with PoolExecutor(max_workers=1) as pool:
-                success, result, error = await loop.run_in_executor(
-                    pool, executor_fn, node.id, node.task_data
-                )
+            async with semaphore:
+                node.status = NodeStatus.RUNNING
+                start = time.time()
+                
+                if asyncio.iscoroutinefunction(executor_fn):
+                    success, result, error = await executor_fn(node.id, node.task_data)
+                else:
+                    # Run in the shared pool to not block event loop
+                    loop = asyncio.get_running_loop()
+                    success, result, error = await loop.run_in_executor(
+                        pool, executor_fn, node.id, node.task_data
+                    )
             
             node.duration_ms = int((time.time() - start) * 1000)
             
@@ -343,7 +556,7 @@ class DAGExecutor:
                 node.status = NodeStatus.FAILED
                 node.error = error
                 return False, node.id
-                
+        
         except Exception as e:
             node.status = NodeStatus.FAILED
             node.error = str(e)
@@ -404,7 +617,19 @@ class DAGExecutor:
 # Plan Parser - Extract DAG from Markdown Plan
 # =============================================================================
 
-def parse_plan_to_dag(plan_content: str) -> DAGExecutor:
+# Task lines: "- [ ] ..." / "- [x] ..." at any indentation
+_TASK_LINE = re.compile(r'\s*-\s*\[\s*[xX ]?\s*\]\s*(.*)')
+# Pattern 1: Bold ID (Legacy) - e.g. "**1.1**: Description"
+_BOLD_ID = re.compile(r'\*\*(?:Task\s+)?(\d+\.\d+)\*\*:\s*(.*)', re.IGNORECASE)
+# Pattern 2: HTML Comment ID - e.g. "Description <!-- id: 1.1 -->"
+_COMMENT_ID = re.compile(r'(.+?)<!--\s*id:\s*([a-zA-Z0-9\._-]+)\s*-->')
+
+_MODIFY_FILE = re.compile(r'Modify:\s*`([^`]+)`')
+_NEW_FILE = re.compile(r'New file:\s*`([^`]+)`')
+_DEPENDENCIES = re.compile(r'Dependencies?:\s*([\d\., ]+)')
+
+
+def parse_plan_to_dag(plan: Union[str, Iterable[str]]) -> DAGExecutor:
     """
     Parse a DARKZLOOP_PLAN.md file into a DAG.
     
@@ -412,48 +637,77 @@ def parse_plan_to_dag(plan_content: str) -> DAGExecutor:
     - [ ] **Task 1.1**: Description
       - Modify: file.py
       - Dependencies: 1.0
+    
+    or:
+    - [ ] Description <!-- id: 1.1 -->
+      - Modify: file.py
+    
+    Accepts the plan text or any iterable of lines (e.g. an open file), and
+    reads it in a single pass. A task's block runs until the next task line,
+    the next top-level checkbox, or the next "##" heading.
     """
     dag = DAGExecutor()
+    lines = io.StringIO(plan) if isinstance(plan, str) else plan
     
-    # Pattern 1: Bold ID (Legacy) - e.g. "**1.1**: Description"
-    # Pattern 2: HTML Comment ID - e.g. "Description <!-- id: 1.1 -->"
+    task_id = None
+    is_bold = False
+    head = ""
+    block: List[str] = []
     
-    # We'll split the plan into lines/blocks to handle both
+    def flush():
+        if task_id is None:
+            return
+        if is_bold:
+            # Bold IDs always win; the description is the whole block
+            text = "\n".join([head] + block)
+            _add_node_from_match(dag, task_id, text, text)
+        elif task_id not in dag.nodes:
+            _add_node_from_match(dag, task_id, head, "\n".join([head] + block))
     
-    # First, try to find tasks with explicit bold IDs
-    bold_pattern = r'-\s*\[\s*[x ]?\s*\]\s*\*\*(?:Task\s+)?(\d+\.\d+)\*\*:\s*(.+?)(?=\n-\s*\[|\n##|\Z)'
-    bold_matches = re.findall(bold_pattern, plan_content, re.DOTALL | re.IGNORECASE)
+    for line in lines:
+        line = line.rstrip("\r\n")
+        task = _TASK_LINE.match(line) if "[" in line else None
+        
+        if task:
+            text = task.group(1)
+            bold = _BOLD_ID.match(text)
+            comment = None if bold else _COMMENT_ID.match(text)
+            if bold or comment:
+                flush()
+                if bold:
+                    task_id, head, is_bold = bold.group(1), bold.group(2), True
+                else:
+                    task_id, head, is_bold = comment.group(2), comment.group(1), False
+                block = []
+                continue
+            if not line[0].isspace():
+                # Top-level checkbox without an ID ends the current task
+                flush()
+                task_id = None
+                continue
+        elif line.startswith("##"):
+            flush()
+            task_id = None
+            continue
+        
+        if task_id is not None:
+            block.append(line)
     
-    for task_id, task_block in bold_matches:
-        _add_node_from_match(dag, task_id, task_block, task_block)
-
-    # Next, find tasks with HTML comments (if no bold IDs found or mixed - avoid duplicates)
-    # This regex looks for: - [ ] Description <!-- id: X -->
-    comment_pattern = r'-\s*\[\s*[x ]?\s*\]\s*(.+?)<!--\s*id:\s*([a-zA-Z0-9\._-]+)\s*-->'
-    comment_matches = re.findall(comment_pattern, plan_content)
-    
-    for description, task_id in comment_matches:
-        if task_id not in dag.nodes:
-            # For comment matches, we don't capture the full block easily with finding all
-            # So we assume dependencies are also in comments or simple structure
-            # To get full block including nested bullets, we might need a more complex parse
-            # For now, we use the description as the block for extraction
-            _add_node_from_match(dag, task_id, description, description)
-            
+    flush()
     return dag
 
 def _add_node_from_match(dag: DAGExecutor, task_id: str, description_text: str, full_block: str):
     """Helper to add a node to DAG from parsed components."""
     # Extract files to modify/create
-    files_modify = re.findall(r'Modify:\s*`([^`]+)`', full_block)
-    files_create = re.findall(r'New file:\s*`([^`]+)`', full_block)
+    files_modify = _MODIFY_FILE.findall(full_block)
+    files_create = _NEW_FILE.findall(full_block)
     
     # Extract dependencies
     deps = []
     # explicit "Dependencies: 1, 2"
-    explicit_deps = re.findall(r'Dependencies?:\s*([\d\., ]+)', full_block)
+    explicit_deps = _DEPENDENCIES.search(full_block)
     if explicit_deps:
-        deps = [d.strip() for d in explicit_deps[0].split(',')]
+        deps = [d.strip() for d in explicit_deps.group(1).split(',')]
     
     # infer from ID (X.Y -> X.Y-1)
     if not deps and '.' in task_id:
@@ -464,7 +718,7 @@ def _add_node_from_match(dag: DAGExecutor, task_id: str, description_text: str,
                 deps = [prev]
         except ValueError:
             pass
-
+    
     dag.add_node(
         task_id,
         {
@@ -477,79 +731,72 @@ def _add_node_from_match(dag: DAGExecutor, task_id: str, description_text: str,
     )
 
 
+class CommandResult(tuple):
+    """
+    (success, stdout, stderr) of a shell command, with its resource usage.
+    
+    Unpacks like the plain tuple the helpers used to return; duration_ms,
+    cpu_seconds and max_rss_kb come from the supervisor (None where the
+    platform cannot measure them).
+    """
+    
+    def __new__(cls, result: ProcessResult) -> "CommandResult":
+        self = super().__new__(cls, (result.success, result.stdout, result.stderr))
+        self.duration_ms = result.duration_ms
+        self.cpu_seconds = result.cpu_seconds
+        self.max_rss_kb = result.max_rss_kb
+        return self
+    
+    @property
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "duration_ms": self.duration_ms,
+            "cpu_seconds": self.cpu_seconds,
+            "max_rss_kb": self.max_rss_kb,
+        }
+
+
 async def run_shell_command_async(
     command: str,
     cwd: str = None,
-    timeout: int = 300
-) -> tuple[bool, str, str]:
+    timeout: int = 300,
+    log_dir: Path = None
+) -> CommandResult:
     """
     Run a shell command asynchronously without blocking.
     
     Use this for quality gates (cargo test, npm lint) which are CPU-bound
-    and should not block the event loop.
+    and should not block the event loop. The command runs under the
+    subprocess supervisor: on timeout or cancellation its whole process
+    tree is killed.
     
     Args:
         command: Shell command to run
         cwd: Working directory
         timeout: Timeout in seconds
-        
+        log_dir: Directory to spool the full output to (see output.py)
+    
     Returns:
-        (success, stdout, stderr)
+        (success, stdout, stderr) - stdout/stderr keep the first and last
+        2500/1000 characters; the run's CPU time and peak RSS are on the
+        result (see CommandResult)
     """
-    import asyncio.subprocess
-    
-    try:
-        proc = await asyncio.create_subprocess_shell(
-            command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=cwd
-        )
-        
-        try:
-            stdout, stderr = await asyncio.wait_for(
-                proc.communicate(),
-                timeout=timeout
-            )
-        except asyncio.TimeoutError:
-            proc.kill()
-            return False, "", f"Command timed out after {timeout}s"
-        
-        success = proc.returncode == 0
-        return success, stdout.decode()[:5000], stderr.decode()[:2000]
-        
-    except Exception as e:
-        return False, "", str(e)
+    return CommandResult(await run_supervised_async(command, timeout=timeout, cwd=cwd, log_dir=log_dir))
 
 
 def run_shell_command_sync(
     command: str,
     cwd: str = None,
-    timeout: int = 300
-) -> tuple[bool, str, str]:
+    timeout: int = 300,
+    log_dir: Path = None
+) -> CommandResult:
     """
     Run a shell command synchronously.
     
-    Use this when not in async context.
+    Use this when not in async context. Output and usage are captured the
+    same way as run_shell_command_async.
     """
-    import subprocess
-    
-    try:
-        result = subprocess.run(
-            command,
-            shell=True,
-            cwd=cwd,
-            capture_output=True,
-            timeout=timeout
-        )
-        
-        success = result.returncode == 0
-        return success, result.stdout.decode()[:5000], result.stderr.decode()[:2000]
-        
-    except subprocess.TimeoutExpired:
-        return False, "", f"Command timed out after {timeout}s"
-    except Exception as e:
-        return False, "", str(e)
+    return CommandResult(run_supervised(command, timeout=timeout, cwd=cwd, log_dir=log_dir))
 
 
 if __name__ == "__main__":
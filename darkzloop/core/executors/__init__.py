@@ -11,14 +11,34 @@ Supported backends:
 
 The "Bring Your Own Auth" (BYOA) pattern allows users to leverage
 existing subscriptions without managing separate API keys.
+
+Every executor can also be awaited (execute_async), so one event loop can
+keep hundreds of requests in flight without a thread per request.
+
+Responses can be cached on disk (config.response_cache): "on" reuses
+answers to identical requests, "replay" answers only from the cache.
+
+Calls to one provider and model share a process-wide rate limiter
+(config.requests_per_minute / tokens_per_minute), and throttled or
+transient failures are retried with backoff (config.retry_attempts).
+
+HedgedExecutor wraps two executors and races the secondary against a
+primary that is slower than its usual p95.
 """
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import Optional, Dict, Any, List, Tuple
 from enum import Enum
+from pathlib import Path
+import asyncio
 import json
 import re
+import time
+import weakref
+
+from darkzloop.core.response_cache import CACHE_MODES, ResponseCache
+from darkzloop.core.rate_limit import RateLimiter, get_rate_limiter, estimate_tokens, backoff_delay
 
 
 class ExecutorType(Enum):
@@ -26,6 +46,7 @@ class ExecutorType(Enum):
     SHELL = "shell"      # Native CLI tools (claude, gh, ollama)
     API = "api"          # Direct SDK (anthropic, openai)
     MOCK = "mock"        # For testing
+    HEDGED = "hedged"    # Two backends; the slow primary is raced by a secondary
 
 
 @dataclass
@@ -38,6 +59,8 @@ class ExecutorConfig:
     args: List[str] = field(default_factory=lambda: ["--print"])
     strip_ansi: bool = True
     timeout_seconds: int = 300
+    idle_timeout_seconds: int = 0  # Kill a tool silent this long as hung (0 = off; --print tools are silent until done)
+    adaptive_timeout: bool = True  # Use p99 of past runs x margin once known
     cwd: Optional[str] = None  # Working directory for shell commands
     
     # API executor settings
@@ -47,10 +70,26 @@ class ExecutorConfig:
     base_url: Optional[str] = None
     max_tokens: int = 4096
     temperature: float = 0.0
+    max_connections: int = 20  # HTTP keep-alive pool shared by parallel workers
+    stream: bool = False  # Stream responses (records time-to-first-token)
+    stop_on_action: bool = True  # Stop streamed responses / print-mode tools once the action is complete
+    prompt_cache: bool = True  # Mark the system prompt as a cacheable prefix
+    
+    # Hedged executor settings (configs of the two backends, as dicts)
+    hedge_primary: Optional[Dict[str, Any]] = None
+    hedge_secondary: Optional[Dict[str, Any]] = None
+    hedge_quantile: float = 0.95  # Send the duplicate once the primary is slower than this
+    hedge_budget: float = 0.1  # At most this fraction of requests is duplicated
     
     # Common settings
     system_prompt_prefix: str = ""
-    retry_attempts: int = 2
+    retry_attempts: int = 2  # Retries of throttled/transient failures (429, 529, timeouts)
+    requests_per_minute: int = 0  # Shared per provider and model across the process (0 = unlimited)
+    tokens_per_minute: int = 0  # Input + output tokens, shared likewise (0 = unlimited)
+    max_concurrency: int = 32  # execute_async calls in flight at once, per event loop
+    response_cache: str = "off"  # "off", "on" (reuse identical requests) or "replay" (cache only)
+    response_cache_dir: Optional[str] = None  # Default: .darkzloop/cache/responses
+    response_cache_max_mb: int = 512  # Least recently used entries are evicted past this
     
     @classmethod
     def from_dict(cls, data: dict) -> "ExecutorConfig":
@@ -60,6 +99,8 @@ class ExecutorConfig:
             exec_type = ExecutorType.SHELL
         elif exec_type == "api":
             exec_type = ExecutorType.API
+        elif exec_type == "hedged":
+            exec_type = ExecutorType.HEDGED
         else:
             exec_type = ExecutorType.MOCK
         
@@ -69,6 +110,8 @@ class ExecutorConfig:
             args=data.get("args", ["--print"]),
             strip_ansi=data.get("strip_ansi", True),
             timeout_seconds=data.get("timeout_seconds", 300),
+            idle_timeout_seconds=data.get("idle_timeout_seconds", 0),
+            adaptive_timeout=data.get("adaptive_timeout", True),
             cwd=data.get("cwd"),
             provider=data.get("provider", "anthropic"),
             model=data.get("model", "claude-sonnet-4-20250514"),
@@ -76,8 +119,22 @@ class ExecutorConfig:
             base_url=data.get("base_url"),
             max_tokens=data.get("max_tokens", 4096),
             temperature=data.get("temperature", 0.0),
+            max_connections=data.get("max_connections", 20),
+            stream=data.get("stream", False),
+            stop_on_action=data.get("stop_on_action", True),
+            prompt_cache=data.get("prompt_cache", True),
+            hedge_primary=data.get("hedge_primary"),
+            hedge_secondary=data.get("hedge_secondary"),
+            hedge_quantile=data.get("hedge_quantile", 0.95),
+            hedge_budget=data.get("hedge_budget", 0.1),
             system_prompt_prefix=data.get("system_prompt_prefix", ""),
             retry_attempts=data.get("retry_attempts", 2),
+            requests_per_minute=data.get("requests_per_minute", 0),
+            tokens_per_minute=data.get("tokens_per_minute", 0),
+            max_concurrency=data.get("max_concurrency", 32),
+            response_cache=data.get("response_cache", "off"),
+            response_cache_dir=data.get("response_cache_dir"),
+            response_cache_max_mb=data.get("response_cache_max_mb", 512),
         )
     
     def to_dict(self) -> dict:
@@ -87,14 +144,30 @@ class ExecutorConfig:
             "args": self.args,
             "strip_ansi": self.strip_ansi,
             "timeout_seconds": self.timeout_seconds,
+            "idle_timeout_seconds": self.idle_timeout_seconds,
+            "adaptive_timeout": self.adaptive_timeout,
             "provider": self.provider,
             "model": self.model,
             "api_key": self.api_key,
             "base_url": self.base_url,
             "max_tokens": self.max_tokens,
             "temperature": self.temperature,
+            "max_connections": self.max_connections,
+            "stream": self.stream,
+            "stop_on_action": self.stop_on_action,
+            "prompt_cache": self.prompt_cache,
+            "hedge_primary": self.hedge_primary,
+            "hedge_secondary": self.hedge_secondary,
+            "hedge_quantile": self.hedge_quantile,
+            "hedge_budget": self.hedge_budget,
             "system_prompt_prefix": self.system_prompt_prefix,
             "retry_attempts": self.retry_attempts,
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "max_concurrency": self.max_concurrency,
+            "response_cache": self.response_cache,
+            "response_cache_dir": self.response_cache_dir,
+            "response_cache_max_mb": self.response_cache_max_mb,
         }
 
 
@@ -112,6 +185,28 @@ class ExecutorResponse:
     tokens_used: Optional[int] = None
     duration_ms: Optional[int] = None
     error: Optional[str] = None
+    hung: bool = False  # Killed by the idle watchdog (retryable)
+    retryable: bool = False  # Throttled or transient failure (429, 529, connection)
+    retry_after: Optional[float] = None  # Seconds the backend asked us to wait
+    
+    # Rate limiting
+    queued_ms: Optional[int] = None  # Time spent waiting on the rate limiter and backoff
+    attempts: int = 1
+    
+    # Prompt caching (API executors only; included in tokens_used)
+    cache_read_tokens: Optional[int] = None  # Input served from the provider's cache
+    cache_write_tokens: Optional[int] = None  # Input written to the cache
+    
+    # Streaming metrics (streamed API responses only)
+    ttft_ms: Optional[int] = None  # Time to first token
+    tokens_per_second: Optional[float] = None
+    stopped_early: bool = False  # Generation cancelled once the action arrived
+    cached: bool = False  # Served from the response cache (metrics are the original call's)
+    hedged: Optional[str] = None  # A duplicate was sent; which backend answered ("primary"/"secondary")
+    
+    # Resource usage of the tool process tree (shell executors only)
+    cpu_seconds: Optional[float] = None
+    max_rss_kb: Optional[int] = None
     
     def get_action(self) -> Optional[Dict[str, Any]]:
         """Extract action from response content."""
@@ -139,12 +234,35 @@ class BaseExecutor(ABC):
     1. Taking a prompt (system + user context)
     2. Sending it to an LLM backend
     3. Parsing and returning the response
+    
+    Subclasses implement _execute(); execute() adds the response cache,
+    rate limiting and retries around it. execute_async() is the awaitable
+    form: subclasses override _execute_async() with a native
+    implementation, otherwise _execute() runs in a worker thread.
+    
+    Executors written before _execute() existed override execute() (and
+    possibly execute_async()) directly; __init_subclass__ moves those
+    overrides onto the hooks so they keep the cache and rate limits.
     """
     
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for public, hook in (("execute", "_execute"), ("execute_async", "_execute_async")):
+            if public in cls.__dict__ and hook not in cls.__dict__:
+                setattr(cls, hook, cls.__dict__[public])
+                setattr(cls, public, getattr(BaseExecutor, public))
+    
     def __init__(self, config: ExecutorConfig):
         self.config = config
+        # asyncio primitives belong to one loop, so each loop gets its own limiter
+        self._limiters = weakref.WeakKeyDictionary()
+        self.response_cache = self._open_cache()
+        self.rate_limiter: Optional[RateLimiter] = None
+        if config.requests_per_minute or config.tokens_per_minute:
+            self.rate_limiter = get_rate_limiter(
+                self.rate_limit_key(), config.requests_per_minute, config.tokens_per_minute,
+            )
     
-    @abstractmethod
     def execute(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
         """
         Execute a prompt and return the response.
@@ -156,7 +274,166 @@ class BaseExecutor(ABC):
         Returns:
             ExecutorResponse with the result
         """
-        pass
+        key, cached = self._cache_lookup(prompt, system_prompt)
+        if cached is not None:
+            return cached
+        
+        estimate = estimate_tokens(self.config.system_prompt_prefix, system_prompt, prompt)
+        queued = 0.0
+        for attempt in range(self.config.retry_attempts + 1):
+            if self.rate_limiter:
+                queued += self.rate_limiter.acquire(estimate)
+            response = self._execute(prompt, system_prompt)
+            delay = self._settle(response, attempt, estimate)
+            if delay is None:
+                break
+            time.sleep(delay)
+            queued += delay
+        return self._cache_store(key, self._finish(response, attempt, queued))
+    
+    def _execute(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
+        """Send the prompt to the backend (no caching)."""
+        raise NotImplementedError(
+            f"{type(self).__name__} must implement _execute(); execute() wraps it "
+            "with the response cache, rate limiting and retries"
+        )
+    
+    async def execute_async(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
+        """
+        Execute a prompt without blocking the event loop.
+        
+        At most config.max_concurrency calls run at once; the rest wait
+        for a slot, so callers can gather() as many requests as they like.
+        """
+        key, cached = self._cache_lookup(prompt, system_prompt)
+        if cached is not None:
+            return cached
+        
+        estimate = estimate_tokens(self.config.system_prompt_prefix, system_prompt, prompt)
+        queued = 0.0
+        for attempt in range(self.config.retry_attempts + 1):
+            if self.rate_limiter:
+                queued += await self.rate_limiter.acquire_async(estimate)
+            async with self._limiter():
+                response = await self._execute_async(prompt, system_prompt)
+            delay = self._settle(response, attempt, estimate)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+            queued += delay
+        return self._cache_store(key, self._finish(response, attempt, queued))
+    
+    async def _execute_async(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
+        """Native async execution. The default runs _execute() in a worker thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._execute, prompt, system_prompt)
+    
+    # =========================================================================
+    # Rate Limiting and Retries
+    # =========================================================================
+    
+    def rate_limit_key(self) -> str:
+        """Executors with the same key share one rate limiter."""
+        return f"{self.config.provider}/{self.config.model}"
+    
+    def _settle(self, response: ExecutorResponse, attempt: int, estimate: int) -> Optional[float]:
+        """Account for a call; returns the backoff before retrying it, or None to stop."""
+        if self.rate_limiter:
+            self.rate_limiter.settle(estimate, response.tokens_used)
+        if response.success or not response.retryable or attempt >= self.config.retry_attempts:
+            return None
+        delay = backoff_delay(attempt, response.retry_after)
+        if self.rate_limiter and response.retry_after is not None:
+            # Told to back off: every worker on this provider and model waits,
+            # this one in the limiter plus its jitter
+            self.rate_limiter.pause(response.retry_after)
+            delay -= response.retry_after
+        return delay
+    
+    def _finish(self, response: ExecutorResponse, attempt: int, queued: float) -> ExecutorResponse:
+        """Record attempts and queueing delay on the final response."""
+        response.attempts = attempt + 1
+        response.queued_ms = int(queued * 1000)
+        return response
+    
+    # =========================================================================
+    # Response Cache
+    # =========================================================================
+    
+    def _open_cache(self) -> Optional[ResponseCache]:
+        """The response cache for config.response_cache, or None when off."""
+        mode = self.config.response_cache
+        if mode not in CACHE_MODES:
+            raise ValueError(f"response_cache must be one of {CACHE_MODES}, got {mode!r}")
+        if mode == "off":
+            return None
+        cache_dir = self.config.response_cache_dir or (
+            Path(self.config.cwd or Path.cwd()) / ".darkzloop" / "cache" / "responses"
+        )
+        return ResponseCache(
+            Path(cache_dir),
+            max_bytes=self.config.response_cache_max_mb * 1024 * 1024,
+            replay=mode == "replay",
+        )
+    
+    def cache_model(self) -> str:
+        """What produces the answers, for the cache key (the model, for API executors)."""
+        return self.config.model
+    
+    def _cache_lookup(self, prompt: str, system_prompt: str) -> Tuple[Optional[str], Optional[ExecutorResponse]]:
+        """(key, cached response); in replay mode a miss is a failed response."""
+        if self.response_cache is None:
+            return None, None
+        start_time = time.time()
+        key = ResponseCache.key(
+            self.config.type.value,
+            self.cache_model(),
+            self.config.temperature,
+            "\n\n".join(p for p in (self.config.system_prompt_prefix, system_prompt) if p),
+            prompt,
+        )
+        fields = self.response_cache.get(key)
+        if fields is not None:
+            known = {k: v for k, v in fields.items() if k in ExecutorResponse.__dataclass_fields__}
+            return key, ExecutorResponse(**dict(known, cached=True))
+        if self.response_cache.replay:
+            return key, ExecutorResponse(
+                success=False,
+                content="",
+                raw_output="",
+                error=f"Response cache miss in replay mode (key {key[:12]})",
+                duration_ms=int((time.time() - start_time) * 1000),
+            )
+        return key, None
+    
+    def _cache_store(self, key: Optional[str], response: ExecutorResponse) -> ExecutorResponse:
+        """Cache a successful response; returns it."""
+        if key is not None and response.success:
+            self.response_cache.put(key, response)
+        return response
+    
+    def agent_call(self, prompt: str, task: dict) -> Tuple[bool, str, str]:
+        """
+        Adapter for DarkzloopRuntime.set_agent_executor.
+        
+        The runtime passes the prompt's stable leading part as
+        task["prompt_prefix"]; it is sent as the system prompt, which API
+        executors mark for the provider's prompt cache.
+        """
+        prefix = task.get("prompt_prefix", "")
+        if prefix and prompt.startswith(prefix):
+            response = self.execute(prompt[len(prefix):].lstrip("\n"), system_prompt=prefix)
+        else:
+            response = self.execute(prompt)
+        return response.success, response.content, response.error or ""
+    
+    def _limiter(self) -> asyncio.Semaphore:
+        """The concurrency limiter for the running event loop."""
+        loop = asyncio.get_running_loop()
+        limiter = self._limiters.get(loop)
+        if limiter is None:
+            limiter = self._limiters[loop] = asyncio.Semaphore(max(1, self.config.max_concurrency))
+        return limiter
     
     @abstractmethod
     def is_available(self) -> Tuple[bool, str]:
@@ -218,6 +495,7 @@ def get_available_executors() -> List[Tuple[ExecutorType, str]]:
 from darkzloop.core.executors.shell import ShellExecutor
 from darkzloop.core.executors.api import APIExecutor
 from darkzloop.core.executors.mock import MockExecutor
+from darkzloop.core.executors.hedged import HedgedExecutor
 
 __all__ = [
     "ExecutorType",
@@ -229,4 +507,5 @@ __all__ = [
     "ShellExecutor",
     "APIExecutor",
     "MockExecutor",
+    "HedgedExecutor",
 ]
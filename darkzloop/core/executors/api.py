@@ -6,7 +6,19 @@ Executes prompts via direct API calls to LLM providers:
 - OpenAI (GPT-4)
 
 Requires API keys but provides more control over parameters
-and streaming capabilities.
+and streaming capabilities. With config.stream, responses are streamed
+and the generation is cancelled as soon as the JSON action is complete.
+
+The system prompt is the stable prefix of every request: Anthropic gets
+it with a cache_control marker, OpenAI caches leading tokens on its own,
+and both report cache hits back in ExecutorResponse.cache_read_tokens.
+
+The SDKs' own retries are turned off: a 429/529 comes back as a retryable
+response carrying the server's retry-after, and BaseExecutor retries it
+through the limiter shared by every worker on the same model.
+
+For large non-interactive sweeps, submit_batch/batch_status/batch_results
+use the providers' batch APIs (see batch.run_batches).
 
 Usage:
     executor = APIExecutor(ExecutorConfig(
@@ -16,18 +28,26 @@ Usage:
         api_key="sk-ant-...",
     ))
     response = executor.execute(prompt)
+    response = await executor.execute_async(prompt)
 """
 
+import asyncio
 import os
 import time
 import json
 import re
-from typing import Tuple, Optional
+import sys
+import threading
+import weakref
+from typing import Any, Callable, Iterator, List, Tuple, Optional
 
 from darkzloop.core.executors import (
     BaseExecutor, ExecutorConfig, ExecutorResponse,
     ExecutorType, register_executor
 )
+from darkzloop.core.executors.streaming import StreamResult, collect_stream, collect_stream_async
+from darkzloop.core.executors.batch import BatchError, BatchRequest, BatchStatus
+from darkzloop.core.rate_limit import classify_error
 
 
 @register_executor(ExecutorType.API)
@@ -41,82 +61,232 @@ class APIExecutor(BaseExecutor):
     
     Requires API keys but provides:
     - Full parameter control
-    - Streaming support (future)
+    - Streaming with early stop at the action (config.stream)
+    - Prompt caching of the system prompt (config.prompt_cache)
     - Token counting
+    
+    One SDK client (and HTTP connection pool) is created on first use and
+    reused by every call; SDK clients are thread-safe, so parallel workers
+    sharing the executor share its keep-alive connections. execute_async
+    uses the SDK's async client, one per event loop, with the same limits.
     """
     
     def __init__(self, config: ExecutorConfig):
         super().__init__(config)
         self._client = None
+        self._client_lock = threading.Lock()
+        # Async clients (and their pools) are bound to the loop that made them
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._batch_started = {}  # batch id -> submission time
+    
+    def _get_client(self, factory: Callable[[], Any]) -> Any:
+        """The executor's SDK client, created by factory on first use."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = factory()
+        return self._client
+    
+    def _get_async_client(self, factory: Callable[[], Any]) -> Any:
+        """The executor's async SDK client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = factory()
+        return client
+    
+    def _http_client(self, sdk, is_async: bool = False) -> Any:
+        """
+        An HTTP client whose keep-alive pool fits max_connections workers.
+        
+        Built from the SDK's own client class, which keeps its default
+        timeouts and redirects, with Limits from the httpx package that
+        class derives from (newer SDKs ship on httpx2 rather than httpx).
+        """
+        client_class = getattr(sdk, "DefaultAsyncHttpxClient" if is_async else "DefaultHttpxClient", None)
+        if client_class is None:
+            # SDKs predating these classes depend on httpx directly
+            import httpx
+            client_class = httpx.AsyncClient if is_async else httpx.Client
+        
+        http = next(
+            module for module in (sys.modules.get(cls.__module__.partition(".")[0]) for cls in client_class.__mro__)
+            if hasattr(module, "Limits")
+        )
+        limits = http.Limits(
+            max_connections=self.config.max_connections,
+            max_keepalive_connections=self.config.max_connections,
+        )
+        return client_class(limits=limits)
+    
+    def close(self):
+        """Close the client's connection pool."""
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+    
+    async def aclose(self):
+        """Close the running event loop's async connection pool."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+    
+    def _connect(self, is_async: bool = False) -> Tuple[Any, Optional[ExecutorResponse]]:
+        """The provider's SDK client, or an error response if it can't be made."""
+        if self.config.provider == "anthropic":
+            try:
+                import anthropic as sdk
+            except ImportError:
+                return None, self._error("anthropic package not installed. Run: pip install anthropic")
+            api_key = self.config.api_key or os.environ.get("ANTHROPIC_API_KEY")
+            if not api_key:
+                return None, self._error("No Anthropic API key. Set ANTHROPIC_API_KEY or configure in darkzloop.")
+            client_class = sdk.AsyncAnthropic if is_async else sdk.Anthropic
+        elif self.config.provider == "openai":
+            try:
+                import openai as sdk
+            except ImportError:
+                return None, self._error("openai package not installed. Run: pip install openai")
+            api_key = self.config.api_key or os.environ.get("OPENAI_API_KEY")
+            if not api_key:
+                return None, self._error("No OpenAI API key. Set OPENAI_API_KEY or configure in darkzloop.")
+            client_class = sdk.AsyncOpenAI if is_async else sdk.OpenAI
+        else:
+            return None, self._error(f"Unknown provider: {self.config.provider}")
+        
+        def factory():
+            return client_class(
+                api_key=api_key,
+                base_url=self.config.base_url,
+                http_client=self._http_client(sdk, is_async),
+                max_retries=0,  # BaseExecutor retries, sharing backoff across workers
+            )
+        
+        if is_async:
+            return self._get_async_client(factory), None
+        return self._get_client(factory), None
+    
+    def _error(self, message: str, start_time: float = None, exc: Exception = None) -> ExecutorResponse:
+        retryable, retry_after = classify_error(exc) if exc is not None else (False, None)
+        return ExecutorResponse(
+            success=False,
+            content="",
+            raw_output="",
+            error=message,
+            duration_ms=int((time.time() - start_time) * 1000) if start_time else None,
+            retryable=retryable,
+            retry_after=retry_after,
+        )
+    
+    def _system_prompt(self, system_prompt: str) -> str:
+        """
+        config.system_prompt_prefix plus system_prompt.
+        
+        It goes in the provider's system slot only (not repeated in the user
+        message) so the request starts with the same bytes every iteration.
+        """
+        return "\n\n".join(p for p in (self.config.system_prompt_prefix, system_prompt) if p)
     
-    def execute(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
+    def _execute(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
         """Execute prompt via API."""
         start_time = time.time()
         
-        full_prompt = self.prepare_prompt(prompt, system_prompt)
+        system_prompt = self._system_prompt(system_prompt)
         
         try:
+            client, error = self._connect()
+            if error:
+                return error
             if self.config.provider == "anthropic":
-                return self._execute_anthropic(full_prompt, system_prompt, start_time)
-            elif self.config.provider == "openai":
-                return self._execute_openai(full_prompt, system_prompt, start_time)
-            else:
-                return ExecutorResponse(
-                    success=False,
-                    content="",
-                    raw_output="",
-                    error=f"Unknown provider: {self.config.provider}",
-                )
+                return self._execute_anthropic(client, prompt, system_prompt, start_time)
+            return self._execute_openai(client, prompt, system_prompt, start_time)
         except Exception as e:
-            return ExecutorResponse(
-                success=False,
-                content="",
-                raw_output="",
-                error=str(e),
-                duration_ms=int((time.time() - start_time) * 1000),
-            )
+            return self._error(str(e), start_time, e)
+    
+    async def _execute_async(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
+        """Execute prompt via the SDK's async client."""
+        start_time = time.time()
+        
+        system_prompt = self._system_prompt(system_prompt)
+        
+        try:
+            client, error = self._connect(is_async=True)
+            if error:
+                return error
+            if self.config.provider == "anthropic":
+                return await self._execute_anthropic_async(client, prompt, system_prompt, start_time)
+            return await self._execute_openai_async(client, prompt, system_prompt, start_time)
+        except Exception as e:
+            return self._error(str(e), start_time, e)
+    
+    # =============================================================================
+    # Anthropic
+    # =============================================================================
+    
+    def _anthropic_params(self, prompt: str, system_prompt: str) -> dict:
+        params = dict(
+            model=self.config.model,
+            max_tokens=self.config.max_tokens,
+            temperature=self.config.temperature,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        if system_prompt and self.config.prompt_cache:
+            # Cache everything up to and including the system prompt
+            params["system"] = [{
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {"type": "ephemeral"},
+            }]
+        elif system_prompt:
+            params["system"] = system_prompt
+        return params
     
     def _execute_anthropic(
-        self, 
-        prompt: str, 
+        self,
+        client: Any,
+        prompt: str,
         system_prompt: str,
         start_time: float
     ) -> ExecutorResponse:
         """Execute via Anthropic API."""
-        try:
-            import anthropic
-        except ImportError:
-            return ExecutorResponse(
-                success=False,
-                content="",
-                raw_output="",
-                error="anthropic package not installed. Run: pip install anthropic",
-            )
-        
-        api_key = self.config.api_key or os.environ.get("ANTHROPIC_API_KEY")
-        if not api_key:
-            return ExecutorResponse(
-                success=False,
-                content="",
-                raw_output="",
-                error="No Anthropic API key. Set ANTHROPIC_API_KEY or configure in darkzloop.",
-            )
+        params = self._anthropic_params(prompt, system_prompt)
         
-        client = anthropic.Anthropic(
-            api_key=api_key,
-            base_url=self.config.base_url,
-        )
+        if self.config.stream:
+            # Leaving the with-block closes the connection, which cancels the
+            # rest of the generation when we stopped early
+            with client.messages.stream(**params) as stream:
+                result = collect_stream(stream.text_stream, start_time, self.config.stop_on_action)
+                if result.stopped_early:
+                    message = getattr(stream, "current_message_snapshot", None)
+                else:
+                    message = stream.get_final_message()
+            return self._anthropic_streamed(result, message, start_time)
         
-        messages = [{"role": "user", "content": prompt}]
+        return self._anthropic_response(client.messages.create(**params), start_time)
+    
+    async def _execute_anthropic_async(
+        self,
+        client: Any,
+        prompt: str,
+        system_prompt: str,
+        start_time: float
+    ) -> ExecutorResponse:
+        """Execute via Anthropic's async client."""
+        params = self._anthropic_params(prompt, system_prompt)
         
-        response = client.messages.create(
-            model=self.config.model,
-            max_tokens=self.config.max_tokens,
-            temperature=self.config.temperature,
-            system=system_prompt if system_prompt else None,
-            messages=messages,
-        )
+        if self.config.stream:
+            async with client.messages.stream(**params) as stream:
+                result = await collect_stream_async(stream.text_stream, start_time, self.config.stop_on_action)
+                if result.stopped_early:
+                    message = getattr(stream, "current_message_snapshot", None)
+                else:
+                    message = await stream.get_final_message()
+            return self._anthropic_streamed(result, message, start_time)
         
+        return self._anthropic_response(await client.messages.create(**params), start_time)
+    
+    def _anthropic_response(self, response: Any, start_time: float) -> ExecutorResponse:
         duration_ms = int((time.time() - start_time) * 1000)
         
         content = ""
@@ -125,8 +295,9 @@ class APIExecutor(BaseExecutor):
                 content += block.text
         
         # Calculate tokens
+        input_tokens, cache = self._anthropic_input(response.usage)
         tokens_used = (
-            response.usage.input_tokens + 
+            input_tokens + 
             response.usage.output_tokens
         )
         
@@ -140,51 +311,96 @@ class APIExecutor(BaseExecutor):
             action=action,
             tokens_used=tokens_used,
             duration_ms=duration_ms,
+            **cache,
+        )
+    
+    def _anthropic_streamed(self, result: StreamResult, message: Any, start_time: float) -> ExecutorResponse:
+        usage = getattr(message, "usage", None)
+        input_tokens, cache = self._anthropic_input(usage) if usage else (0, {})
+        output_tokens = usage.output_tokens if usage and not result.stopped_early else None
+        return self._streamed_response(result, start_time, input_tokens, output_tokens, **cache)
+    
+    @staticmethod
+    def _anthropic_input(usage: Any) -> Tuple[int, dict]:
+        """All input tokens and the cache counters (input_tokens excludes cached ones)."""
+        cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+        cache = {"cache_read_tokens": cache_read, "cache_write_tokens": cache_write}
+        return usage.input_tokens + cache_read + cache_write, cache
+    
+    # =============================================================================
+    # OpenAI
+    # =============================================================================
+    
+    def _openai_params(self, prompt: str, system_prompt: str, stream: bool) -> dict:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        params = dict(
+            model=self.config.model,
+            max_tokens=self.config.max_tokens,
+            temperature=self.config.temperature,
+            messages=messages,
         )
+        if stream:
+            params.update(stream=True, stream_options={"include_usage": True})
+        return params
     
     def _execute_openai(
         self,
+        client: Any,
         prompt: str,
         system_prompt: str,
         start_time: float
     ) -> ExecutorResponse:
         """Execute via OpenAI API."""
-        try:
-            import openai
-        except ImportError:
-            return ExecutorResponse(
-                success=False,
-                content="",
-                raw_output="",
-                error="openai package not installed. Run: pip install openai",
-            )
+        params = self._openai_params(prompt, system_prompt, self.config.stream)
+        response = client.chat.completions.create(**params)
         
-        api_key = self.config.api_key or os.environ.get("OPENAI_API_KEY")
-        if not api_key:
-            return ExecutorResponse(
-                success=False,
-                content="",
-                raw_output="",
-                error="No OpenAI API key. Set OPENAI_API_KEY or configure in darkzloop.",
-            )
+        if not self.config.stream:
+            return self._openai_response(response, start_time)
         
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url=self.config.base_url,
-        )
+        usage = []
         
-        messages = []
-        if system_prompt:
-            messages.append({"role": "system", "content": system_prompt})
-        messages.append({"role": "user", "content": prompt})
+        def deltas():
+            for chunk in response:
+                yield self._openai_delta(chunk, usage)
         
-        response = client.chat.completions.create(
-            model=self.config.model,
-            max_tokens=self.config.max_tokens,
-            temperature=self.config.temperature,
-            messages=messages,
-        )
+        try:
+            result = collect_stream(deltas(), start_time, self.config.stop_on_action)
+        finally:
+            response.close()  # cancels the generation if we stopped early
+        return self._openai_streamed(result, usage, start_time)
+    
+    async def _execute_openai_async(
+        self,
+        client: Any,
+        prompt: str,
+        system_prompt: str,
+        start_time: float
+    ) -> ExecutorResponse:
+        """Execute via OpenAI's async client."""
+        params = self._openai_params(prompt, system_prompt, self.config.stream)
+        response = await client.chat.completions.create(**params)
+        
+        if not self.config.stream:
+            return self._openai_response(response, start_time)
         
+        usage = []
+        
+        async def deltas():
+            async for chunk in response:
+                yield self._openai_delta(chunk, usage)
+        
+        try:
+            result = await collect_stream_async(deltas(), start_time, self.config.stop_on_action)
+        finally:
+            await response.close()
+        return self._openai_streamed(result, usage, start_time)
+    
+    def _openai_response(self, response: Any, start_time: float) -> ExecutorResponse:
         duration_ms = int((time.time() - start_time) * 1000)
         
         content = response.choices[0].message.content or ""
@@ -207,8 +423,167 @@ class APIExecutor(BaseExecutor):
             action=action,
             tokens_used=tokens_used,
             duration_ms=duration_ms,
+            cache_read_tokens=self._openai_cached(response.usage),
         )
     
+    @staticmethod
+    def _openai_delta(chunk: Any, usage: list) -> str:
+        """Text of one stream chunk; the usage chunk (after the text) goes to usage."""
+        if chunk.usage:
+            usage.append(chunk.usage)
+        return (chunk.choices[0].delta.content or "") if chunk.choices else ""
+    
+    def _openai_streamed(self, result: StreamResult, usage: list, start_time: float) -> ExecutorResponse:
+        input_tokens = usage[-1].prompt_tokens if usage else 0
+        output_tokens = usage[-1].completion_tokens if usage else None
+        cached = self._openai_cached(usage[-1]) if usage else None
+        return self._streamed_response(result, start_time, input_tokens, output_tokens, cache_read_tokens=cached)
+    
+    @staticmethod
+    def _openai_cached(usage: Any) -> Optional[int]:
+        """Prompt tokens OpenAI served from its automatic prefix cache."""
+        details = getattr(usage, "prompt_tokens_details", None)
+        return getattr(details, "cached_tokens", None)
+    
+    def _streamed_response(
+        self,
+        result: StreamResult,
+        start_time: float,
+        input_tokens: int,
+        output_tokens: Optional[int],
+        **cache
+    ) -> ExecutorResponse:
+        """Build the response for a stream (output_tokens None: estimate)."""
+        if output_tokens is None:
+            output_tokens = len(result.content) // 4  # Rough approximation
+        
+        return ExecutorResponse(
+            success=True,
+            content=result.content,
+            raw_output=result.content,
+            action=result.action or self._extract_action(result.content),
+            tokens_used=input_tokens + output_tokens,
+            duration_ms=int((time.time() - start_time) * 1000),
+            ttft_ms=result.ttft_ms,
+            tokens_per_second=result.tokens_per_second(output_tokens),
+            stopped_early=result.stopped_early,
+            **cache,
+        )
+    
+    # =============================================================================
+    # Batch API
+    # =============================================================================
+    
+    # OpenAI batch states after which nothing more will happen
+    OPENAI_BATCH_ENDED = ("completed", "failed", "expired", "cancelled")
+    
+    def _batch_client(self) -> Any:
+        client, error = self._connect()
+        if error:
+            raise BatchError(error.error)
+        return client
+    
+    def submit_batch(self, requests: List[BatchRequest]) -> str:
+        """Submit requests as one provider batch job; returns the job id."""
+        client = self._batch_client()
+        
+        if self.config.provider == "anthropic":
+            batch = client.messages.batches.create(requests=[
+                {
+                    "custom_id": r.custom_id,
+                    "params": self._anthropic_params(r.prompt, self._system_prompt(r.system_prompt)),
+                }
+                for r in requests
+            ])
+        else:
+            lines = [
+                json.dumps({
+                    "custom_id": r.custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._openai_params(r.prompt, self._system_prompt(r.system_prompt), stream=False),
+                })
+                for r in requests
+            ]
+            upload = client.files.create(file=("batch.jsonl", "\n".join(lines).encode()), purpose="batch")
+            batch = client.batches.create(
+                input_file_id=upload.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            )
+        
+        self._batch_started[batch.id] = time.time()
+        return batch.id
+    
+    def batch_status(self, batch_id: str) -> BatchStatus:
+        """Poll a batch job."""
+        client = self._batch_client()
+        
+        if self.config.provider == "anthropic":
+            batch = client.messages.batches.retrieve(batch_id)
+            counts = batch.request_counts
+            return BatchStatus(
+                id=batch_id,
+                ended=batch.processing_status == "ended",
+                succeeded=counts.succeeded,
+                failed=counts.errored + counts.canceled + counts.expired,
+                processing=counts.processing,
+            )
+        
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return BatchStatus(
+            id=batch_id,
+            ended=batch.status in self.OPENAI_BATCH_ENDED,
+            succeeded=counts.completed if counts else 0,
+            failed=counts.failed if counts else 0,
+            processing=counts.total - counts.completed - counts.failed if counts else 0,
+        )
+    
+    def batch_results(self, batch_id: str) -> Iterator[Tuple[str, ExecutorResponse]]:
+        """(custom_id, response) for every request of an ended batch job."""
+        client = self._batch_client()
+        # Duration is from submission (when this executor submitted the job)
+        start_time = self._batch_started.get(batch_id, time.time())
+        
+        if self.config.provider == "anthropic":
+            for entry in client.messages.batches.results(batch_id):
+                result = entry.result
+                if result.type == "succeeded":
+                    yield entry.custom_id, self._anthropic_response(result.message, start_time)
+                else:
+                    error = getattr(getattr(result, "error", None), "error", None)
+                    message = getattr(error, "message", None) or "no result"
+                    yield entry.custom_id, self._error(f"Batch request {result.type}: {message}", start_time)
+            return
+        
+        from openai.types.chat import ChatCompletion
+        
+        batch = client.batches.retrieve(batch_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                if response.get("status_code") == 200:
+                    completion = ChatCompletion.model_validate(response["body"])
+                    yield entry["custom_id"], self._openai_response(completion, start_time)
+                else:
+                    error = entry.get("error") or (response.get("body") or {}).get("error") or {}
+                    message = error.get("message") or f"HTTP {response.get('status_code')}"
+                    yield entry["custom_id"], self._error(f"Batch request failed: {message}", start_time)
+    
+    def cancel_batch(self, batch_id: str):
+        """Ask the provider to stop a batch job (finished results are kept)."""
+        client = self._batch_client()
+        if self.config.provider == "anthropic":
+            client.messages.batches.cancel(batch_id)
+        else:
+            client.batches.cancel(batch_id)
+    
     def is_available(self) -> Tuple[bool, str]:
         """Check if API is configured."""
         if self.config.provider == "anthropic":
@@ -0,0 +1,108 @@
+"""
+Batch Jobs - Provider Batch APIs for Large Sweeps
+
+`batch` over thousands of files made one interactive call per file.
+Anthropic's Message Batches and OpenAI's Batch API take the same
+requests as one job, at about half the price and without the
+interactive rate limits; results arrive within hours rather than
+seconds, which is fine for a non-interactive sweep.
+
+run_batches() packs requests into jobs of chunk_size, polls them, and
+yields each job's results as soon as it ends, so a large sweep reports
+(and applies) results while later jobs are still running.
+
+Usage:
+    executor = APIExecutor(ExecutorConfig(type=ExecutorType.API))
+    requests = [BatchRequest(f"file-{i}", prompt) for i, prompt in enumerate(prompts)]
+    for custom_id, response in run_batches(executor, requests):
+        ...
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Set, Tuple
+
+from darkzloop.core.executors import ExecutorResponse
+from darkzloop.core.rate_limit import classify_error
+
+
+class BatchError(Exception):
+    """A batch job could not be submitted or read."""
+    pass
+
+
+@dataclass
+class BatchRequest:
+    """One prompt in a batch job; custom_id ties its result back to it."""
+    custom_id: str  # Letters, digits, "-" and "_", at most 64 characters
+    prompt: str
+    system_prompt: str = ""
+
+
+@dataclass
+class BatchStatus:
+    """Progress of a batch job."""
+    id: str
+    ended: bool
+    succeeded: int = 0
+    failed: int = 0  # Errored, cancelled or expired
+    processing: int = 0
+
+
+def run_batches(
+    executor,
+    requests: List[BatchRequest],
+    chunk_size: int = 1000,
+    poll_interval: float = 30.0,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Iterator[Tuple[str, ExecutorResponse]]:
+    """
+    Run requests as batch jobs; yields (custom_id, response) as jobs end.
+    
+    executor is an APIExecutor (anything with submit_batch, batch_status,
+    batch_results and cancel_batch). Every request gets exactly one
+    response: one the provider never returned comes back as a failure. A
+    status poll that fails transiently is retried on the next poll.
+    
+    If submitting or polling fails, or the caller stops early (Ctrl-C,
+    closing the generator), the jobs still running are cancelled so they
+    are not billed for results nobody will read.
+    """
+    pending: Dict[str, Set[str]] = {}
+    try:
+        for i in range(0, len(requests), chunk_size):
+            chunk = requests[i:i + chunk_size]
+            pending[executor.submit_batch(chunk)] = {r.custom_id for r in chunk}
+        
+        while pending:
+            for batch_id in list(pending):
+                try:
+                    status = executor.batch_status(batch_id)
+                except Exception as e:
+                    if not classify_error(e)[0]:
+                        raise
+                    continue
+                if not status.ended:
+                    continue
+                
+                expected = pending.pop(batch_id)  # ended: nothing left to cancel
+                for custom_id, response in executor.batch_results(batch_id):
+                    if custom_id in expected:
+                        expected.discard(custom_id)
+                        yield custom_id, response
+                for custom_id in sorted(expected):
+                    yield custom_id, ExecutorResponse(
+                        success=False,
+                        content="",
+                        raw_output="",
+                        error=f"No result for {custom_id} in batch {batch_id}",
+                    )
+            if pending:
+                sleep(poll_interval)
+    except BaseException:
+        for batch_id in pending:
+            try:
+                executor.cancel_batch(batch_id)
+            except Exception:
+                pass  # best effort; the original error is what matters
+        raise
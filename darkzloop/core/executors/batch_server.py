@@ -0,0 +1,184 @@
+"""
+Local Batch Server - Stand-in for a Provider Batch API
+
+A small HTTP server speaking Anthropic's Message Batches protocol, for
+tests and dry runs of `batch --batch-api` without a key or a bill.
+Point an API executor at it with base_url=server.url.
+
+- POST /v1/messages/batches               create a job
+- GET  /v1/messages/batches/{id}          status; the job ends after
+                                          polls_to_finish polls
+- GET  /v1/messages/batches/{id}/results  JSONL results once ended
+- POST /v1/messages/batches/{id}/cancel   cancel the job
+
+Each request's answer comes from responder(params) -> text (default: a
+no_op action).
+
+Usage:
+    with LocalBatchServer(responder=lambda params: '{"action": "no_op"}') as server:
+        executor = APIExecutor(ExecutorConfig(type=ExecutorType.API,
+                                              api_key="test", base_url=server.url))
+        results = list(run_batches(executor, requests, poll_interval=0))
+"""
+
+import json
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+
+def default_responder(params: dict) -> str:
+    return json.dumps({"action": "no_op", "reason": "local batch server"})
+
+
+class LocalBatchServer:
+    """Anthropic-compatible batch endpoints on 127.0.0.1 (random port)."""
+    
+    def __init__(self, responder: Callable[[dict], str] = None, polls_to_finish: int = 1):
+        self.responder = responder or default_responder
+        self.polls_to_finish = polls_to_finish
+        self.batches: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+    
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> "LocalBatchServer":
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                server._handle(self, "POST")
+            
+            def do_GET(self):
+                server._handle(self, "GET")
+            
+            def log_message(self, format, *args):
+                pass  # keep test output clean
+        
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._httpd.serve_forever, name="darkzloop-batch-server", daemon=True).start()
+        return self
+    
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+    
+    def __enter__(self) -> "LocalBatchServer":
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.stop()
+    
+    # =========================================================================
+    # Protocol
+    # =========================================================================
+    
+    def _handle(self, request: BaseHTTPRequestHandler, method: str):
+        path = request.path.split("?")[0]
+        body = None
+        if method == "POST":
+            length = int(request.headers.get("content-length") or 0)
+            body = json.loads(request.rfile.read(length) or b"{}")
+        
+        match = re.fullmatch(r"/v1/messages/batches(?:/([\w-]+))?(?:/(results|cancel))?", path)
+        if not match:
+            return self._send(request, 404, {"type": "error", "error": {"type": "not_found_error", "message": path}})
+        batch_id, verb = match.groups()
+        
+        with self._lock:
+            if batch_id is None and method == "POST":
+                return self._send(request, 200, self._create(body.get("requests", [])))
+            batch = self.batches.get(batch_id)
+            if batch is None:
+                return self._send(request, 404, {"type": "error", "error": {"type": "not_found_error", "message": batch_id}})
+            if verb is None and method == "GET":
+                batch["polls"] += 1
+                if batch["polls"] >= self.polls_to_finish:
+                    self._finish(batch)
+                return self._send(request, 200, self._batch_json(batch, request))
+            if verb == "cancel" and method == "POST":
+                self._finish(batch, canceled=True)
+                return self._send(request, 200, self._batch_json(batch, request))
+            if verb == "results" and method == "GET" and batch["status"] == "ended":
+                lines = "".join(json.dumps(r) + "\n" for r in batch["results"])
+                return self._send(request, 200, lines, content_type="application/x-jsonl")
+        return self._send(request, 400, {"type": "error", "error": {"type": "invalid_request_error", "message": path}})
+    
+    def _create(self, requests: list) -> dict:
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "requests": requests,
+            "status": "in_progress",
+            "polls": 0,
+            "results": [],
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "ended_at": None,
+        }
+        return self._batch_json(self.batches[batch_id])
+    
+    def _finish(self, batch: dict, canceled: bool = False):
+        """Answer every request of the job (or cancel the lot)."""
+        if batch["status"] == "ended":
+            return
+        for item in batch["requests"]:
+            if canceled:
+                result = {"type": "canceled"}
+            else:
+                params = item.get("params", {})
+                text = self.responder(params)
+                result = {"type": "succeeded", "message": {
+                    "id": f"msg_{uuid.uuid4().hex[:24]}",
+                    "type": "message",
+                    "role": "assistant",
+                    "model": params.get("model", "local"),
+                    "content": [{"type": "text", "text": text}],
+                    "stop_reason": "end_turn",
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": len(json.dumps(params)) // 4, "output_tokens": len(text) // 4},
+                }}
+            batch["results"].append({"custom_id": item.get("custom_id"), "result": result})
+        batch["status"] = "ended"
+        batch["ended_at"] = datetime.now(timezone.utc).isoformat()
+    
+    def _batch_json(self, batch: dict, request: BaseHTTPRequestHandler = None) -> dict:
+        ended = batch["status"] == "ended"
+        counts = {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+        if ended:
+            for result in batch["results"]:
+                counts[result["result"]["type"]] += 1
+        else:
+            counts["processing"] = len(batch["requests"])
+        results_url = None
+        if ended and request is not None:
+            results_url = f"http://{request.headers.get('host')}/v1/messages/batches/{batch['id']}/results"
+        return {
+            "id": batch["id"],
+            "type": "message_batch",
+            "processing_status": batch["status"],
+            "request_counts": counts,
+            "created_at": batch["created_at"],
+            "ended_at": batch["ended_at"],
+            "expires_at": batch["created_at"],
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": results_url,
+        }
+    
+    @staticmethod
+    def _send(request: BaseHTTPRequestHandler, status: int, payload, content_type: str = "application/json"):
+        data = (payload if isinstance(payload, str) else json.dumps(payload)).encode()
+        request.send_response(status)
+        request.send_header("content-type", content_type)
+        request.send_header("content-length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
@@ -0,0 +1,189 @@
+"""
+Hedged Executor - Race a Slow Backend Against a Second One
+
+Backends have long latency tails: most completions take seconds, and
+the occasional one takes three minutes and dominates p99 iteration time.
+
+The hedged executor sends each prompt to the primary. If no answer has
+arrived by the primary's p95 latency, the same prompt goes to the
+secondary too. The first response with a valid action wins and the other
+request is cancelled (a shell tool's whole process tree is killed).
+Duplicates are capped at config.hedge_budget of all requests, so hedging
+can't double the bill when the primary is slow across the board.
+
+The primary's latencies are kept in .darkzloop/latency.json under
+"hedge:<backend>"; nothing is hedged until it has a history.
+
+Hedge only backends whose output is the action (print mode). Two agentic
+tools editing the same tree at once would race each other.
+
+Usage:
+    executor = create_executor(ExecutorConfig(
+        type=ExecutorType.HEDGED,
+        hedge_primary={"type": "shell", "command": "ollama", "args": ["run", "codellama"]},
+        hedge_secondary={"type": "api", "provider": "anthropic"},
+    ))
+    response = executor.execute(prompt)
+    response.hedged  # None, "primary" or "secondary"
+"""
+
+import asyncio
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from darkzloop.core.executors import (
+    BaseExecutor, ExecutorConfig, ExecutorResponse,
+    ExecutorType, register_executor, create_executor
+)
+from darkzloop.core.latency import AdaptiveTimeouts
+
+
+@register_executor(ExecutorType.HEDGED)
+class HedgedExecutor(BaseExecutor):
+    """
+    Wraps a primary and a secondary executor (config.hedge_primary and
+    config.hedge_secondary, built with create_executor).
+    
+    Natively async; execute() runs the race on the executor's own event
+    loop thread, so the backends' async clients are reused across calls.
+    """
+    
+    def __init__(self, config: ExecutorConfig):
+        super().__init__(config)
+        if not config.hedge_primary or not config.hedge_secondary:
+            raise ValueError("Hedged executor needs hedge_primary and hedge_secondary configs")
+        self.primary = create_executor(self._inner_config(config.hedge_primary))
+        self.secondary = create_executor(self._inner_config(config.hedge_secondary))
+        
+        self.timeouts = AdaptiveTimeouts(Path(config.cwd) if config.cwd else None)
+        self.latency_key = f"hedge:{self.primary.rate_limit_key()}"
+        
+        # Duplicate budget
+        self.requests = 0
+        self.hedges = 0
+        self._budget_lock = threading.Lock()
+        
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+    
+    def _inner_config(self, data: dict) -> ExecutorConfig:
+        """A backend's config; it runs in the hedged executor's cwd unless told otherwise."""
+        inner = ExecutorConfig.from_dict(data)
+        if not inner.cwd:
+            inner.cwd = self.config.cwd
+        return inner
+    
+    def cache_model(self) -> str:
+        return f"{self.primary.cache_model()} | {self.secondary.cache_model()}"
+    
+    def is_available(self) -> Tuple[bool, str]:
+        ok, message = self.primary.is_available()
+        if not ok:
+            return False, f"Primary: {message}"
+        ok, message = self.secondary.is_available()
+        if not ok:
+            return False, f"Secondary: {message}"
+        return True, "Primary and secondary available"
+    
+    def _execute(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
+        """Run the race on the executor's event loop thread."""
+        future = asyncio.run_coroutine_threadsafe(self._race(prompt, system_prompt), self._get_loop())
+        return future.result()
+    
+    async def _execute_async(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
+        return await self._race(prompt, system_prompt)
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """The executor's event loop, running in a daemon thread."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="darkzloop-hedge", daemon=True).start()
+            return self._loop
+    
+    # =========================================================================
+    # Hedging
+    # =========================================================================
+    
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for the primary before hedging (None: no history yet)."""
+        hist = self.timeouts.histograms.get(self.latency_key)
+        if hist is None or hist.samples < self.timeouts.min_samples:
+            return None
+        return hist.percentile(self.config.hedge_quantile) / 1000
+    
+    def _count_request(self):
+        with self._budget_lock:
+            self.requests += 1
+    
+    def _take_hedge(self) -> bool:
+        """Spend one duplicate if the budget allows it."""
+        with self._budget_lock:
+            if self.hedges >= self.config.hedge_budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+    
+    @staticmethod
+    def _valid(response: ExecutorResponse) -> bool:
+        return response.success and response.get_action() is not None
+    
+    async def _race(self, prompt: str, system_prompt: str) -> ExecutorResponse:
+        """Primary first; the secondary joins at the primary's p95 (budget permitting)."""
+        self._count_request()
+        start = time.monotonic()
+        primary = asyncio.ensure_future(self.primary.execute_async(prompt, system_prompt))
+        primary.add_done_callback(lambda task: self._record(start, task))
+        
+        delay = self.hedge_delay()
+        if delay is not None:
+            try:
+                await asyncio.wait({primary}, timeout=delay)
+            except asyncio.CancelledError:
+                primary.cancel()
+                raise
+        if primary.done() or delay is None or not self._take_hedge():
+            return await primary
+        
+        secondary = asyncio.ensure_future(self.secondary.execute_async(prompt, system_prompt))
+        names = {primary: "primary", secondary: "secondary"}
+        pending = {primary, secondary}
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Prefer the primary if both finished in the same tick
+                for task in sorted(done, key=lambda t: t is not primary):
+                    if not task.cancelled() and task.exception() is None and self._valid(task.result()):
+                        winner = task
+                        break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)  # let the loser clean up (kill its process)
+        
+        if winner is None:
+            # Neither had a valid action: report the primary's answer if it has one
+            finished = [t for t in (primary, secondary) if not t.cancelled() and t.exception() is None]
+            winner = finished[0] if finished else primary
+        response = winner.result()
+        response.hedged = names[winner]
+        return response
+    
+    def _record(self, start: float, task: asyncio.Future):
+        """
+        Add a primary call to its latency history when it ends.
+        
+        A cancelled call took at least this long, so the tail still shows
+        up; failures and cache hits say nothing about latency.
+        """
+        if not task.cancelled():
+            if task.exception() is not None:
+                return
+            response = task.result()
+            if not response.success or response.cached:
+                return
+        self.timeouts.record(self.latency_key, (time.monotonic() - start) * 1000)
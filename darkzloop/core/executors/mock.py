@@ -8,8 +8,10 @@ Usage:
     executor = MockExecutor(ExecutorConfig(type=ExecutorType.MOCK))
     executor.set_response('{"action": "read_file", "path": "test.py"}')
     response = executor.execute(prompt)
+    response = await executor.execute_async(prompt)
 """
 
+import asyncio
 import time
 from typing import Tuple, List, Optional
 import json
@@ -29,7 +31,7 @@ class MockExecutor(BaseExecutor):
     - Predictable responses
     - Response queue for multi-turn testing
     - Prompt capture for assertions
-    - Simulated latency
+    - Simulated latency (execute_async sleeps without a thread)
     """
     
     def __init__(self, config: ExecutorConfig):
@@ -39,7 +41,7 @@ class MockExecutor(BaseExecutor):
         self._captured_prompts: List[str] = []
         self._latency_ms: int = 0
     
-    def execute(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
+    def _execute(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
         """Execute and return mock response."""
         start_time = time.time()
         
@@ -50,6 +52,20 @@ class MockExecutor(BaseExecutor):
         if self._latency_ms > 0:
             time.sleep(self._latency_ms / 1000)
         
+        return self._respond(start_time)
+    
+    async def _execute_async(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
+        """Async execute; simulated latency doesn't hold a thread."""
+        start_time = time.time()
+        self._captured_prompts.append(prompt)
+        
+        if self._latency_ms > 0:
+            await asyncio.sleep(self._latency_ms / 1000)
+        
+        return self._respond(start_time)
+    
+    def _respond(self, start_time: float) -> ExecutorResponse:
+        """Pop the next queued response."""
         # Get response
         if self._responses:
             content = self._responses.pop(0)
@@ -11,27 +11,37 @@ Executes prompts via native CLI tools like:
 This enables "Bring Your Own Auth" (BYOA) - users leverage their
 existing subscriptions without managing API keys.
 
+Output is streamed: each line is cleaned as it arrives and passed to
+on_progress, and in print mode the tool is stopped as soon as its JSON
+action is complete (config.stop_on_action).
+
 Usage:
     executor = ShellExecutor(ExecutorConfig(
         type=ExecutorType.SHELL,
         command="claude",
         args=["--print"],
     ))
+    executor.on_progress = lambda line: print(line)  # optional
     response = executor.execute(prompt)
+    response = await executor.execute_async(prompt)
 """
 
 import subprocess
 import shutil
-import time
 import re
 import os
-from typing import Tuple, Optional, List
+from pathlib import Path
+from typing import Callable, Tuple, Optional, List
 from dataclasses import dataclass
 
 from darkzloop.core.executors import (
     BaseExecutor, ExecutorConfig, ExecutorResponse,
     ExecutorType, register_executor
 )
+from darkzloop.core.supervisor import ProcessResult, run_supervised, run_supervised_async
+from darkzloop.core.executors.streaming import LineStream, strip_ansi, is_noise
+from darkzloop.core.latency import AdaptiveTimeouts, AGENT_TIMEOUT_LIMITS
+from darkzloop.core.rate_limit import THROTTLED_OUTPUT
 from darkzloop.core.executors.presets import (
     PRESETS, get_preset, list_presets, detect_available_presets,
     ToolPreset, get_recommended_preset
@@ -65,9 +75,12 @@ class ShellExecutor(BaseExecutor):
     - Argument mode: Passes prompt as command argument
     
     Features:
-    - ANSI code stripping (removes colors/spinners)
+    - ANSI code stripping (removes colors/spinners), line by line as
+      output arrives
+    - Live progress (on_progress) and early stop once the action is out
     - Timeout handling
     - Error recovery
+    - Native async execution (execute_async runs the tool on the event loop)
     """
     
     # Headless mode instruction - prevents interactive behavior
@@ -87,6 +100,9 @@ Your response must be valid JSON with this structure:
 }
 """
     
+    # Characters of tool output kept in memory (head + tail)
+    OUTPUT_LIMIT = 1_000_000
+    
     def __init__(self, config: ExecutorConfig):
         super().__init__(config)
         self.preset = get_preset(config.command)
@@ -94,8 +110,32 @@ Your response must be valid JSON with this structure:
         # Apply preset if available
         if self.preset and not config.args:
             config.args = self.preset.args
+        
+        # Latency history for this backend; timeouts follow its p99
+        self.timeouts = (
+            AdaptiveTimeouts(Path(config.cwd) if config.cwd else None)
+            if config.adaptive_timeout else None
+        )
+        self.latency_key = f"agent:{Path(config.command).stem}"
+        
+        # Called with each cleaned line of tool output as it arrives
+        self.on_progress: Optional[Callable[[str], None]] = None
+    
+    def _timeout(self) -> float:
+        """timeout_seconds until the backend has a latency history, then p99 x margin."""
+        if not self.timeouts:
+            return self.config.timeout_seconds
+        return self.timeouts.timeout(self.latency_key, self.config.timeout_seconds, *AGENT_TIMEOUT_LIMITS)
+    
+    def cache_model(self) -> str:
+        """The tool and its arguments stand in for the model in response cache keys."""
+        return " ".join([self.config.command] + self.config.args)
     
-    def execute(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
+    def rate_limit_key(self) -> str:
+        """Every run of the same tool shares its account's rate limit."""
+        return f"shell/{self.config.command}"
+    
+    def _execute(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
         """
         Execute prompt via shell command.
 
@@ -103,10 +143,38 @@ Your response must be valid JSON with this structure:
         - stdin_mode: Pipes prompt to tool's stdin (safer, no length limits)
         - argument_mode: Passes prompt as command-line argument
         """
-        start_time = time.time()
-
+        stream = self._stream()
+        result = run_supervised(**self._run_args(prompt, system_prompt), on_stdout=stream.feed)
+        return self._response(result, stream)
+    
+    async def _execute_async(self, prompt: str, system_prompt: str = "") -> ExecutorResponse:
+        """Async execute; the tool's pipes and exit are watched by the event loop."""
+        stream = self._stream()
+        result = await run_supervised_async(**self._run_args(prompt, system_prompt), on_stdout=stream.feed)
+        return self._response(result, stream)
+    
+    def _agentic(self) -> bool:
+        """Whether the tool edits files itself (rather than printing an action)."""
+        return bool(self.preset and not self.preset.stdin_mode)
+    
+    def _stream(self) -> LineStream:
+        """
+        Line-by-line cleaner for one run's stdout.
+        
+        Only print-mode tools are stopped at their action; an agentic tool
+        may print JSON while it still has files to edit.
+        """
+        return LineStream(
+            strip=self.config.strip_ansi,
+            on_line=self.on_progress,
+            stop_on_action=self.config.stop_on_action and not self._agentic(),
+            limit=self.OUTPUT_LIMIT,
+        )
+    
+    def _run_args(self, prompt: str, system_prompt: str) -> dict:
+        """Supervisor arguments for running the tool on prompt."""
         # For agentic tools that edit files directly, use a simpler prompt
-        if self.preset and not self.preset.stdin_mode:
+        if self._agentic():
             # Agentic mode - tool will edit files directly
             full_prompt = prompt  # Don't add HEADLESS_PREFIX for agentic tools
         else:
@@ -126,91 +194,66 @@ Your response must be valid JSON with this structure:
             cmd.append(full_prompt)
             use_stdin = False
 
-        try:
-            # Execute command
-            if use_stdin:
-                # Stdin mode: pipe prompt to stdin (UTF-8 encoded for Windows)
-                result = subprocess.run(
-                    cmd,
-                    input=full_prompt.encode('utf-8'),
-                    capture_output=True,
-                    timeout=self.config.timeout_seconds,
-                    env=self._get_env(),
-                    cwd=self.config.cwd if hasattr(self.config, 'cwd') else None,
-                )
-            else:
-                # Argument mode: for agentic tools, don't capture output so they can edit files
-                # Run with stdin/stdout inherited for tool use
-                result = subprocess.run(
-                    cmd,
-                    capture_output=False,  # Let Claude CLI use tools
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    timeout=self.config.timeout_seconds,
-                    env=self._get_env(),
-                    cwd=self.config.cwd if self.config.cwd else None,
-                )
-
-            # Decode output as UTF-8
-            result_stdout = result.stdout.decode('utf-8', errors='replace')
-            result_stderr = result.stderr.decode('utf-8', errors='replace')
-
-            duration_ms = int((time.time() - start_time) * 1000)
-            raw_output = result_stdout
-
-            # Strip ANSI codes if configured
-            if self.config.strip_ansi:
-                output = self._strip_ansi_codes(raw_output)
-            else:
-                output = raw_output
-
-            # Clean up output
-            output = self._clean_output(output)
-
-            # Check for errors
-            if result.returncode != 0:
-                return ExecutorResponse(
-                    success=False,
-                    content="",
-                    raw_output=raw_output,
-                    error=f"Command failed (exit {result.returncode}): {result_stderr}",
-                    duration_ms=duration_ms,
-                )
-
-            # Try to parse JSON action from output
-            action = self._extract_action(output)
+        # The supervisor runs the tool in its own process group, so a
+        # timeout also kills whatever the tool started. A tool that prints
+        # nothing for idle_timeout_seconds is treated as hung.
+        return dict(
+            command=cmd,
+            timeout=self._timeout(),
+            idle_timeout=self.config.idle_timeout_seconds or None,
+            # Stdin mode: pipe prompt to stdin (UTF-8 encoded for Windows)
+            input=full_prompt.encode('utf-8') if use_stdin else None,
+            env=self._get_env(),
+            cwd=self.config.cwd or None,
+            stdout_limit=self.OUTPUT_LIMIT,
+            stderr_limit=self.OUTPUT_LIMIT // 10,
+        )
+    
+    def _response(self, result: ProcessResult, stream: LineStream) -> ExecutorResponse:
+        """Record the run's latency and turn its output into a response."""
+        usage = {"cpu_seconds": result.cpu_seconds, "max_rss_kb": result.max_rss_kb}
+        if self.timeouts and not result.stopped:
+            # A stopped run says nothing about how long the tool takes
+            self.timeouts.record_result(self.latency_key, result)
+        output = stream.finish()
 
-            return ExecutorResponse(
-                success=True,
-                content=output,
-                raw_output=raw_output,
-                action=action,
-                duration_ms=duration_ms,
-            )
-            
-        except subprocess.TimeoutExpired:
-            return ExecutorResponse(
-                success=False,
-                content="",
-                raw_output="",
-                error=f"Command timed out after {self.config.timeout_seconds}s",
-                duration_ms=int((time.time() - start_time) * 1000),
-            )
-        except FileNotFoundError:
+        if result.error:
             return ExecutorResponse(
                 success=False,
                 content="",
-                raw_output="",
-                error=f"Command not found: {self.config.command}",
+                raw_output=result.stdout,
+                error=result.error,
+                duration_ms=result.duration_ms,
+                hung=result.hung,
+                **usage,
             )
-        except Exception as e:
+
+        raw_output = result.stdout
+
+        # Check for errors
+        if not result.success:
             return ExecutorResponse(
                 success=False,
                 content="",
-                raw_output="",
-                error=str(e),
-                duration_ms=int((time.time() - start_time) * 1000),
+                raw_output=raw_output,
+                error=f"Command failed (exit {result.returncode}): {result.stderr}",
+                duration_ms=result.duration_ms,
+                retryable=bool(THROTTLED_OUTPUT.search(result.stderr or "")),  # throttled: retry
+                **usage,
             )
+
+        # The action the tool was stopped at, else parse it from the output
+        action = stream.action if result.stopped else self._extract_action(output)
+
+        return ExecutorResponse(
+            success=True,
+            content=output,
+            raw_output=raw_output,
+            action=action,
+            duration_ms=result.duration_ms,
+            stopped_early=result.stopped,
+            **usage,
+        )
     
     def is_available(self) -> Tuple[bool, str]:
         """Check if the shell command is available."""
@@ -255,40 +298,16 @@ Your response must be valid JSON with this structure:
     
     def _strip_ansi_codes(self, text: str) -> str:
         """Remove ANSI escape codes (colors, cursor movement, etc.)."""
-        # Standard ANSI escape sequences
-        ansi_escape = re.compile(r'''
-            \x1B  # ESC
-            (?:   # 7-bit C1 Fe (except CSI)
-                [@-Z\\-_]
-            |     # or [ for CSI, followed by a control sequence
-                \[
-                [0-?]*  # Parameter bytes
-                [ -/]*  # Intermediate bytes
-                [@-~]   # Final byte
-            )
-        ''', re.VERBOSE)
-        
-        text = ansi_escape.sub('', text)
-        
-        # Also remove carriage returns and clear line sequences
-        text = re.sub(r'\r', '', text)
-        
-        return text
+        return strip_ansi(text)
     
     def _clean_output(self, text: str) -> str:
-        """Clean up output from CLI tools."""
+        """Clean up output from CLI tools (the same filter LineStream applies)."""
         lines = text.split('\n')
         cleaned = []
         
         for line in lines:
             # Skip common CLI noise
-            if any(skip in line.lower() for skip in [
-                'loading',
-                'thinking',
-                'processing',
-                '...',
-                'streaming',
-            ]):
+            if is_noise(line):
                 continue
             
             # Skip empty lines at start
@@ -0,0 +1,265 @@
+"""
+Streaming helpers for executors.
+
+Agents answer with a JSON action object, often followed by a long
+explanation nobody reads. When the response is streamed, the action can be
+parsed the moment its closing brace arrives and the rest of the generation
+cancelled, saving both latency and output tokens.
+
+CLI tools are streamed the same way: LineStream cleans their stdout line
+by line as it arrives (ANSI codes, spinner noise), reports progress, and
+tells the supervisor to stop the tool once its action is complete.
+
+Usage:
+    scanner = ActionScanner()
+    for delta in stream:
+        action = scanner.feed(delta)
+        if action:
+            break  # close the stream; the model stops generating
+"""
+
+import codecs
+import json
+import re
+import time
+from dataclasses import dataclass
+from typing import AsyncIterable, Callable, Iterable, List, Optional
+
+
+# ANSI escape sequences (colors, cursor movement, ...)
+ANSI_ESCAPE = re.compile(r'''
+    \x1B  # ESC
+    (?:   # 7-bit C1 Fe (except CSI)
+        [@-Z\\-_]
+    |     # or [ for CSI, followed by a control sequence
+        \[
+        [0-?]*  # Parameter bytes
+        [ -/]*  # Intermediate bytes
+        [@-~]   # Final byte
+    )
+''', re.VERBOSE)
+
+# Lines CLI tools print while they work (spinners, status)
+CLI_NOISE = ('loading', 'thinking', 'processing', '...', 'streaming')
+
+
+def strip_ansi(text: str) -> str:
+    """Remove ANSI escape codes and carriage returns."""
+    return ANSI_ESCAPE.sub('', text).replace('\r', '')
+
+
+def is_noise(line: str) -> bool:
+    """Whether a line is CLI chatter rather than output."""
+    lowered = line.lower()
+    return any(word in lowered for word in CLI_NOISE)
+
+
+class ActionScanner:
+    """
+    Incremental scanner for the first complete JSON action object in text.
+    
+    Tracks brace depth outside of JSON strings, so braces inside string
+    values and code fences around the object are handled. Objects without
+    the required key (e.g. a JSON example in prose) are skipped.
+    """
+    
+    def __init__(self, required_key: str = "action"):
+        self.required_key = required_key
+        self.action: Optional[dict] = None
+        self._chars: list = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+    
+    def feed(self, text: str) -> Optional[dict]:
+        """Scan the next chunk; returns the action once it is complete."""
+        if self.action is not None:
+            return self.action
+        
+        for ch in text:
+            if self._depth == 0:
+                if ch != "{":
+                    continue
+                self._chars = []
+            self._chars.append(ch)
+            
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.action = self._parse("".join(self._chars))
+                    if self.action is not None:
+                        return self.action
+        return None
+    
+    def _parse(self, candidate: str) -> Optional[dict]:
+        try:
+            obj = json.loads(candidate)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(obj, dict) and self.required_key in obj:
+            return obj
+        return None
+
+
+@dataclass
+class StreamResult:
+    """Text collected from a stream, with timing."""
+    content: str
+    action: Optional[dict]
+    ttft_ms: Optional[int]  # time to first token, from the request start
+    generation_s: float  # first token to last token consumed
+    stopped_early: bool  # the stream was closed after the action arrived
+    
+    def tokens_per_second(self, output_tokens: Optional[int]) -> Optional[float]:
+        if not output_tokens or self.generation_s <= 0:
+            return None
+        return output_tokens / self.generation_s
+
+
+class _Collector:
+    """Accumulates deltas and timing; shared by the sync and async collectors."""
+    
+    def __init__(self, start_time: float, stop_on_action: bool):
+        self.start_time = start_time
+        self.stop_on_action = stop_on_action
+        self.scanner = ActionScanner()
+        self.parts = []
+        self.first = self.last = None
+        self.stopped_early = False
+    
+    def add(self, delta: str) -> bool:
+        """Take one delta; True when reading should stop."""
+        if not delta:
+            return False
+        self.last = time.time()
+        if self.first is None:
+            self.first = self.last
+        self.parts.append(delta)
+        if self.scanner.feed(delta) is not None and self.stop_on_action:
+            self.stopped_early = True
+        return self.stopped_early
+    
+    def result(self) -> StreamResult:
+        first, last = self.first, self.last
+        return StreamResult(
+            content="".join(self.parts),
+            action=self.scanner.action,
+            ttft_ms=int((first - self.start_time) * 1000) if first is not None else None,
+            generation_s=(last - first) if first is not None else 0.0,
+            stopped_early=self.stopped_early,
+        )
+
+
+def collect_stream(
+    deltas: Iterable[str],
+    start_time: float,
+    stop_on_action: bool = True
+) -> StreamResult:
+    """
+    Consume text deltas, scanning for the action as they arrive.
+    
+    With stop_on_action, stops reading at the action's closing brace; the
+    caller must then close the stream to cancel the rest of the generation.
+    start_time is a time.time() value taken before the request was sent.
+    """
+    collector = _Collector(start_time, stop_on_action)
+    for delta in deltas:
+        if collector.add(delta):
+            break
+    return collector.result()
+
+
+async def collect_stream_async(
+    deltas: AsyncIterable[str],
+    start_time: float,
+    stop_on_action: bool = True
+) -> StreamResult:
+    """collect_stream for async streams."""
+    collector = _Collector(start_time, stop_on_action)
+    async for delta in deltas:
+        if collector.add(delta):
+            break
+    return collector.result()
+
+
+class LineStream:
+    """
+    A CLI tool's stdout, cleaned line by line as it arrives.
+    
+    feed() takes raw chunks (the supervisor's on_stdout hook). Each complete
+    line is decoded, stripped of ANSI codes, scanned for the JSON action
+    and, unless it is noise, kept and passed to on_line. With
+    stop_on_action, feed() returns True once the action is complete, which
+    stops the tool: nothing after the action is worth waiting for.
+    
+    Usage:
+        stream = LineStream(on_line=print, stop_on_action=True)
+        result = run_supervised(cmd, on_stdout=stream.feed)
+        output = stream.finish()
+    """
+    
+    def __init__(
+        self,
+        strip: bool = True,
+        on_line: Optional[Callable[[str], None]] = None,
+        stop_on_action: bool = False,
+        limit: int = 1_000_000
+    ):
+        self.strip = strip
+        self.on_line = on_line
+        self.stop_on_action = stop_on_action
+        self.limit = limit  # characters of cleaned output kept
+        self.scanner = ActionScanner()
+        self.lines: List[str] = []
+        self.size = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._partial = ""
+    
+    @property
+    def action(self) -> Optional[dict]:
+        return self.scanner.action
+    
+    def feed(self, data: bytes) -> bool:
+        """Take a chunk of stdout; True when the tool should be stopped."""
+        *complete, self._partial = (self._partial + self._decoder.decode(data)).split("\n")
+        for line in complete:
+            if self._line(line):
+                return True
+        return False
+    
+    def finish(self) -> str:
+        """Flush the last (unterminated) line; returns the cleaned output."""
+        tail = self._partial + self._decoder.decode(b"", final=True)
+        self._partial = ""
+        if tail:
+            self._line(tail)
+        lines = list(self.lines)
+        while lines and not lines[-1].strip():
+            lines.pop()
+        return "\n".join(lines)
+    
+    def _line(self, line: str) -> bool:
+        if self.strip:
+            line = strip_ansi(line)
+        # Scanned before the noise filter: a JSON string may well contain "..."
+        done = self.scanner.feed(line + "\n") is not None and self.stop_on_action
+        
+        if is_noise(line) or (not self.lines and not line.strip()):
+            return done
+        if self.size < self.limit:
+            self.lines.append(line)
+            self.size += len(line) + 1
+        if self.on_line and line.strip():
+            self.on_line(line)
+        return done
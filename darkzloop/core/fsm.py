@@ -38,6 +38,16 @@ class LoopState(Enum):
     BLOCKED = "blocked"            # Waiting for human intervention
 
 
+class FailureKind(Enum):
+    """
+    Why a task failed. Recorded on TASK_FAILURE transitions so hung agents,
+    agent errors and gate failures can be told apart (all are retryable).
+    """
+    AGENT_ERROR = "agent_error"  # Agent exited with an error
+    AGENT_HUNG = "agent_hung"    # Agent stopped producing output and was killed
+    GATE_FAILED = "gate_failed"  # Quality gate rejected the change
+
+
 # Define valid state transitions (edges in the FSM graph)
 VALID_TRANSITIONS: Dict[LoopState, Set[LoopState]] = {
     LoopState.INIT: {LoopState.PLAN, LoopState.FATAL_ERROR},
@@ -85,6 +95,9 @@ class FSMContext:
     current_task_id: Optional[str] = None
     max_task_retries: int = 3
     
+    # Failures per FailureKind value, e.g. {"agent_hung": 2}
+    failure_counts: Dict[str, int] = field(default_factory=dict)
+    
     def can_transition(self, to_state: LoopState) -> bool:
         """Check if a transition is valid without executing it."""
         return to_state in VALID_TRANSITIONS.get(self.current_state, set())
@@ -159,7 +172,12 @@ class FSMContext:
             return True, "max_failures_reached"
         return False, ""
     
-    def fail_task(self, reason: str = "", can_retry: bool = True) -> bool:
+    def fail_task(
+        self,
+        reason: str = "",
+        can_retry: bool = True,
+        kind: Optional[FailureKind] = None
+    ) -> bool:
         """
         Record a task failure.
         
@@ -167,9 +185,26 @@ class FSMContext:
             reason: Why the task failed
             can_retry: If True, goes to TASK_FAILURE (retryable). 
                       If False, goes to FATAL_ERROR (stops loop).
+            kind: Optional FailureKind, kept in the transition metadata
         """
         target_state = LoopState.TASK_FAILURE if can_retry else LoopState.FATAL_ERROR
-        return self.transition(target_state, reason)
+        return self.transition(target_state, reason, self._failure_metadata(kind))
+    
+    def _failure_metadata(self, kind: Optional[FailureKind]) -> dict:
+        """Count a failure kind and return the metadata recording it."""
+        if kind is None:
+            return {}
+        self.failure_counts[kind.value] = self.failure_counts.get(kind.value, 0) + 1
+        return {"failure_kind": kind.value}
+    
+    @property
+    def last_failure_kind(self) -> Optional[FailureKind]:
+        """Kind of the most recent recorded failure, if it had one."""
+        for t in reversed(self.transitions):
+            if t.to_state in {LoopState.TASK_FAILURE, LoopState.BLOCKED, LoopState.FATAL_ERROR}:
+                kind = t.metadata.get("failure_kind")
+                return FailureKind(kind) if kind else None
+        return None
     
     def escalate_to_fatal(self, reason: str = "") -> bool:
         """Escalate from TASK_FAILURE to FATAL_ERROR (too many retries)."""
@@ -184,7 +219,11 @@ class FSMContext:
         if task_id not in self.task_retries:
             self.task_retries[task_id] = 0
     
-    def record_task_failure(self, reason: str = "") -> tuple[LoopState, str]:
+    def record_task_failure(
+        self,
+        reason: str = "",
+        kind: Optional[FailureKind] = None
+    ) -> tuple[LoopState, str]:
         """
         Record a task failure with per-task retry tracking.
         
@@ -195,8 +234,12 @@ class FSMContext:
         
         This is the circuit breaker that prevents:
         TASK_FAILURE -> PLAN -> TASK_FAILURE -> PLAN... (infinite loop)
+        
+        kind (e.g. FailureKind.AGENT_HUNG) is recorded in the transition
+        metadata either way.
         """
         task_id = self.current_task_id
+        metadata = self._failure_metadata(kind)
         
         if task_id:
             self.task_retries[task_id] = self.task_retries.get(task_id, 0) + 1
@@ -204,11 +247,11 @@ class FSMContext:
             
             if retries >= self.max_task_retries:
                 # Circuit breaker: too many retries on this task
-                self.transition(LoopState.BLOCKED, f"Task {task_id} failed {retries} times - needs human help")
+                self.transition(LoopState.BLOCKED, f"Task {task_id} failed {retries} times - needs human help", metadata)
                 return LoopState.BLOCKED, f"max_retries_exceeded ({retries})"
         
         # Normal failure - can retry
-        self.transition(LoopState.TASK_FAILURE, reason)
+        self.transition(LoopState.TASK_FAILURE, reason, metadata)
         return LoopState.TASK_FAILURE, "retry"
     
     def get_task_retry_count(self, task_id: str = None) -> int:
@@ -228,6 +271,7 @@ class FSMContext:
             "current_state": self.current_state.value,
             "iteration": self.iteration,
             "consecutive_failures": self.consecutive_failures,
+            "failure_counts": self.failure_counts,
             "transitions": [
                 {
                     "from": t.from_state.value,
@@ -235,6 +279,7 @@ class FSMContext:
                     "timestamp": t.timestamp,
                     "reason": t.reason,
                     "iteration": t.iteration,
+                    **{k: v for k, v in t.metadata.items() if k == "failure_kind"},
                 }
                 for t in self.transitions[-10:]  # Keep last 10 for context economy
             ]
@@ -247,6 +292,7 @@ class FSMContext:
             current_state=LoopState(data["current_state"]),
             iteration=data.get("iteration", 0),
             consecutive_failures=data.get("consecutive_failures", 0),
+            failure_counts=data.get("failure_counts", {}),
         )
         return ctx
     
@@ -0,0 +1,120 @@
+"""
+darkzloop Gate Result Cache
+
+Quality gates rerun after every iteration, even when the tree is
+byte-identical to one they already passed on (a retry that changed
+nothing, a task that only touched docs outside the project). Slow gates
+like `cargo test` make that the most expensive part of the loop.
+
+Solution: cache passing gate results by content.
+- Key = (gate command, git tree hash of the project directory)
+- The tree hash covers uncommitted and untracked changes (ignored files
+  and .darkzloop/ are excluded) without touching the real index
+- Entries live in .darkzloop/cache/gates, shared by every worktree
+- Only passes are cached, so a flaky failure is always rerun
+
+Rule: "A gate never runs twice on the same bytes."
+"""
+
+from datetime import datetime
+from typing import Optional
+from pathlib import Path
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+
+class GateCache:
+    """
+    Content-addressed cache of passing gate results.
+    
+    Usage:
+        cache = GateCache(project_root)
+        tree = cache.tree_hash(work_dir)
+        if cache.get(command, tree) is None:
+            ok, stdout, _ = run(command)
+            if ok:
+                cache.put(command, tree, stdout)
+    """
+    
+    def __init__(self, project_root: Path = None):
+        self.cache_dir = Path(project_root or Path.cwd()) / ".darkzloop" / "cache" / "gates"
+    
+    def tree_hash(self, cwd: Path) -> Optional[str]:
+        """
+        Hash of the working tree under cwd, including uncommitted changes.
+        
+        Stages into a scratch copy of the index, so the real index is left
+        alone and unchanged files are not rehashed. None if cwd is not in a
+        git repository.
+        """
+        info = subprocess.run(
+            ["git", "rev-parse", "--path-format=absolute", "--git-path", "index", "--show-prefix"],
+            cwd=cwd,
+            capture_output=True,
+        )
+        if info.returncode != 0:
+            return None
+        index_path, *prefix = info.stdout.decode().splitlines()
+        prefix = prefix[0] if prefix else ""
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            scratch = Path(tmp) / "index"
+            if Path(index_path).exists():
+                shutil.copy2(index_path, scratch)  # keeps stat data valid
+            env = dict(os.environ, GIT_INDEX_FILE=str(scratch))
+            
+            added = subprocess.run(
+                ["git", "add", "-A", "--", ".", ":(exclude).darkzloop"],
+                cwd=cwd,
+                env=env,
+                capture_output=True,
+            )
+            if added.returncode != 0:
+                return None
+            
+            tree = subprocess.run(
+                ["git", "write-tree"] + ([f"--prefix={prefix}"] if prefix else []),
+                cwd=cwd,
+                env=env,
+                capture_output=True,
+            )
+            if tree.returncode != 0:
+                return None
+            return tree.stdout.decode().strip()
+    
+    def _entry_path(self, command: str, tree: str) -> Path:
+        key = hashlib.sha256(f"{command}\0{tree}".encode()).hexdigest()
+        return self.cache_dir / f"{key}.json"
+    
+    def get(self, command: str, tree: Optional[str]) -> Optional[dict]:
+        """Cached pass for command on tree, or None."""
+        if not tree:
+            return None
+        path = self._entry_path(command, tree)
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+    
+    def put(self, command: str, tree: Optional[str], stdout: str = ""):
+        """Record that command passed on tree."""
+        if not tree:
+            return
+        path = self._entry_path(command, tree)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "command": command,
+            "tree": tree,
+            "stdout": stdout,
+            "timestamp": datetime.now().isoformat(),
+        }
+        # Write-then-rename so concurrent workers never read a partial entry
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
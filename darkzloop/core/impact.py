@@ -0,0 +1,458 @@
+"""
+darkzloop Change-Impact Test Selection
+
+Tier 2 test gates (pytest, cargo test, go test) run the whole suite after
+every iteration, even when the task touched a single module. On a large
+repository that is minutes per iteration for a handful of relevant tests.
+
+Solution: narrow the test command to what the change can affect.
+- Changed files = the task's claimed files + the git diff (and untracked
+  files) against HEAD
+- A dependency map of the project (Python imports, Go package imports,
+  Cargo path dependencies) finds everything that depends on them
+- The test command is rewritten to run only the affected tests
+- Anything the map cannot see (build files, conftest.py, data files)
+  falls back to the full suite, and every Nth run is a full run anyway
+
+The same change set scopes lint gates: scope_to_files() rewrites
+`ruff check .` into `ruff check a.py b.py`, with a periodic full run to
+catch cross-file problems. `npm run lint` is resolved through package.json
+to the linter it runs.
+
+Rule: "Run the tests the change can break. When in doubt, run them all."
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from pathlib import Path
+import ast
+import json
+import os
+import re
+import shlex
+import subprocess
+
+
+# Directories never scanned for sources
+SKIP_DIRS = {
+    ".git", ".darkzloop", ".hg", ".svn", "__pycache__", "node_modules",
+    ".venv", "venv", "env", ".tox", ".nox", "build", "dist", "target",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", "site-packages", "vendor",
+}
+
+# Files that cannot change test outcomes
+DOC_SUFFIXES = {".md", ".rst", ".adoc"}
+
+# Shell syntax that makes a command unsafe to rewrite
+SHELL_OPERATORS = {"&&", "||", "|", ";", "&", ">", ">>", "<"}
+
+# File types each linter accepts (None = pass every changed file)
+LINTER_SUFFIXES = {
+    "ruff": {".py", ".pyi"},
+    "flake8": {".py"},
+    "pylint": {".py"},
+    "black": {".py", ".pyi"},
+    "isort": {".py", ".pyi"},
+    "eslint": {".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx"},
+    "prettier": None,
+    "gofmt": {".go"},
+    "rustfmt": {".rs"},
+}
+
+# Package managers whose scripts are resolved through package.json, and
+# how each runs a binary from node_modules/.bin
+PACKAGE_RUNNERS = {
+    "npm": ["npm", "exec", "--"],
+    "pnpm": ["pnpm", "exec"],
+    "yarn": ["yarn", "run"],
+}
+
+
+@dataclass
+class ImpactSelection:
+    """How a test gate should run for the current change."""
+    command: str
+    narrowed: bool = False
+    targets: List[str] = field(default_factory=list)
+    reason: str = ""
+
+
+def changed_files(cwd: Path, base: str = "HEAD") -> Optional[List[str]]:
+    """
+    Files changed in the working tree since base, relative to cwd.
+    
+    Includes committed (after base), staged, unstaged, deleted and
+    untracked (not ignored) files; darkzloop's own .darkzloop/ state is
+    left out. None if cwd is not inside a git repository.
+    """
+    pathspec = ["--", ".", ":(exclude).darkzloop"]
+    diff = subprocess.run(
+        ["git", "diff", "--name-only", "--relative", base] + pathspec,
+        cwd=cwd,
+        capture_output=True,
+    )
+    if diff.returncode != 0:
+        return None
+    untracked = subprocess.run(
+        ["git", "ls-files", "--others", "--exclude-standard"] + pathspec,
+        cwd=cwd,
+        capture_output=True,
+    )
+    files = diff.stdout.decode(errors="replace").splitlines()
+    files += untracked.stdout.decode(errors="replace").splitlines()
+    return sorted({f for f in files if f})
+
+
+def scope_to_files(command: str, files: List[str], cwd: Path) -> Optional[str]:
+    """
+    Rewrite a lint command to check only the given files (relative to cwd).
+    
+    "{files}" in the command is replaced by the file list; otherwise a "."
+    path argument is, and failing that the files are appended. Files the
+    linter does not handle (by extension) and deleted files are dropped.
+    Returns None when no file is left to lint.
+    
+    A package script (`npm run lint`, `pnpm lint`, `yarn lint`) is replaced
+    by the linter call it runs; a script that is anything more than one
+    known linter call is left to run in full.
+    """
+    try:
+        tokens = shlex.split(command)
+    except ValueError:
+        return command
+    if not tokens or (SHELL_OPERATORS & set(tokens) and "{files}" not in command):
+        return command
+    if tokens[0] in PACKAGE_RUNNERS and "{files}" not in command:
+        tokens = _package_script(tokens, cwd)
+        if tokens is None:
+            return command
+    
+    tool = next((Path(t).name for t in tokens if Path(t).name in LINTER_SUFFIXES), None)
+    suffixes = LINTER_SUFFIXES.get(tool)
+    files = [
+        f for f in files
+        if (Path(cwd) / f).is_file() and (suffixes is None or Path(f).suffix in suffixes)
+    ]
+    if not files:
+        return None
+    
+    if "{files}" in command:
+        return command.replace("{files}", " ".join(shlex.quote(f) for f in files))
+    for i, token in enumerate(tokens):
+        if token in (".", "./"):
+            return shlex.join(tokens[:i] + files + tokens[i + 1:])
+    return shlex.join(tokens + files)
+
+
+def _package_script(tokens: List[str], cwd: Path) -> Optional[List[str]]:
+    """
+    The linter call behind a package script, run through the package manager.
+    
+    `npm run lint -- --fix` with "lint": "eslint ." in package.json becomes
+    `npm exec -- eslint . --fix`. None when the script is missing or is not
+    a single call of a linter in LINTER_SUFFIXES.
+    """
+    manager, args = tokens[0], tokens[1:]
+    if args[:1] in (["run"], ["run-script"]):
+        args = args[1:]
+    elif manager == "npm":
+        return None  # npm runs scripts only through `npm run`
+    if not args:
+        return None
+    name, extra = args[0], args[1:]
+    if extra[:1] == ["--"]:
+        extra = extra[1:]
+    
+    try:
+        scripts = json.loads((Path(cwd) / "package.json").read_text(encoding="utf-8")).get("scripts") or {}
+        script = shlex.split(scripts.get(name) or "")
+    except (OSError, ValueError, AttributeError, TypeError):
+        return None
+    if not script or Path(script[0]).name not in LINTER_SUFFIXES or SHELL_OPERATORS & set(script):
+        return None
+    return PACKAGE_RUNNERS[manager] + script + extra
+
+
+def full_command(command: str) -> str:
+    """A scoped lint command run against the whole project."""
+    return command.replace("{files}", ".")
+
+
+def _walk(root: Path, suffix: str) -> Iterable[Path]:
+    """Source files under root with the given suffix, skipping vendored dirs."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+        for name in filenames:
+            if name.endswith(suffix):
+                yield Path(dirpath) / name
+
+
+def _affected(changed: Set[str], importers: Dict[str, Set[str]]) -> Set[str]:
+    """Everything that transitively depends on a changed node."""
+    seen = set(changed)
+    stack = list(changed)
+    while stack:
+        node = stack.pop()
+        for importer in importers.get(node, ()):
+            if importer not in seen:
+                seen.add(importer)
+                stack.append(importer)
+    return seen
+
+
+class ImpactAnalyzer:
+    """
+    Rewrites test gate commands to run only the tests a change can affect.
+    
+    Supports `pytest` (no positional arguments), `go test ./...` and
+    `cargo test` in a workspace. Any other command runs unchanged.
+    
+    Usage:
+        analyzer = ImpactAnalyzer(project_root, full_run_every=10)
+        selection = analyzer.select("pytest -x", ["src/app/models.py"])
+        run(selection.command)  # "pytest -x tests/test_models.py"
+    """
+    
+    def __init__(self, project_root: Path, full_run_every: int = 10):
+        self.project_root = Path(project_root)
+        self.full_run_every = full_run_every
+        self._narrowed_since_full = 0
+        # absolute path -> (mtime_ns, imported module names), reused across iterations
+        self._import_cache: Dict[str, Tuple[int, Set[str]]] = {}
+    
+    def select(self, command: str, changed: List[str], cwd: Path = None) -> ImpactSelection:
+        """
+        Pick the test command to run for a set of changed files.
+        
+        changed paths are relative to cwd, the directory the command runs in
+        (project_root by default, or the same project inside a worktree).
+        """
+        root = Path(cwd) if cwd else self.project_root
+        try:
+            tokens = shlex.split(command)
+        except ValueError:
+            return ImpactSelection(command, reason="unparsable command")
+        if SHELL_OPERATORS & set(tokens):
+            return ImpactSelection(command, reason="shell pipeline")
+        
+        if self.full_run_every and self._narrowed_since_full >= self.full_run_every:
+            self._narrowed_since_full = 0
+            return ImpactSelection(command, reason="periodic full run")
+        
+        changed = [f for f in changed if Path(f).suffix not in DOC_SUFFIXES]
+        if not changed:
+            return ImpactSelection(command, reason="no code changes")
+        
+        selection = (
+            self._select_pytest(root, tokens, changed)
+            or self._select_go(root, tokens, changed)
+            or self._select_cargo(root, tokens, changed)
+        )
+        if selection is None:
+            return ImpactSelection(command, reason="change outside the dependency map")
+        
+        self._narrowed_since_full += 1
+        return selection
+    
+    # =========================================================================
+    # Python (pytest)
+    # =========================================================================
+    
+    def _select_pytest(self, root: Path, tokens: List[str], changed: List[str]) -> Optional[ImpactSelection]:
+        # "pytest", "python -m pytest", "uv run pytest", ...
+        runner = next((i for i, t in enumerate(tokens) if Path(t).name in ("pytest", "py.test")), None)
+        if runner is None or any(not t.startswith("-") for t in tokens[runner + 1:]):
+            return None  # positional args already choose the tests
+        
+        for f in changed:
+            if not f.endswith(".py") or Path(f).name == "conftest.py":
+                return None
+            if not (root / f).exists():
+                return None  # deleted module: its importers are no longer mapped
+        
+        modules: Dict[str, str] = {}  # module name -> relative path
+        files: List[str] = []
+        for path in _walk(root, ".py"):
+            rel = path.relative_to(root).as_posix()
+            files.append(rel)
+            for name in self._module_names(rel):
+                modules[name] = rel
+        
+        importers: Dict[str, Set[str]] = {}
+        for rel in files:
+            imported = self._python_imports(root, rel)
+            if imported is None:
+                return None  # can't see what this file depends on
+            for name in imported:
+                target = modules.get(name)
+                if target and target != rel:
+                    importers.setdefault(target, set()).add(rel)
+        
+        tests = sorted(
+            f for f in _affected(set(changed), importers)
+            if self._is_test_file(f) and (root / f).exists()
+        )
+        if not tests:
+            return None
+        return ImpactSelection(
+            command=shlex.join(tokens + tests),
+            narrowed=True,
+            targets=tests,
+            reason=f"{len(tests)} affected test files",
+        )
+    
+    @staticmethod
+    def _is_test_file(rel: str) -> bool:
+        name = Path(rel).name
+        return name.startswith("test_") or name.endswith("_test.py")
+    
+    @staticmethod
+    def _module_names(rel: str) -> List[str]:
+        """Dotted names a file can be imported as (plain and src-layout)."""
+        parts = rel[:-3].split("/")
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        if not parts:
+            return []
+        names = [".".join(parts)]
+        if parts[0] == "src" and len(parts) > 1:
+            names.append(".".join(parts[1:]))
+        return names
+    
+    def _python_imports(self, root: Path, rel: str) -> Optional[Set[str]]:
+        """Module names a file imports, including parent packages."""
+        path = root / rel
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return set()
+        cached = self._import_cache.get(str(path))
+        if cached and cached[0] == mtime:
+            return cached[1]
+        
+        try:
+            tree = ast.parse(path.read_bytes(), filename=rel)
+        except (SyntaxError, ValueError):
+            return None
+        
+        own = self._module_names(rel)
+        module = own[0].split(".") if own else []
+        package = module if rel.endswith("__init__.py") else module[:-1]
+        names: Set[str] = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                bases = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    anchor = package[:len(package) - node.level + 1]
+                    base = ".".join(anchor + ([node.module] if node.module else []))
+                else:
+                    base = node.module or ""
+                # "from pkg import mod" may import the submodule pkg.mod
+                bases = [base] + [f"{base}.{alias.name}" if base else alias.name for alias in node.names]
+            else:
+                continue
+            for base in bases:
+                parts = base.split(".")
+                names.update(".".join(parts[:i]) for i in range(1, len(parts) + 1))
+        
+        self._import_cache[str(path)] = (mtime, names)
+        return names
+    
+    # =========================================================================
+    # Go (go test)
+    # =========================================================================
+    
+    def _select_go(self, root: Path, tokens: List[str], changed: List[str]) -> Optional[ImpactSelection]:
+        if tokens[:2] != ["go", "test"] or tokens.count("./...") != 1:
+            return None
+        go_mod = root / "go.mod"
+        if not go_mod.exists() or any(not f.endswith(".go") for f in changed):
+            return None
+        match = re.search(r"^module\s+(\S+)", go_mod.read_text(), re.MULTILINE)
+        if not match:
+            return None
+        module = match.group(1)
+        
+        importers: Dict[str, Set[str]] = {}  # package dir -> importing package dirs
+        import_re = re.compile(r'"(' + re.escape(module) + r'(?:/[^"]*)?)"')
+        for path in _walk(root, ".go"):
+            pkg = path.parent.relative_to(root).as_posix()
+            header = path.read_text(errors="replace").split("\nfunc ", 1)[0]
+            for imported in import_re.findall(header):
+                target = imported[len(module):].lstrip("/") or "."
+                if target != pkg:
+                    importers.setdefault(target, set()).add(pkg)
+        
+        changed_pkgs = {Path(f).parent.as_posix() for f in changed}
+        packages = sorted(
+            "./" + pkg if pkg != "." else "."
+            for pkg in _affected(changed_pkgs, importers)
+            if (root / pkg).is_dir()
+        )
+        if not packages:
+            return None
+        i = tokens.index("./...")
+        return ImpactSelection(
+            command=shlex.join(tokens[:i] + packages + tokens[i + 1:]),
+            narrowed=True,
+            targets=packages,
+            reason=f"{len(packages)} affected packages",
+        )
+    
+    # =========================================================================
+    # Rust (cargo test)
+    # =========================================================================
+    
+    def _select_cargo(self, root: Path, tokens: List[str], changed: List[str]) -> Optional[ImpactSelection]:
+        if tokens[:2] != ["cargo", "test"]:
+            return None
+        if {"-p", "--package", "--workspace", "--all"} & set(tokens):
+            return None
+        
+        crates: Dict[str, str] = {}  # crate dir -> package name
+        deps: Dict[str, Set[str]] = {}  # crate dir -> crate dirs it depends on
+        for manifest in _walk(root, "Cargo.toml"):
+            if manifest.name != "Cargo.toml":
+                continue
+            text = manifest.read_text(errors="replace")
+            section = re.search(r"^\[package\]\s*$(.*?)(?=^\[|\Z)", text, re.MULTILINE | re.DOTALL)
+            package = section and re.search(r'^\s*name\s*=\s*"([^"]+)"', section.group(1), re.MULTILINE)
+            if not package:
+                continue
+            crate_dir = manifest.parent
+            rel = crate_dir.relative_to(root).as_posix()
+            crates[rel] = package.group(1)
+            deps[rel] = {
+                os.path.relpath((crate_dir / dep).resolve(), root.resolve()).replace(os.sep, "/")
+                for dep in re.findall(r'path\s*=\s*"([^"]+)"', text)
+            }
+        if len(crates) < 2:
+            return None  # single crate: nothing to narrow
+        
+        changed_crates = set()
+        for f in changed:
+            if Path(f).name in ("Cargo.toml", "Cargo.lock"):
+                return None
+            owner = max(
+                (c for c in crates if c == "." or f.startswith(c + "/")),
+                key=lambda c: 0 if c == "." else len(c),
+                default=None,
+            )
+            if owner is None:
+                return None
+            changed_crates.add(owner)
+        
+        importers: Dict[str, Set[str]] = {}
+        for crate, crate_deps in deps.items():
+            for dep in crate_deps:
+                importers.setdefault(dep, set()).add(crate)
+        
+        names = sorted(crates[c] for c in _affected(changed_crates, importers) if c in crates)
+        flags = [arg for name in names for arg in ("-p", name)]
+        return ImpactSelection(
+            command=shlex.join(tokens[:2] + flags + tokens[2:]),
+            narrowed=True,
+            targets=names,
+            reason=f"{len(names)} affected crates",
+        )
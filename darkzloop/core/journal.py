@@ -0,0 +1,110 @@
+"""
+darkzloop Task Journal for Resumable Runs
+
+A run that dies mid-plan (crash, Ctrl-C, preempted CI runner) loses track
+of which tasks already checkpointed, so a restart redoes and re-bills
+every completed task.
+
+Solution: an append-only journal of task status transitions.
+- Every transition is one JSON line, flushed and fsynced before moving on
+- A task is journaled complete only after its commit exists; a task that
+  succeeded without one (commit failed, nothing to commit) is journaled
+  "uncommitted" and runs again on resume
+- A torn final line from a crash mid-write is ignored on read
+- A fresh run appends a "start" marker; a resumed run appends "resume"
+  and keeps everything journaled since the last start
+
+Rule: "Once a task is committed, no restart ever runs it again."
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+from pathlib import Path
+import json
+import os
+import threading
+
+
+class TaskJournal:
+    """
+    Append-only log of task status transitions, at .darkzloop/journal.jsonl.
+    
+    Thread-safe: concurrent task workers share one journal.
+    
+    Usage:
+        journal = TaskJournal(project_root)
+        journal.start_run()
+        journal.record("1.1", "running")
+        journal.record("1.1", "complete", commit_hash="abc1234")
+        
+        # after a restart
+        done = journal.completed_tasks()  # {"1.1": "abc1234"}
+    """
+    
+    def __init__(self, project_root: Path = None):
+        self.path = Path(project_root or Path.cwd()) / ".darkzloop" / "journal.jsonl"
+        self._lock = threading.Lock()
+    
+    def _append(self, entry: dict):
+        """Write one entry and make sure it reached the disk."""
+        entry["timestamp"] = datetime.now().isoformat()
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a+b") as f:
+                # Start on a fresh line if a crash left a torn entry behind
+                if f.seek(0, os.SEEK_END):
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        line = "\n" + line
+                f.write(line.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def start_run(self):
+        """Mark the start of a fresh run; earlier entries no longer count."""
+        self._append({"event": "start"})
+    
+    def resume_run(self):
+        """Mark that the current run was resumed."""
+        self._append({"event": "resume"})
+    
+    def record(self, task_id: str, status: str, commit_hash: Optional[str] = None, error: str = None):
+        """Journal a task status transition (running, complete, uncommitted, or an FSM failure state)."""
+        entry = {"task": task_id, "status": status}
+        if commit_hash:
+            entry["commit"] = commit_hash
+        if error:
+            entry["error"] = error[:200]
+        self._append(entry)
+    
+    def entries(self) -> List[dict]:
+        """Entries of the current run (since the last start marker)."""
+        if not self.path.exists():
+            return []
+        
+        entries = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash
+                if not isinstance(entry, dict):
+                    continue
+                if entry.get("event") == "start":
+                    entries = []
+                entries.append(entry)
+        return entries
+    
+    def completed_tasks(self) -> Dict[str, Optional[str]]:
+        """Task IDs whose latest status is complete, mapped to their commit hash."""
+        latest: Dict[str, dict] = {}
+        for entry in self.entries():
+            if "task" in entry:
+                latest[entry["task"]] = entry
+        return {
+            task_id: entry.get("commit")
+            for task_id, entry in latest.items()
+            if entry.get("status") == "complete"
+        }
@@ -0,0 +1,164 @@
+"""
+darkzloop Adaptive Timeouts
+
+Timeouts were hard-coded: 300s for agents and gates, 120s for CLI gates.
+A fast local model that hangs still burned five minutes before failing,
+while a large test suite that needs six minutes was killed every time
+just before it finished.
+
+Solution: learn timeouts from observed latencies.
+- Every agent backend and gate gets a latency histogram in
+  .darkzloop/latency.json (log-spaced buckets, old samples decay)
+- Once a key has enough samples, its timeout is p99 x margin, clamped
+  to a floor and a ceiling; until then the configured timeout applies
+- Runs killed by a timeout are recorded too, so a timeout that is too
+  tight grows on the next run instead of failing forever
+
+Rule: "A timeout is a statement about the past, not a guess."
+"""
+
+from typing import Dict, Optional
+from pathlib import Path
+import json
+import math
+import os
+import tempfile
+import threading
+
+
+# (floor, ceiling) in seconds for adaptive timeouts
+AGENT_TIMEOUT_LIMITS = (30, 1800)
+GATE_TIMEOUT_LIMITS = (30, 3600)
+
+
+class LatencyHistogram:
+    """
+    Latency samples in log-spaced buckets, each GROWTH times wider than the
+    last, so percentiles are accurate to about 20% at any scale.
+    
+    Counts are halved whenever their total passes max_weight, so old runs
+    fade out as the project (and its test suite) changes.
+    """
+    
+    GROWTH = 1.2
+    
+    def __init__(self, counts: Dict[int, float] = None, samples: int = 0, max_weight: float = 200):
+        self.counts: Dict[int, float] = dict(counts or {})
+        self.samples = samples  # total runs ever recorded
+        self.max_weight = max_weight
+    
+    @classmethod
+    def bucket(cls, duration_ms: float) -> int:
+        return max(0, int(math.log(max(duration_ms, 1.0)) / math.log(cls.GROWTH)))
+    
+    def record(self, duration_ms: float):
+        """Add one sample."""
+        b = self.bucket(duration_ms)
+        self.counts[b] = self.counts.get(b, 0) + 1
+        self.samples += 1
+        if sum(self.counts.values()) > self.max_weight:
+            self.counts = {k: v / 2 for k, v in self.counts.items() if v / 2 >= 0.01}
+    
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound (ms) of the bucket holding the q-th quantile."""
+        total = sum(self.counts.values())
+        if not total:
+            return None
+        seen = 0.0
+        for b in sorted(self.counts):
+            seen += self.counts[b]
+            if seen >= q * total:
+                return self.GROWTH ** (b + 1)
+        return self.GROWTH ** (max(self.counts) + 1)
+    
+    def to_dict(self) -> dict:
+        return {"samples": self.samples, "counts": {str(k): v for k, v in self.counts.items()}}
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        counts = {int(k): float(v) for k, v in data.get("counts", {}).items()}
+        return cls(counts, int(data.get("samples", 0)))
+
+
+class AdaptiveTimeouts:
+    """
+    Per-key latency histograms with timeouts derived from them.
+    
+    Keys name what was timed: "agent:<backend>" or "gate:<gate name>".
+    Thread-safe; every record() is persisted.
+    
+    Usage:
+        timeouts = AdaptiveTimeouts(project_root)
+        limit = timeouts.timeout("gate:test", 300, *GATE_TIMEOUT_LIMITS)
+        start = time.monotonic()
+        run(command, timeout=limit)
+        timeouts.record("gate:test", (time.monotonic() - start) * 1000)
+    """
+    
+    def __init__(
+        self,
+        project_root: Path = None,
+        margin: float = 1.5,
+        quantile: float = 0.99,
+        min_samples: int = 5
+    ):
+        self.path = Path(project_root or Path.cwd()) / ".darkzloop" / "latency.json"
+        self.margin = margin
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self.load()
+    
+    def load(self):
+        """Load histograms from disk (missing or corrupt file means no history)."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.histograms = {k: LatencyHistogram.from_dict(v) for k, v in data.items()}
+        except (OSError, json.JSONDecodeError, AttributeError, TypeError, ValueError):
+            self.histograms = {}
+    
+    def save(self):
+        """Persist histograms (write-then-rename, so readers never see a partial file)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({k: h.to_dict() for k, h in self.histograms.items()}, f)
+        os.replace(tmp, self.path)
+    
+    def record(self, key: str, duration_ms: float):
+        """Record how long one run of key took."""
+        with self._lock:
+            self.histograms.setdefault(key, LatencyHistogram()).record(duration_ms)
+            self.save()
+    
+    def record_result(self, key: str, result):
+        """
+        Record a supervised run (a ProcessResult from supervisor.py).
+        
+        Timed-out runs count, so a too-tight timeout grows; hung runs and
+        commands that never started say nothing about latency.
+        """
+        if result.hung or (result.error and not result.timed_out):
+            return
+        self.record(key, result.duration_ms)
+    
+    def percentile(self, key: str, q: float = None) -> Optional[float]:
+        """Observed latency quantile for key in ms, or None without history."""
+        hist = self.histograms.get(key)
+        return hist.percentile(self.quantile if q is None else q) if hist else None
+    
+    def timeout(self, key: str, default: float, floor: float, ceiling: float) -> float:
+        """
+        Timeout in seconds for key: p99 x margin within [floor, ceiling].
+        
+        Falls back to default until key has min_samples runs. The ceiling is
+        raised to default if needed, so a configured timeout above the
+        built-in ceiling is still honoured.
+        """
+        hist = self.histograms.get(key)
+        if hist is None or hist.samples < self.min_samples:
+            return default
+        observed = hist.percentile(self.quantile) / 1000 * self.margin
+        return min(max(ceiling, default), max(floor, observed))
@@ -203,6 +203,47 @@ class FileLockManager:
         return blocking
 
 
+class TreeGuard:
+    """
+    Keeps gates and commits off a shared working tree while agents edit it.
+    
+    Concurrent tasks without worktrees share one tree. Their agents may edit
+    it at the same time, but a task's gates and commit must wait until no
+    agent is writing, or they would run against a sibling's half-written
+    files. Built on the lock the task workers already share; every method
+    is called with that lock held.
+    
+    Usage:
+        guard.begin_edit()   # before releasing the lock for the agent call
+        guard.end_edit()     # after re-acquiring it
+        guard.hold()         # before gates: new agents wait, running ones finish
+        guard.release()      # after the commit
+    """
+    
+    def __init__(self, lock: threading.Lock):
+        self._changed = threading.Condition(lock)
+        self.editing = 0  # agents writing to the tree
+        self.holding = 0  # tasks waiting for, or running, gates and commit
+    
+    def begin_edit(self):
+        """Register an agent once no task is checking the tree."""
+        self._changed.wait_for(lambda: self.holding == 0)
+        self.editing += 1
+    
+    def end_edit(self):
+        self.editing -= 1
+        self._changed.notify_all()
+    
+    def hold(self):
+        """Stop new agents from starting and wait for running ones to finish."""
+        self.holding += 1
+        self._changed.wait_for(lambda: self.editing == 0)
+    
+    def release(self):
+        self.holding -= 1
+        self._changed.notify_all()
+
+
 class FileAwareDAGScheduler:
     """
     DAG scheduler that respects file locks.
@@ -219,10 +260,14 @@ class FileAwareDAGScheduler:
         claims = TaskFileClaims.from_task(task)
         self.task_claims[claims.task_id] = claims
     
-    def analyze_conflicts(self, task_ids: List[str]) -> Dict[str, Set[str]]:
+    def analyze_conflicts(self, task_ids: List[str], writes_only: bool = False) -> Dict[str, Set[str]]:
         """
         Analyze file conflicts between tasks.
         
+        With writes_only, only write/write overlaps count. That is the
+        right rule when each task runs in its own worktree: a reader sees
+        its own snapshot, so only two writers can collide at merge time.
+        
         Returns dict of task_id -> set of conflicting task_ids
         """
         conflicts: Dict[str, Set[str]] = {tid: set() for tid in task_ids}
@@ -246,13 +291,17 @@ class FileAwareDAGScheduler:
                 b_writes = claims_b.write_files
                 a_all = claims_a.get_all_files()
                 
-                if a_writes & b_all or b_writes & a_all:
+                if writes_only:
+                    if a_writes & b_writes:
+                        conflicts[task_a].add(task_b)
+                        conflicts[task_b].add(task_a)
+                elif a_writes & b_all or b_writes & a_all:
                     conflicts[task_a].add(task_b)
                     conflicts[task_b].add(task_a)
         
         return conflicts
     
-    def split_parallel_group(self, task_ids: List[str]) -> List[List[str]]:
+    def split_parallel_group(self, task_ids: List[str], writes_only: bool = False) -> List[List[str]]:
         """
         Split a parallel group into sub-groups that don't conflict.
         
@@ -261,7 +310,7 @@ class FileAwareDAGScheduler:
         if len(task_ids) <= 1:
             return [task_ids]
         
-        conflicts = self.analyze_conflicts(task_ids)
+        conflicts = self.analyze_conflicts(task_ids, writes_only)
         
         # Greedy coloring
         groups: List[List[str]] = []
@@ -290,7 +339,8 @@ class FileAwareDAGScheduler:
     
     def reorder_execution_plan(
         self,
-        parallel_groups: List[List[str]]
+        parallel_groups: List[List[str]],
+        writes_only: bool = False
     ) -> List[List[str]]:
         """
         Reorder execution plan to respect file locks.
@@ -301,7 +351,7 @@ class FileAwareDAGScheduler:
         result = []
         
         for group in parallel_groups:
-            sub_groups = self.split_parallel_group(group)
+            sub_groups = self.split_parallel_group(group, writes_only)
             result.extend(sub_groups)
         
         return result
@@ -0,0 +1,115 @@
+"""
+darkzloop Bounded Output Capture
+
+Gate commands (test suites, compilers) can print hundreds of MB. Reading
+all of it into memory before slicing off the first few KB wastes memory,
+keeps the least useful part (the failure summary is at the end), and a
+single invalid UTF-8 byte turned a passing gate into an exception.
+
+Solution: stream output through a bounded head + tail buffer.
+- Memory per stream is capped at roughly `limit` characters
+- The first and last limit/2 characters are kept, the middle is elided
+- Bytes are decoded incrementally with replacement, so split multi-byte
+  characters and invalid bytes are both harmless
+- The complete raw output can be spooled to .darkzloop/logs
+
+Rule: "Keep the start and the end in memory; keep everything on disk."
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import BinaryIO, List, Optional
+from pathlib import Path
+import codecs
+import re
+
+
+class OutputBuffer:
+    """
+    Bounded capture of one output stream.
+    
+    Usage:
+        buf = OutputBuffer(limit=5000)
+        for chunk in stream:
+            buf.feed(chunk)
+        buf.close()
+        text = buf.getvalue()  # head + "... [N chars truncated] ..." + tail
+    """
+    
+    def __init__(self, limit: int = 5000, spool: Optional[BinaryIO] = None):
+        self.head_limit = limit // 2
+        self.tail_limit = limit - self.head_limit
+        self.spool = spool
+        self.total_bytes = 0
+        self.total_chars = 0
+        
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._head: List[str] = []
+        self._head_len = 0
+        self._tail: deque = deque()
+        self._tail_len = 0
+    
+    def feed(self, data: bytes):
+        """Add a chunk of raw output."""
+        self.total_bytes += len(data)
+        if self.spool:
+            self.spool.write(data)
+        self._add(self._decoder.decode(data))
+    
+    def close(self):
+        """Flush a trailing partial character, if any."""
+        self._add(self._decoder.decode(b"", final=True))
+    
+    def _add(self, text: str):
+        if not text:
+            return
+        self.total_chars += len(text)
+        
+        if self._head_len < self.head_limit:
+            take = text[:self.head_limit - self._head_len]
+            self._head.append(take)
+            self._head_len += len(take)
+            text = text[len(take):]
+            if not text:
+                return
+        
+        self._tail.append(text)
+        self._tail_len += len(text)
+        # Drop whole chunks once the rest still covers the tail
+        while self._tail and self._tail_len - len(self._tail[0]) >= self.tail_limit:
+            self._tail_len -= len(self._tail.popleft())
+    
+    @property
+    def truncated(self) -> bool:
+        return self.total_chars > self.head_limit + self.tail_limit
+    
+    def getvalue(self, note: str = "") -> str:
+        """The kept output, with a marker where the middle was dropped."""
+        head = "".join(self._head)
+        tail = "".join(self._tail)[-self.tail_limit:] if self.tail_limit else ""
+        dropped = self.total_chars - len(head) - len(tail)
+        if dropped <= 0:
+            return head + tail
+        return f"{head}\n... [{dropped} chars truncated{note}] ...\n{tail}"
+
+
+def open_spool(log_dir: Optional[Path], command: str, keep: int = 200) -> Optional[BinaryIO]:
+    """
+    Open a log file for a command's full output under log_dir.
+    
+    Only the newest `keep` logs are kept. Returns None without a log_dir.
+    """
+    if log_dir is None:
+        return None
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    
+    logs = sorted(log_dir.glob("*.log"))
+    for old in logs[:max(0, len(logs) - keep + 1)]:
+        old.unlink(missing_ok=True)
+    
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", command).strip("-")[:40] or "command"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    spool = open(log_dir / f"{stamp}-{slug}.log", "wb")
+    spool.write(f"$ {command}\n".encode("utf-8", errors="replace"))
+    return spool
@@ -0,0 +1,218 @@
+"""
+darkzloop Rate Limiting
+
+Parallel workers (`batch -w 16`, concurrent tasks) each call the provider
+on their own. Together they overshoot the account's requests/min and
+tokens/min limits, and every 429/529 came back as a failed file that the
+FSM counted as a task failure.
+
+Solution: one limiter per provider and model, shared by the process.
+- Token buckets for requests/min and tokens/min; a call reserves its
+  estimated input tokens up front, and the difference from the actual
+  usage is settled afterwards
+- Reservations queue rather than fail: callers wait for their slot, so
+  throughput sits at the limit instead of bouncing off it
+- Throttled calls are retried with jittered exponential backoff; a
+  server's retry-after is honoured and pauses every worker sharing the
+  limiter, not just the one that was told
+- Time spent waiting is reported (ExecutorResponse.queued_ms)
+
+Rule: "Wait in line, not in the retry loop."
+"""
+
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+import random
+import re
+import threading
+import time
+
+
+# Statuses worth retrying: timeouts, conflicts, rate limits, server errors,
+# and Anthropic's 529 "overloaded"
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# Longest retry-after we honour; anything longer is a quota, not a blip
+MAX_RETRY_AFTER = 300.0
+
+# How CLI tools report being throttled on stderr
+THROTTLED_OUTPUT = re.compile(r"rate.?limit|\b429\b|\b529\b|overloaded|too many requests", re.IGNORECASE)
+
+
+class TokenBucket:
+    """
+    Refills at rate_per_minute up to capacity (default: one minute's worth).
+
+    Reservations may overdraw the bucket; the overdraft is the caller's
+    wait, so concurrent callers are served in order at exactly the rate.
+    Not thread-safe on its own (RateLimiter holds the lock).
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0  # per second
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take amount; returns seconds until it is actually available."""
+        self._refill(now)
+        self.level -= min(amount, self.capacity)  # a huge request must not block forever
+        return max(0.0, -self.level / self.rate)
+
+    def adjust(self, amount: float, now: float):
+        """Return (positive) or take (negative) tokens after the fact."""
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    """
+    Requests/min and tokens/min budget for one provider and model.
+
+    Usage:
+        limiter = get_rate_limiter("anthropic/claude-sonnet-4", 50, 40_000)
+        waited = limiter.acquire(estimated_tokens)    # or await acquire_async
+        response = call()
+        limiter.settle(estimated_tokens, response.tokens_used)
+        if throttled:
+            limiter.pause(retry_after)
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.calls = 0
+        self.throttled = 0
+        self.queued_s = 0.0
+
+    def reserve(self, tokens: int = 0) -> float:
+        """Book a call; returns how long the caller must wait before making it."""
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self.paused_until - now)
+            if self.requests:
+                delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens and tokens:
+                delay = max(delay, self.tokens.reserve(tokens, now))
+            self.calls += 1
+            self.queued_s += delay
+            return delay
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a call may be made; returns the seconds waited."""
+        delay = self.reserve(tokens)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """acquire() without blocking the event loop."""
+        import asyncio
+        delay = self.reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+        return delay
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        """Correct the token budget once the call's real usage is known."""
+        if self.tokens and actual is not None:
+            with self._lock:
+                self.tokens.adjust(estimated - actual, time.monotonic())
+
+    def pause(self, seconds: float):
+        """Hold every caller for seconds (the server asked us to back off)."""
+        with self._lock:
+            self.throttled += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "queued_seconds": round(self.queued_s, 3),
+        }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(key: str, requests_per_minute: int = 0, tokens_per_minute: int = 0) -> RateLimiter:
+    """
+    The process-wide limiter for key (e.g. "anthropic/claude-sonnet-4").
+
+    Every executor for the same provider and model shares it; the budgets
+    of the first caller win.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(requests_per_minute, tokens_per_minute)
+        return limiter
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough token count of prompt text (4 characters per token)."""
+    return sum(len(t) for t in texts if t) // 4
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """Seconds from retry-after-ms / retry-after (seconds or HTTP date) headers."""
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return min(MAX_RETRY_AFTER, max(0.0, float(value) / 1000))
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            when = parsedate_to_datetime(value)
+            seconds = (when - datetime.now(timezone.utc)).total_seconds()
+        return min(MAX_RETRY_AFTER, max(0.0, seconds))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def classify_error(exc: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    (retryable, retry_after seconds) for an exception from a provider SDK.
+
+    Duck-typed on status_code and response.headers, which the anthropic
+    and openai SDKs (and httpx) all provide.
+    """
+    status = getattr(exc, "status_code", None)
+    if status in RETRYABLE_STATUS:
+        response = getattr(exc, "response", None)
+        return True, parse_retry_after(getattr(response, "headers", None))
+    name = type(exc).__name__
+    if "Connection" in name or "Timeout" in name:
+        return True, None
+    return False, None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    Seconds to wait before retry number attempt + 1.
+
+    retry_after is honoured with up to 20% extra so that the workers it
+    paused don't all return at the same instant; otherwise exponential
+    backoff with equal jitter.
+    """
+    if retry_after is not None:
+        return retry_after * random.uniform(1.0, 1.2)
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,132 @@
+"""
+darkzloop Response Cache
+
+Rerunning a plan re-sends prompts the model has already answered: a
+gate flake retried, `batch` run again over the same files, a benchmark
+of the runtime itself. Each of those pays full price and full latency
+for a response we already have, and benchmarks depend on the network.
+
+Solution: cache executor responses by content.
+- Key = hash of (executor type, model, temperature, system prompt, prompt)
+- Entries live in .darkzloop/cache/responses, sharded into 256
+  directories by the first two hex digits of the key
+- Total size is capped; the least recently used entries are evicted
+  first (a hit refreshes an entry's mtime)
+- Only successful responses are stored
+- Replay mode never calls the backend: a miss is an error, so a
+  benchmark run is deterministic and works offline
+
+Rule: "The same question is only paid for once."
+"""
+
+from dataclasses import asdict
+from datetime import datetime
+from typing import Optional
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+CACHE_MODES = ("off", "on", "replay")
+
+
+class ResponseCache:
+    """
+    Sharded, size-bounded, content-addressed store of executor responses.
+    
+    Thread-safe; several processes may share one directory (eviction is
+    then approximate, never wrong).
+    
+    Usage:
+        cache = ResponseCache(project_root / ".darkzloop" / "cache" / "responses")
+        key = ResponseCache.key("api", model, temperature, system_prompt, prompt)
+        entry = cache.get(key)
+        if entry is None:
+            response = call_backend()
+            cache.put(key, response)
+    """
+    
+    def __init__(self, cache_dir: Path, max_bytes: int = 512 * 1024 * 1024, replay: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self._size: Optional[int] = None  # bytes on disk, scanned on first put
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(*parts) -> str:
+        """Content hash of the request parts."""
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+    
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+    
+    def get(self, key: str) -> Optional[dict]:
+        """Cached response fields for key, or None."""
+        path = self._entry_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return entry.get("response")
+    
+    def put(self, key: str, response):
+        """Store a response (an ExecutorResponse) under key."""
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "key": key,
+            "timestamp": datetime.now().isoformat(),
+            "response": asdict(response),
+        }
+        # Write-then-rename so concurrent workers never read a partial entry
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        size = os.path.getsize(tmp)
+        try:
+            size -= os.path.getsize(path)  # overwriting an entry frees its old size
+        except OSError:
+            pass
+        os.replace(tmp, path)
+        
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+    
+    def _scan(self):
+        """(mtime, size, path) of every entry, and their total size."""
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # evicted by another process
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries, sum(size for _, size, _ in entries)
+    
+    def _evict(self):
+        """Drop least recently used entries down to 90% of max_bytes."""
+        entries, total = self._scan()
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+        self._size = total
@@ -17,26 +17,45 @@ from dataclasses import dataclass, field
 from typing import Optional, Callable, Dict, Any, List, Tuple
 from pathlib import Path
 import json
+import os
 import time
+import copy
 import subprocess
 import asyncio
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime
 
-from .fsm import LoopState, FSMContext, LoopController, create_loop, InvalidTransitionError
+from .fsm import LoopState, FSMContext, FailureKind, LoopController, create_loop, InvalidTransitionError
 from .schemas import (
     TaskDefinition, AgentAction, ExecutionResult, 
     Observation, CritiqueResult, CheckpointData,
     validate_agent_output, extract_json_from_response
 )
-from .context import ContextManager, create_iteration_summary
+from .context import ContextManager, PromptParts, create_iteration_summary
 from .critic import Critic, CritiqueVerdict, quick_critique
-from .dag import DAGExecutor, parse_plan_to_dag, run_shell_command_async, run_shell_command_sync
+from .dag import CommandResult, DAGExecutor, DurationHistory, NodeStatus, parse_plan_to_dag, run_shell_command_async, run_shell_command_sync
 from .manifest import ContextManifest, ManifestEnforcer
-from .locks import FileAwareDAGScheduler, FileLockManager
+from .locks import FileAwareDAGScheduler, FileLockManager, TreeGuard
+from .worktree import WorktreePool
+from .journal import TaskJournal
+from .gate_cache import GateCache
+from .latency import AdaptiveTimeouts, GATE_TIMEOUT_LIMITS
+from .supervisor import is_hung_error
+from .impact import ImpactAnalyzer, changed_files, full_command, scope_to_files
 from .visualize import Visualizer, TaskState, render_for_agent
 from .semantic import SemanticExpander, create_expander
 
 
+# Prompt templates (system.j2, task.j2): packaged into the wheel under
+# darkzloop/templates, or at the top of a source checkout
+PROMPT_DIRS = (
+    Path(__file__).parent.parent / "templates" / "prompts",
+    Path(__file__).parent.parent.parent / "templates" / "prompts",
+)
+
+
 # =============================================================================
 # Configuration
 # =============================================================================
@@ -49,6 +68,8 @@ class GateConfig:
     tier: int  # 1=essential, 2=quality, 3=safety
     auto_fix_command: Optional[str] = None
     on_failure: str = "task_failure"  # task_failure, warning, blocked, fatal_error
+    scope: str = "all"  # all, changed (only check the files the task changed)
+    full_run_every: int = 10  # scope=changed: check everything after this many scoped runs
 
 @dataclass
 class LoopConfig:
@@ -65,6 +86,11 @@ class LoopConfig:
     
     # Tiered quality gates
     gates: List[GateConfig] = field(default_factory=list)
+    cache_gates: bool = True  # Skip gates that already passed on an identical tree
+    concurrent_gates: bool = False  # Run the gates of one tier at the same time
+    select_tests: bool = False  # Narrow Tier 2 test gates to the tests a change affects
+    full_test_run_every: int = 10  # ...but run the full suite after this many narrowed runs
+    adaptive_timeouts: bool = True  # Derive gate timeouts from observed p99 latency
     
     # Token management
     max_context_tokens: int = 4000
@@ -74,6 +100,8 @@ class LoopConfig:
     enable_parallel: bool = False
     max_parallel_tasks: int = 4
     respect_file_locks: bool = True
+    concurrent_tasks: bool = False  # Run each parallel group's tasks at the same time
+    isolation: str = "none"  # none, worktree (one git worktree per concurrent task)
     
     # Manifest settings
     enforce_read_before_write: bool = True
@@ -103,6 +131,8 @@ class LoopConfig:
                 commands = tier_config.get("commands", [])
                 auto_fixes = tier_config.get("auto_fix_commands", [])
                 on_failure = tier_config.get("on_failure", "task_failure")
+                scope = tier_config.get("scope", "all")
+                full_run_every = tier_config.get("full_run_every", 10)
                 
                 for i, cmd in enumerate(commands):
                     auto_fix = auto_fixes[i] if i < len(auto_fixes) else None
@@ -112,6 +142,8 @@ class LoopConfig:
                         tier=tier_num,
                         auto_fix_command=auto_fix,
                         on_failure=on_failure,
+                        scope=scope,
+                        full_run_every=full_run_every,
                     ))
         
         # Fallback to legacy gates
@@ -139,9 +171,16 @@ class LoopConfig:
             max_consecutive_failures=data.get("loop", {}).get("max_consecutive_failures", 3),
             max_task_retries=data.get("loop", {}).get("max_task_retries", 3),
             gates=gates,
+            cache_gates=gates_config.get("cache", True),
+            concurrent_gates=gates_config.get("concurrent", False),
+            select_tests=gates_config.get("tier2", {}).get("select_tests", False),
+            full_test_run_every=gates_config.get("tier2", {}).get("full_run_every", 10),
+            adaptive_timeouts=gates_config.get("adaptive_timeouts", True),
             enable_parallel=data.get("parallel", {}).get("enabled", False),
             max_parallel_tasks=data.get("parallel", {}).get("max_parallel_tasks", 4),
             respect_file_locks=data.get("parallel", {}).get("respect_file_locks", True),
+            concurrent_tasks=data.get("parallel", {}).get("concurrent", False),
+            isolation=data.get("parallel", {}).get("isolation", "none"),
             enforce_read_before_write=data.get("manifest", {}).get("enforce_read_before_write", True),
             require_pattern_read=data.get("manifest", {}).get("require_pattern_read", True),
             max_context_tokens=data.get("context", {}).get("max_tokens", 4000),
@@ -165,6 +204,7 @@ class IterationResult:
     retry_count: int = 0
     error: Optional[str] = None
     hints: List[str] = field(default_factory=list)
+    gate_usage: Dict[str, dict] = field(default_factory=dict)  # gate name -> duration_ms, cpu_seconds, max_rss_kb
 
 
 # =============================================================================
@@ -224,6 +264,44 @@ class DarkzloopRuntime:
         self.current_manifest: Optional[ContextManifest] = None
         self.iteration_results: List[IterationResult] = []
         self.hints: List[str] = []  # Hints to inject into next prompt
+        self.gate_usage: Dict[str, dict] = {}  # Resource usage of this iteration's gate runs
+        
+        # Concurrent task workers share components through this lock and only
+        # release it while waiting on the agent (see _call_agent). Without
+        # worktrees the guard keeps gates and commits from running while a
+        # sibling's agent is still editing the shared tree
+        self._shared_lock = threading.Lock()
+        self._tree_guard = TreeGuard(self._shared_lock)
+        self._holding_tree = False
+        self._is_task_worker = False
+        
+        # Where the agent works and gates run; a worktree for isolated workers
+        self.work_dir: Path = config.project_root
+        self.worktree: Optional[Path] = None
+        self.worktree_pool: Optional[WorktreePool] = None
+        
+        # Task status journal (crash-safe resume)
+        self.journal = TaskJournal(config.project_root)
+        
+        # Passing gate results keyed by command and tree hash
+        self.gate_cache = GateCache(config.project_root) if config.cache_gates else None
+        
+        # Gate latency histograms; timeouts follow observed p99
+        self.timeouts = AdaptiveTimeouts(config.project_root) if config.adaptive_timeouts else None
+        
+        # Full gate output is spooled here; results only keep head and tail
+        self.log_dir = config.project_root / ".darkzloop" / "logs"
+        
+        # Change-impact test selection for Tier 2 gates
+        self.impact = (
+            ImpactAnalyzer(config.project_root, config.full_test_run_every)
+            if config.select_tests else None
+        )
+        
+        # Changed-files-only gates: HEAD when the current task started, and
+        # scoped runs per gate since its last full run (shared with workers)
+        self.task_base: Optional[str] = None
+        self._scoped_gate_runs: Dict[str, int] = {}
         
         # Load documents
         self._load_documents()
@@ -247,8 +325,10 @@ class DarkzloopRuntime:
         
         # Load plan and build DAG
         if plan_path.exists():
-            plan_content = plan_path.read_text()
-            self.dag = parse_plan_to_dag(plan_content)
+            with plan_path.open() as plan_file:
+                self.dag = parse_plan_to_dag(plan_file)
+            self.dag.max_parallel = self.config.max_parallel_tasks
+            self.dag.history = DurationHistory(self.config.project_root)
             
             # Initialize visualizer
             tasks = [
@@ -292,14 +372,31 @@ class DarkzloopRuntime:
         This exposes FSM state, manifest constraints, and circuit breaker
         status so the agent can make informed decisions.
         """
+        return self.render_prompt_parts(task).text
+    
+    def render_prompt_parts(self, task: TaskDefinition) -> PromptParts:
+        """
+        Render the system prompt split into a stable prefix and volatile suffix.
+        
+        The prefix (system.j2: protocols, gates, valid actions) depends only
+        on configuration, so it is identical on every iteration and can be
+        served from the provider's prompt cache. The suffix (task.j2) holds
+        the manifest, retry counts, DAG status and current task.
+        """
         try:
             from jinja2 import Template
-            template_path = Path(__file__).parent.parent / "templates" / "prompts" / "system.j2"
-            if template_path.exists():
-                template = Template(template_path.read_text())
+            prompts_dir = next(
+                (d for d in PROMPT_DIRS if (d / "system.j2").exists() and (d / "task.j2").exists()),
+                None
+            )
+            if prompts_dir is not None:
+                prefix_template = Template((prompts_dir / "system.j2").read_text(encoding="utf-8"))
+                suffix_template = Template((prompts_dir / "task.j2").read_text(encoding="utf-8"))
             else:
-                # Fallback to inline template
-                template = Template(self._get_fallback_template())
+                # Fallback to inline templates
+                prefix_source, suffix_source = self._get_fallback_templates()
+                prefix_template = Template(prefix_source)
+                suffix_template = Template(suffix_source)
         except ImportError:
             # No Jinja2, use simple string formatting
             return self._render_simple_prompt(task)
@@ -332,7 +429,7 @@ class DarkzloopRuntime:
         # Sanitize dag_status for Windows before rendering
         dag_status = self._sanitize_for_platform(self.visualizer.get_agent_context())
 
-        rendered = template.render(
+        variables = dict(
             fsm_state=self.loop.fsm.current_state.value,
             iteration=self.loop.fsm.iteration,
             files_in_context=files_in_context,
@@ -356,7 +453,10 @@ class DarkzloopRuntime:
             semantic_expansion=semantic_expansion,
         )
         # Sanitize emojis for Windows compatibility
-        return self._sanitize_for_platform(rendered)
+        return PromptParts(
+            prefix=self._sanitize_for_platform(prefix_template.render(**variables)).strip(),
+            suffix=self._sanitize_for_platform(suffix_template.render(**variables)).strip(),
+        )
 
     def _sanitize_for_platform(self, text: str) -> str:
         """Replace problematic Unicode characters for Windows compatibility."""
@@ -409,10 +509,10 @@ class DarkzloopRuntime:
         
         return list(terms)
     
-    def _get_fallback_template(self) -> str:
-        """Fallback template if file not found."""
-        return """
-You are Darkzloop, an autonomous software engineer.
+    def _get_fallback_templates(self) -> Tuple[str, str]:
+        """Fallback (prefix, suffix) templates if the files are not found."""
+        prefix = "You are Darkzloop, an autonomous software engineer."
+        return prefix, """
 Current state: {{ fsm_state | upper }} (iteration {{ iteration }})
 
 ## MANIFEST
@@ -436,10 +536,10 @@ Task retries: {{ task_retries }} / {{ max_retries }}
 {% endfor %}
 """
     
-    def _render_simple_prompt(self, task: TaskDefinition) -> str:
+    def _render_simple_prompt(self, task: TaskDefinition) -> PromptParts:
         """Simple prompt without Jinja2."""
         lines = [
-            f"You are Darkzloop. State: {self.loop.fsm.current_state.value.upper()}",
+            f"State: {self.loop.fsm.current_state.value.upper()}",
             f"Iteration: {self.loop.fsm.iteration}",
             "",
             f"Task: {task.id} - {task.description}",
@@ -453,7 +553,7 @@ Task retries: {{ task_retries }} / {{ max_retries }}
             lines.append("HINTS:")
             lines.extend(self.hints)
         
-        return "\n".join(lines)
+        return PromptParts(prefix="You are Darkzloop.", suffix="\n".join(lines))
     
     # =========================================================================
     # Quality Gates
@@ -464,36 +564,76 @@ Task retries: {{ task_retries }} / {{ max_retries }}
         Run tiered quality gates.
         
         Returns: (all_passed, passed_gates, failed_gates, error_message)
+        
+        A gate that already passed on a byte-identical tree is not rerun.
+        
+        With concurrent_gates, the gates of a tier run at the same time and
+        the first Tier 1 failure cancels its siblings and skips later tiers.
+        Tiers still run in order, and failures are handled in gate order.
+        
+        With select_tests, Tier 2 test commands only run the tests affected
+        by the current change (see ImpactAnalyzer). Gates with
+        scope="changed" only check the files changed since the task started,
+        and pass without running when none of them apply.
+        
+        Gate timeouts adapt to each gate's observed latency (see latency.py).
         """
         passed = []
         failed = []
+        cache = self.gate_cache
+        tree = cache.tree_hash(self.work_dir) if cache and self.config.gates else None
+        changed = self._changed_files() if self._uses_changed_files() else None
         
-        for gate in sorted(self.config.gates, key=lambda g: g.tier):
-            success, stdout, stderr = run_shell_command_sync(
-                gate.command,
-                cwd=str(self.config.project_root),
-                timeout=300
-            )
+        for tier in sorted({gate.tier for gate in self.config.gates}):
+            tier_gates = [gate for gate in self.config.gates if gate.tier == tier]
+            commands = [self._gate_command(gate, changed) for gate in tier_gates]
             
-            if success:
-                passed.append(gate.name)
-            else:
+            outcomes = {}
+            tier_tree = tree  # the tree concurrent gates ran against
+            if self.config.concurrent_gates:
+                pending = [
+                    (i, tier_gates[i].name, command) for i, command in enumerate(commands)
+                    if command is not None and not (cache and cache.get(command, tree))
+                ]
+                if len(pending) > 1:
+                    outcomes = asyncio.run(self._run_gates_concurrently(pending, fail_fast=tier == 1))
+            
+            for i, gate in enumerate(tier_gates):
+                if commands[i] is None:
+                    passed.append(f"{gate.name} (no changed files)")
+                    continue
+                
+                if i in outcomes:
+                    if outcomes[i] is None:
+                        continue  # cancelled by a failing sibling
+                    success, stdout, stderr = outcomes[i]
+                else:
+                    if cache and cache.get(commands[i], tree):
+                        passed.append(f"{gate.name} (cached)")
+                        continue
+                    
+                    success, stdout, stderr = self._run_gate(gate.name, commands[i], 300)
+                
+                if success:
+                    passed.append(gate.name)
+                    if cache:
+                        cache.put(commands[i], tier_tree if i in outcomes else tree, stdout)
+                    continue
+                
                 # Try auto-fix for Tier 2
                 if gate.auto_fix_command and gate.tier == 2:
-                    fix_success, _, _ = run_shell_command_sync(
-                        gate.auto_fix_command,
-                        cwd=str(self.config.project_root),
-                        timeout=60
-                    )
+                    fix_success, _, _ = self._run_gate(f"{gate.name}:fix", gate.auto_fix_command, 60)
                     if fix_success:
+                        # The fix rewrote files, so later gates see a new tree
+                        if cache:
+                            tree = cache.tree_hash(self.work_dir)
+                        
                         # Re-run check
-                        retry_success, _, _ = run_shell_command_sync(
-                            gate.command,
-                            cwd=str(self.config.project_root),
-                            timeout=300
-                        )
+                        retry_success, retry_stdout, _ = self._run_gate(gate.name, commands[i], 300)
                         if retry_success:
                             passed.append(f"{gate.name} (auto-fixed)")
+                            if cache:
+                                cache.put(commands[i], tree, retry_stdout)
                             continue
                 
                 failed.append(gate.name)
@@ -503,22 +643,191 @@ Task retries: {{ task_retries }} / {{ max_retries }}
                     return False, passed, failed, f"Tier 1 gate failed: {gate.name}\n{stderr[:200]}"
                 elif gate.on_failure == "blocked" and gate.tier == 3:
                     return False, passed, failed, f"Safety gate failed: {gate.name} - needs human review"
+            
+            if self.config.concurrent_gates and tier == 1 and failed:
+                break
         
         all_passed = len(failed) == 0
         error_msg = f"Gates failed: {', '.join(failed)}" if failed else ""
         
         return all_passed, passed, failed, error_msg
     
+    def _gate_timeout(self, name: str, default: int) -> float:
+        """Timeout for a gate: p99 of its past runs x margin, or default."""
+        if not self.timeouts:
+            return default
+        return self.timeouts.timeout(f"gate:{name}", default, *GATE_TIMEOUT_LIMITS)
+    
+    def _run_gate(self, name: str, command: str, default_timeout: int) -> CommandResult:
+        """Run a gate command with its adaptive timeout, recording its latency and usage."""
+        start = time.monotonic()
+        result = run_shell_command_sync(
+            command,
+            cwd=str(self.work_dir),
+            timeout=self._gate_timeout(name, default_timeout),
+            log_dir=self.log_dir
+        )
+        if self.timeouts:
+            self.timeouts.record(f"gate:{name}", (time.monotonic() - start) * 1000)
+        self.gate_usage[name] = result.usage
+        return result
+    
+    async def _run_gate_async(self, name: str, command: str, default_timeout: int) -> CommandResult:
+        """Async _run_gate; a cancelled gate records nothing."""
+        start = time.monotonic()
+        result = await run_shell_command_async(
+            command,
+            cwd=str(self.work_dir),
+            timeout=self._gate_timeout(name, default_timeout),
+            log_dir=self.log_dir
+        )
+        if self.timeouts:
+            self.timeouts.record(f"gate:{name}", (time.monotonic() - start) * 1000)
+        self.gate_usage[name] = result.usage
+        return result
+    
+    async def _run_gates_concurrently(
+        self,
+        commands: List[Tuple[int, str, str]],
+        fail_fast: bool = False
+    ) -> Dict[int, Optional[Tuple[bool, str, str]]]:
+        """
+        Run (index, gate name, gate command) triples at the same time.
+        
+        Returns index -> (success, stdout, stderr). With fail_fast, the first
+        failure kills the gates still running; they map to None.
+        """
+        running = {
+            asyncio.ensure_future(self._run_gate_async(name, command, 300)): i
+            for i, name, command in commands
+        }
+        outcomes = {}
+        pending = set(running)
+        
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                outcomes[running[future]] = future.result()
+            
+            if fail_fast and any(not outcomes[running[future]][0] for future in done):
+                for future in pending:
+                    future.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                for future in pending:
+                    outcomes[running[future]] = None
+                break
+        
+        return outcomes
+    
+    def _uses_changed_files(self) -> bool:
+        """Whether any gate needs the set of files the task changed."""
+        return bool(self.impact) or any(gate.scope == "changed" for gate in self.config.gates)
+    
+    def _head_commit(self) -> Optional[str]:
+        """Commit currently checked out in work_dir."""
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=self.work_dir,
+            capture_output=True
+        )
+        return result.stdout.decode().strip() if result.returncode == 0 else None
+    
+    def _changed_files(self) -> Optional[List[str]]:
+        """Files the current task claimed or changed, relative to work_dir."""
+        changed = changed_files(self.work_dir, self.task_base or "HEAD")
+        if changed is None:
+            return None
+        if self.current_task:
+            changed += self.current_task.files_to_modify + self.current_task.files_to_create
+        return sorted(set(changed))
+    
+    def _gate_command(self, gate: GateConfig, changed: Optional[List[str]]) -> Optional[str]:
+        """
+        The command to run for a gate given the changed files.
+        
+        Tier 2 test gates may be narrowed by impact analysis; scope="changed"
+        gates get the changed files as arguments, with a full run every
+        full_run_every runs. None means there is nothing for the gate to check.
+        """
+        if gate.scope == "changed":
+            if changed is None:
+                return full_command(gate.command)
+            runs = self._scoped_gate_runs.get(gate.name, 0)
+            if gate.full_run_every and runs >= gate.full_run_every:
+                self._scoped_gate_runs[gate.name] = 0
+                return full_command(gate.command)
+            self._scoped_gate_runs[gate.name] = runs + 1
+            return scope_to_files(gate.command, changed, self.work_dir)
+        
+        if gate.tier != 2 or changed is None or not self.impact:
+            return gate.command
+        return self.impact.select(gate.command, changed, cwd=self.work_dir).command
+    
     # =========================================================================
     # Main Iteration Loop
     # =========================================================================
     
     def run_iteration(self, task: TaskDefinition) -> IterationResult:
         """Run a single iteration of the loop."""
+        with self._shared_lock:
+            try:
+                result = self._run_iteration_locked(task)
+                result.gate_usage = self.gate_usage
+                return result
+            finally:
+                if self._holding_tree:
+                    self._holding_tree = False
+                    self._tree_guard.release()
+    
+    def _shares_tree(self) -> bool:
+        """Whether this is a concurrent worker editing the main working tree."""
+        return self._is_task_worker and not self.worktree
+    
+    @contextmanager
+    def _unlocked(self):
+        """Release the shared lock for the duration of a with-block."""
+        self._shared_lock.release()
+        try:
+            yield
+        finally:
+            self._shared_lock.acquire()
+    
+    def _call_agent(self, prompt: PromptParts, task: TaskDefinition) -> Tuple[bool, str, str]:
+        """
+        Invoke the agent executor with the shared lock released.
+        
+        The agent call is the LLM-latency-bound part of an iteration, so this
+        is where concurrent task workers overlap. Everything else (FSM, context,
+        gates, commits) stays serialized unless the worker has its own worktree;
+        without one, gates and commits also wait until no agent is editing.
+        
+        Isolated workers pass their worktree as task["cwd"]; the agent must
+        edit files there.
+        
+        The agent gets the whole prompt text; task["prompt_prefix"] is its
+        stable leading part, which executors with prompt caching send as
+        the cacheable system prompt (see BaseExecutor.agent_call).
+        """
+        task_data = dict(task.__dict__, prompt_prefix=prompt.prefix)
+        if self.worktree:
+            task_data["cwd"] = str(self.work_dir)
+        if not self._shares_tree():
+            with self._unlocked():
+                return self.agent_executor(prompt.text, task_data)
+        self._tree_guard.begin_edit()
+        try:
+            with self._unlocked():
+                return self.agent_executor(prompt.text, task_data)
+        finally:
+            self._tree_guard.end_edit()
+    
+    def _run_iteration_locked(self, task: TaskDefinition) -> IterationResult:
+        """Body of run_iteration; caller holds the shared lock."""
         iteration_start = time.time()
         self.current_task = task
         state_path = []
         self.hints = []  # Clear hints from previous iteration
+        self.gate_usage = {}
         
         # Initialize manifest for this task
         if self.config.enforce_read_before_write:
@@ -532,6 +841,9 @@ Task retries: {{ task_retries }} / {{ max_retries }}
         
         # Start task in FSM (enables per-task retry tracking)
         self.loop.fsm.start_task(task.id)
+        self.journal.record(task.id, "running")
+        if self._uses_changed_files():
+            self.task_base = self._head_commit()
         retry_count = self.loop.fsm.get_task_retry_count(task.id)
         
         # Update visualizer
@@ -547,13 +859,12 @@ Task retries: {{ task_retries }} / {{ max_retries }}
             self.loop.step(LoopState.PLAN, f"Starting task {task.id}")
             state_path.append("plan")
             
-            # Get context with system prompt
-            system_prompt = self.render_system_prompt(task)
-            context = self.context.get_context_for_agent(
+            # Get context with system prompt. The stable parts of both (protocols,
+            # gates, goal, spec) lead the prompt so providers can cache them
+            prompt = self.render_prompt_parts(task) + self.context.get_context_parts(
                 self.loop.fsm.get_compact_summary(),
                 task.to_json() if hasattr(task, 'to_json') else json.dumps(task.__dict__)
             )
-            full_context = f"{system_prompt}\n\n{context}"
             
             # EXECUTE state
             self.loop.step(LoopState.EXECUTE, "Running agent")
@@ -562,7 +873,7 @@ Task retries: {{ task_retries }} / {{ max_retries }}
             if not self.agent_executor:
                 raise RuntimeError("No agent executor set")
             
-            success, output, error = self.agent_executor(full_context, task.__dict__)
+            success, output, error = self._call_agent(prompt, task)
             
             self.context.record_step(
                 state="EXECUTE",
@@ -572,17 +883,27 @@ Task retries: {{ task_retries }} / {{ max_retries }}
             )
             
             if not success:
+                kind = FailureKind.AGENT_HUNG if is_hung_error(error) else FailureKind.AGENT_ERROR
                 return self._handle_failure(
                     task, state_path, iteration_start, retry_count,
-                    error or "Agent execution failed"
+                    error or "Agent execution failed", kind=kind
                 )
             
             # OBSERVE state
             self.loop.step(LoopState.OBSERVE, "Checking results")
             state_path.append("observe")
             
-            # Run tiered quality gates
-            gates_passed, passed_list, failed_list, gate_error = self._run_tiered_gates()
+            # Run tiered quality gates (concurrently with siblings when isolated)
+            if self.worktree:
+                with self._unlocked():
+                    gates_passed, passed_list, failed_list, gate_error = self._run_tiered_gates()
+            else:
+                if self._shares_tree():
+                    # Gates through the commit see the tree at rest; released
+                    # when run_iteration returns
+                    self._tree_guard.hold()
+                    self._holding_tree = True
+                gates_passed, passed_list, failed_list, gate_error = self._run_tiered_gates()
             
             self.context.record_step(
                 state="OBSERVE",
@@ -606,15 +927,30 @@ Task retries: {{ task_retries }} / {{ max_retries }}
             if not gates_passed:
                 return self._handle_failure(
                     task, state_path, iteration_start, retry_count,
-                    gate_error, passed_list, failed_list, critique_verdict
+                    gate_error, passed_list, failed_list, critique_verdict,
+                    kind=FailureKind.GATE_FAILED
                 )
             
+            # Isolated workers land their changes on the main tree first;
+            # a conflict with an already-merged sibling fails the task
+            merged_files = None
+            if self.worktree:
+                merge = self.worktree_pool.merge_back(self.worktree)
+                if not merge.success:
+                    return self._handle_failure(
+                        task, state_path, iteration_start, retry_count,
+                        merge.error, passed_list, failed_list, critique_verdict
+                    )
+                merged_files = merge.files
+            
             # CHECKPOINT state
             self.loop.step(LoopState.CHECKPOINT, "Committing")
             state_path.append("checkpoint")
             
             # Commit changes
-            commit_hash = self._commit_changes(task)
+            commit_hash = self._commit_changes(task, merged_files)
+            # Only committed work survives a restart; a resumed run redoes the rest
+            self.journal.record(task.id, "complete" if commit_hash else "uncommitted", commit_hash=commit_hash)
             
             # Record success in context
             self.context.checkpoint(
@@ -672,12 +1008,13 @@ Task retries: {{ task_retries }} / {{ max_retries }}
         error: str,
         gates_passed: List[str] = None,
         gates_failed: List[str] = None,
-        critique_verdict: str = None
+        critique_verdict: str = None,
+        kind: FailureKind = None
     ) -> IterationResult:
         """Handle task failure with circuit breaker logic."""
         
         # Use per-task circuit breaker
-        next_state, message = self.loop.fsm.record_task_failure(error)
+        next_state, message = self.loop.fsm.record_task_failure(error, kind)
         state_path.append(next_state.value)
         
         # Generate hints for next attempt
@@ -689,6 +1026,7 @@ Task retries: {{ task_retries }} / {{ max_retries }}
                     hints.append(hint)
         
         self.hints = hints  # Store for next iteration
+        self.journal.record(task.id, next_state.value, error=error)
         
         # Update visualizer
         if next_state == LoopState.BLOCKED:
@@ -712,23 +1050,42 @@ Task retries: {{ task_retries }} / {{ max_retries }}
             hints=hints,
         )
     
-    def _commit_changes(self, task: TaskDefinition) -> Optional[str]:
-        """Commit changes to git."""
+    def _commit_changes(self, task: TaskDefinition, merged_files: List[str] = None) -> Optional[str]:
+        """
+        Commit changes to git.
+        
+        merged_files are repo-root-relative paths merged back from a worktree.
+        Returns the commit hash, or None if nothing was committed.
+        """
+        root = self.config.project_root
         try:
-            subprocess.run(
-                ["git", "add", "-A"],
-                cwd=self.config.project_root,
+            if merged_files is not None:
+                paths = [f":/{f}" for f in merged_files]
+            elif self._is_task_worker:
+                # Concurrent workers share the working tree, so only stage the files
+                # this task claimed instead of sweeping up other tasks' edits
+                paths = self._claimed_paths(task)
+            else:
+                paths = None
+            if paths == []:
+                return None  # never fall back to staging everything
+            
+            add = subprocess.run(
+                ["git", "add", "-A", "--"] + paths if paths else ["git", "add", "-A"],
+                cwd=root,
                 capture_output=True
             )
+            if add.returncode != 0:
+                return None
             result = subprocess.run(
                 ["git", "commit", "-m", f"darkzloop: {task.id} - {task.description[:50]}"],
-                cwd=self.config.project_root,
+                cwd=root,
                 capture_output=True
             )
             if result.returncode == 0:
                 hash_result = subprocess.run(
                     ["git", "rev-parse", "--short", "HEAD"],
-                    cwd=self.config.project_root,
+                    cwd=root,
                     capture_output=True
                 )
                 return hash_result.stdout.decode().strip()
@@ -736,25 +1093,78 @@ Task retries: {{ task_retries }} / {{ max_retries }}
             pass
         return None
     
+    def _claimed_paths(self, task: TaskDefinition) -> List[str]:
+        """
+        The task's claimed files that git can stage.
+        
+        A claimed path that neither exists nor is tracked (a file the agent
+        never created, a typo) would make `git add` reject the whole list.
+        Tracked paths are kept even when deleted, so -A stages the deletion.
+        """
+        claimed = list(dict.fromkeys(task.files_to_modify + task.files_to_create))
+        if not claimed:
+            return []
+        root = self.config.project_root
+        tracked = subprocess.run(
+            ["git", "ls-files", "-z", "--"] + claimed,
+            cwd=root,
+            capture_output=True
+        )
+        known = set(tracked.stdout.decode(errors="replace").split("\0")) if tracked.returncode == 0 else set()
+        return [
+            p for p in claimed
+            if (root / p).exists() or Path(os.path.normpath(p)).as_posix() in known
+        ]
+    
     # =========================================================================
     # Full Loop Execution
     # =========================================================================
     
-    def run(self) -> List[IterationResult]:
-        """Run the full loop until completion or failure."""
+    def run(self, resume: bool = False) -> List[IterationResult]:
+        """
+        Run the full loop until completion or failure.
+        
+        With resume=True, tasks the journal records as complete since the
+        last fresh run are not run again; only the remaining frontier is.
+        """
         results = []
         
         if not self.dag:
             raise RuntimeError("No plan loaded")
         
+        completed = self._resume_from_journal() if resume else {}
+        if not resume:
+            self.journal.start_run()
+        
+        isolated = (
+            self.config.enable_parallel
+            and self.config.concurrent_tasks
+            and self.config.isolation == "worktree"
+        )
+        
         # Get execution order
         if self.config.enable_parallel and self.scheduler:
+            # Isolated tasks only collide when two of them write the same file
             groups = self.scheduler.reorder_execution_plan(
-                self.dag.compute_execution_order()
+                self.dag.compute_execution_order(),
+                writes_only=isolated,
             )
         else:
             groups = self.dag.compute_execution_order()
         
+        if completed:
+            groups = [
+                [task_id for task_id in group if task_id not in completed]
+                for group in groups
+            ]
+            groups = [group for group in groups if group]
+        
+        if isolated and self.worktree_pool is None:
+            self.worktree_pool = WorktreePool(self.config.project_root, self.config.max_parallel_tasks)
+        
+        if self.config.enable_parallel and self.config.concurrent_tasks:
+            return self._run_concurrent(groups)
+        
         for group in groups:
             for task_id in group:
                 # Check if we should stop
@@ -768,19 +1178,12 @@ Task retries: {{ task_retries }} / {{ max_retries }}
                 if not node:
                     continue
                 
-                task = TaskDefinition(
-                    id=task_id,
-                    description=node.task_data.get("description", ""),
-                    files_to_modify=node.task_data.get("files_to_modify", []),
-                    files_to_create=node.task_data.get("files_to_create", []),
-                    reference_files=node.task_data.get("reference_files", []),
-                    spec_sections=node.task_data.get("spec_sections", []),
-                    acceptance_criteria=node.task_data.get("acceptance_criteria", ""),
-                )
+                task = self._task_from_node(node)
                 
                 # Run iteration
                 result = self.run_iteration(task)
                 results.append(result)
+                self._record_duration(result)
                 
                 # Save visualization
                 if self.config.auto_update_viz:
@@ -795,6 +1198,209 @@ Task retries: {{ task_retries }} / {{ max_retries }}
         self.loop.step(LoopState.COMPLETE, "All tasks done")
         return results
     
+    def _resume_from_journal(self) -> Dict[str, Optional[str]]:
+        """Mark journaled tasks complete and return them with their commits."""
+        completed = {
+            task_id: commit_hash
+            for task_id, commit_hash in self.journal.completed_tasks().items()
+            if task_id in self.dag.nodes
+        }
+        for task_id, commit_hash in completed.items():
+            self.dag.nodes[task_id].status = NodeStatus.COMPLETE
+            self.visualizer.update_task(task_id, TaskState.COMPLETE, commit_hash=commit_hash)
+        self.journal.resume_run()
+        return completed
+    
+    def _record_duration(self, result: IterationResult):
+        """Feed a successful task's duration into the DAG's history."""
+        if result.success and self.dag and self.dag.history:
+            self.dag.history.record(result.task_id, result.duration_ms)
+            self.dag.history.save()
+    
+    def _task_from_node(self, node) -> TaskDefinition:
+        """Build a TaskDefinition from a DAG node."""
+        return TaskDefinition(
+            id=node.id,
+            description=node.task_data.get("description", ""),
+            files_to_modify=node.task_data.get("files_to_modify", []),
+            files_to_create=node.task_data.get("files_to_create", []),
+            reference_files=node.task_data.get("reference_files", []),
+            spec_sections=node.task_data.get("spec_sections", []),
+            acceptance_criteria=node.task_data.get("acceptance_criteria", ""),
+        )
+    
+    # =========================================================================
+    # Concurrent Execution
+    # =========================================================================
+    
+    def _run_concurrent(self, groups: List[List[str]]) -> List[IterationResult]:
+        """
+        Run each parallel group with all of its tasks in flight at once.
+        
+        Groups come from the file-aware scheduler, so tasks inside a group
+        never claim the same files. At most max_parallel_tasks agents run
+        at the same time; groups still run one after another.
+        """
+        results = []
+        priorities = self.dag.compute_priorities()
+        
+        with ThreadPoolExecutor(max_workers=max(1, self.config.max_parallel_tasks)) as pool:
+            for group in groups:
+                # The pool starts tasks in submission order, so a group wider
+                # than the pool runs its critical-path tasks first
+                group = sorted(group, key=lambda tid: -priorities.get(tid, 0.0))
+                should_stop, reason = self.loop.fsm.should_stop()
+                if should_stop:
+                    print(f"Loop stopped: {reason}")
+                    return results
+                
+                group_results = self._run_group_concurrently(group, pool)
+                results.extend(group_results)
+                
+                if self.config.auto_update_viz:
+                    self._save_visualization()
+                
+                # A limit reached mid-group left some of its tasks unstarted
+                reason = self._stop_reason()
+                if reason and set(group) - {r.task_id for r in group_results}:
+                    print(f"Loop stopped: {reason}")
+                    return results
+                
+                if self.config.stop_on_failure and any(not r.success for r in results):
+                    if self.loop.fsm.current_state in {LoopState.BLOCKED, LoopState.FATAL_ERROR}:
+                        return results
+        
+        self.loop.step(LoopState.COMPLETE, "All tasks done")
+        return results
+    
+    def _run_group_concurrently(
+        self,
+        group: List[str],
+        pool: ThreadPoolExecutor
+    ) -> List[IterationResult]:
+        """
+        Run one parallel group and merge each task's FSM back into the runtime.
+        
+        Tasks start as workers free up, and only while the runtime FSM's
+        limits allow another (see _stop_reason), so max_iterations and
+        the consecutive-failure breaker hold inside a group too.
+        """
+        results = []
+        futures = {}
+        deferred = []
+        queue = list(group)
+        width = max(1, self.config.max_parallel_tasks)
+        
+        while queue or futures:
+            while queue and len(futures) < width and not self._stop_reason(len(futures)):
+                task_id = queue.pop(0)
+                node = self.dag.nodes.get(task_id)
+                if not node:
+                    continue
+                
+                task = self._task_from_node(node)
+                worker = self._spawn_task_worker()
+                
+                if self.worktree_pool:
+                    futures[pool.submit(worker._run_isolated, task)] = (task_id, worker)
+                    continue
+                
+                if self.scheduler:
+                    acquired, _ = self.scheduler.acquire_for_task(task_id)
+                    if not acquired:
+                        deferred.append(task)
+                        continue
+                
+                futures[pool.submit(worker.run_iteration, task)] = (task_id, worker)
+            
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_id, worker = futures.pop(future)
+                if self.scheduler and not self.worktree_pool:
+                    self.scheduler.release_for_task(task_id)
+                result = future.result()
+                self._merge_task_worker(worker, result)
+                self._record_duration(result)
+                results.append(result)
+        
+        # Tasks that could not get their file locks run after the group
+        for task in deferred:
+            if self._stop_reason():
+                break
+            result = self.run_iteration(task)
+            self._record_duration(result)
+            results.append(result)
+        
+        return results
+    
+    def _stop_reason(self, in_flight: int = 0) -> str:
+        """
+        Why the runtime FSM forbids starting another task ("" if it doesn't).
+        
+        Tasks still in flight count towards max_iterations, since each may
+        yet complete one.
+        """
+        fsm = self.loop.fsm
+        should_stop, reason = fsm.should_stop()
+        if not should_stop and fsm.iteration + in_flight >= fsm.max_iterations:
+            reason = "max_iterations_reached"
+        return reason
+    
+    def _spawn_task_worker(self) -> "DarkzloopRuntime":
+        """
+        Create a view of this runtime for one concurrent task.
+        
+        The worker shares context, visualizer, critic and the shared lock,
+        but gets its own FSM and manifest enforcer so concurrent tasks
+        cannot interleave state transitions.
+        """
+        worker = copy.copy(self)
+        worker.loop = create_loop({
+            "max_iterations": self.config.max_iterations,
+            "max_consecutive_failures": self.config.max_consecutive_failures,
+        })
+        worker.loop.fsm.max_task_retries = self.config.max_task_retries
+        worker.loop.fsm.task_retries = dict(self.loop.fsm.task_retries)
+        worker.manifest_enforcer = ManifestEnforcer(self.config.project_root)
+        worker.current_task = None
+        worker.current_manifest = None
+        worker.hints = []
+        worker._is_task_worker = True
+        return worker
+    
+    def _run_isolated(self, task: TaskDefinition) -> IterationResult:
+        """Run one iteration of a task worker inside a pooled worktree."""
+        with self.worktree_pool.checkout() as worktree:
+            self.worktree = worktree
+            self.work_dir = self.worktree_pool.project_dir(worktree)
+            try:
+                return self.run_iteration(task)
+            finally:
+                self.worktree = None
+                self.work_dir = self.config.project_root
+    
+    def _merge_task_worker(self, worker: "DarkzloopRuntime", result: IterationResult):
+        """Fold a finished worker's FSM counters and history into the runtime FSM."""
+        fsm = self.loop.fsm
+        worker_fsm = worker.loop.fsm
+        
+        fsm.transitions.extend(worker_fsm.transitions)
+        fsm.iteration += worker_fsm.iteration
+        fsm.task_retries[result.task_id] = worker_fsm.task_retries.get(result.task_id, 0)
+        fsm.current_task_id = result.task_id
+        
+        if result.success:
+            fsm.consecutive_failures = 0
+        else:
+            fsm.consecutive_failures += worker_fsm.consecutive_failures
+        
+        # A blocked or fatal task keeps the runtime there even if a
+        # sibling finishes later
+        if fsm.current_state not in {LoopState.BLOCKED, LoopState.FATAL_ERROR}:
+            fsm.current_state = worker_fsm.current_state
+    
     def _save_visualization(self):
         """Save current visualization to file."""
         output_path = self.config.project_root / ".darkzloop" / "status"
@@ -0,0 +1,507 @@
+"""
+darkzloop Subprocess Supervisor
+
+Gates and agents are process trees: `sh -c "cargo test"` starts cargo,
+which starts rustc and test binaries; agent CLIs start their own tools.
+subprocess.run(timeout=...) and proc.kill() only kill the top process,
+so every timeout left grandchildren running, burning CPU and slowing
+the following iterations.
+
+Solution: every command runs under one supervisor.
+- Each command gets its own session / process group
+- Timeout or cancellation terminates the whole group (SIGTERM, then
+  SIGKILL after a grace period); stragglers are killed on normal exit too
+- An optional idle watchdog kills commands that stop producing output
+  (a hung agent) instead of waiting out the full timeout
+- Output is captured through bounded OutputBuffers (see output.py)
+- The async API is event-loop native on POSIX (no thread per command),
+  so hundreds of commands can be in flight at once
+- The run's CPU time and peak RSS are reported alongside the result
+- An on_stdout hook sees output as it arrives, and can stop the command
+  once it has printed what we need
+
+Rule: "When darkzloop is done with a command, nothing it started is left."
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Union
+from pathlib import Path
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from .output import OutputBuffer, open_spool
+
+
+@dataclass
+class ProcessResult:
+    """Outcome and resource usage of a supervised command."""
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    duration_ms: int
+    timed_out: bool = False
+    hung: bool = False  # killed by the idle watchdog (implies timed_out)
+    error: Optional[str] = None  # could not start, timed out, ...
+    cpu_seconds: Optional[float] = None  # user + system, including waited-for children
+    max_rss_kb: Optional[int] = None
+    log_path: Optional[str] = None
+    stopped: bool = False  # killed because on_stdout asked (it had what it needed)
+    
+    @property
+    def success(self) -> bool:
+        return (self.returncode == 0 or self.stopped) and not self.timed_out and self.error is None
+    
+    def usage_summary(self) -> str:
+        """One-line summary, e.g. '12.3s wall, 40.1s cpu, 512.0 MB max rss'."""
+        parts = [f"{self.duration_ms / 1000:.1f}s wall"]
+        if self.cpu_seconds is not None:
+            parts.append(f"{self.cpu_seconds:.1f}s cpu")
+        if self.max_rss_kb is not None:
+            parts.append(f"{self.max_rss_kb / 1024:.1f} MB max rss")
+        return ", ".join(parts)
+
+
+HUNG_ERROR_PREFIX = "No output for"
+
+
+def is_hung_error(error: Optional[str]) -> bool:
+    """Whether an error message came from the idle watchdog."""
+    return bool(error) and error.startswith(HUNG_ERROR_PREFIX)
+
+
+def kill_process_tree(pid: int, sig: int = None):
+    """Signal a process group started by SupervisedProcess (the whole tree)."""
+    try:
+        if os.name == "posix":
+            os.killpg(pid, sig or signal.SIGKILL)
+        else:
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class SupervisedProcess:
+    """
+    A command running in its own process group with bounded output capture.
+    
+    Usage:
+        proc = SupervisedProcess("cargo test", cwd=root, log_dir=logs).start()
+        result = proc.wait(timeout=300)  # kills the whole tree on timeout
+        # or: proc.wait(timeout=300, idle_timeout=120) to also kill it after
+        # 120s without any output
+        print(result.success, result.usage_summary())
+    
+    kill() may be called from any thread, e.g. to cancel a running gate.
+    
+    on_stdout(chunk) is called with each chunk of stdout as it is read (on
+    the reader thread, or the event loop for the async API). Returning True
+    stops the command: its tree is killed and the result has stopped=True.
+    """
+    
+    def __init__(
+        self,
+        command: Union[str, List[str]],
+        cwd: Optional[Union[str, Path]] = None,
+        env: Optional[Dict[str, str]] = None,
+        input: Optional[bytes] = None,
+        stdout_limit: int = 5000,
+        stderr_limit: int = 2000,
+        log_dir: Optional[Path] = None,
+        kill_grace: float = 2.0,
+        on_stdout: Optional[Callable[[bytes], Optional[bool]]] = None,
+    ):
+        self.command = command
+        self.cwd = cwd
+        self.env = env
+        self.input = input
+        self.log_dir = log_dir
+        self.kill_grace = kill_grace
+        self.on_stdout = on_stdout
+        
+        self.stdout = OutputBuffer(stdout_limit)
+        self.stderr = OutputBuffer(stderr_limit)
+        
+        self.proc: Optional[subprocess.Popen] = None
+        self.error: Optional[str] = None
+        self.timed_out = False
+        self._spool = None
+        self._threads: List[threading.Thread] = []
+        self._exited = threading.Event()
+        self._rusage = None
+        self._kill_lock = threading.Lock()
+        self._killed = False
+        self._start_time = 0.0
+        self._end_time = 0.0
+        self._last_output = 0.0
+        self.hung = False
+        self.stopped = False
+    
+    @property
+    def display_command(self) -> str:
+        return self.command if isinstance(self.command, str) else " ".join(self.command)
+    
+    def start(self) -> "SupervisedProcess":
+        """Spawn the command. Failures to start are reported by wait()."""
+        if not self._popen():
+            self._exited.set()
+            return self
+        
+        self._spawn(self._pump, self.proc.stdout, self.stdout)
+        self._spawn(self._pump, self.proc.stderr, self.stderr)
+        if self.input is not None:
+            self._spawn(self._feed_input)
+        self._spawn(self._reap, reader=False)
+        return self
+    
+    def _popen(self) -> bool:
+        """Start the process in its own group; False (and self.error) on failure."""
+        self._start_time = self._last_output = time.monotonic()
+        self._spool = open_spool(self.log_dir, self.display_command)
+        self.stdout.spool = self.stderr.spool = self._spool
+        
+        kwargs = {"start_new_session": True} if os.name == "posix" else {
+            "creationflags": getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
+        }
+        try:
+            self.proc = subprocess.Popen(
+                self.command,
+                shell=isinstance(self.command, str),
+                cwd=self.cwd,
+                env=self.env,
+                stdin=subprocess.PIPE if self.input is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                **kwargs,
+            )
+        except (OSError, ValueError) as e:
+            if isinstance(e, FileNotFoundError):
+                program = self.command if isinstance(self.command, str) else self.command[0]
+                self.error = f"Command not found: {program}"
+            else:
+                self.error = str(e)
+            return False
+        return True
+    
+    def _spawn(self, target, *args, reader: bool = True):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        if reader:
+            self._threads.append(thread)
+    
+    def _pump(self, stream, buffer: OutputBuffer):
+        for chunk in iter(lambda: stream.read1(65536), b""):
+            self._received(buffer, chunk)
+    
+    def _received(self, buffer: OutputBuffer, data: bytes):
+        self._last_output = time.monotonic()
+        buffer.feed(data)
+        if buffer is self.stdout and self.on_stdout and not self.stopped:
+            if self.on_stdout(data):
+                self.stopped = True
+                self._stop()
+    
+    def _stop(self):
+        """Kill the tree without blocking the reader that asked for it."""
+        self._spawn(self.kill, reader=False)
+    
+    def _feed_input(self):
+        try:
+            self.proc.stdin.write(self.input)
+        except (BrokenPipeError, OSError):
+            pass  # the command exited without reading everything
+        finally:
+            try:
+                self.proc.stdin.close()
+            except OSError:
+                pass
+    
+    def _reap(self):
+        """Wait for the group leader, collecting its resource usage."""
+        if hasattr(os, "wait4"):
+            try:
+                _, status, self._rusage = os.wait4(self.proc.pid, 0)
+                self.proc.returncode = os.waitstatus_to_exitcode(status)
+            except ChildProcessError:
+                self.proc.wait()
+        else:
+            self.proc.wait()
+        self._end_time = time.monotonic()
+        self._exited.set()
+    
+    def kill(self):
+        """Terminate the whole process tree (idempotent, thread-safe)."""
+        with self._kill_lock:
+            if self._killed or self.proc is None:
+                return
+            self._killed = True
+        if os.name == "posix":
+            kill_process_tree(self.proc.pid, signal.SIGTERM)
+            self._exited.wait(self.kill_grace)
+        kill_process_tree(self.proc.pid, signal.SIGKILL if os.name == "posix" else None)
+    
+    def wait(
+        self,
+        timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None
+    ) -> ProcessResult:
+        """
+        Wait for the command, killing its process tree after timeout seconds,
+        or after idle_timeout seconds without output on stdout or stderr.
+        """
+        if self.proc is not None:
+            if not self._wait_exit(timeout, idle_timeout):
+                self.timed_out = True
+                self.kill()
+                self._exited.wait()
+            elif os.name == "posix":
+                # Leader is done; don't let stragglers outlive it
+                kill_process_tree(self.proc.pid, signal.SIGKILL)
+            
+            for thread in self._threads:
+                thread.join(timeout=5)  # a daemonized grandchild may hold the pipe
+            for stream in (self.proc.stdout, self.proc.stderr):
+                stream.close()
+        
+        return self._result(timeout, idle_timeout)
+    
+    def _wait_exit(self, timeout: Optional[float], idle_timeout: Optional[float]) -> bool:
+        """Wait for the leader to exit; False on timeout or inactivity."""
+        if not idle_timeout:
+            return self._exited.wait(timeout)
+        deadline = None if timeout is None else self._start_time + timeout
+        while True:
+            now = time.monotonic()
+            idle_deadline = self._last_output + idle_timeout
+            if now >= idle_deadline:
+                self.hung = True
+                return False
+            if deadline is not None and now >= deadline:
+                return False
+            wake = idle_deadline if deadline is None else min(idle_deadline, deadline)
+            if self._exited.wait(wake - now):
+                return True
+    
+    def _result(self, timeout: Optional[float], idle_timeout: Optional[float] = None) -> ProcessResult:
+        self.stdout.close()
+        self.stderr.close()
+        
+        error = self.error
+        if self.hung:
+            error = f"{HUNG_ERROR_PREFIX} {idle_timeout:g}s, killed as hung"
+        elif self.timed_out:
+            error = f"Command timed out after {timeout:g}s"
+        
+        cpu_seconds = max_rss_kb = None
+        if self._rusage is not None:
+            cpu_seconds = self._rusage.ru_utime + self._rusage.ru_stime
+            # ru_maxrss is KB on Linux, bytes on macOS
+            max_rss_kb = self._rusage.ru_maxrss // 1024 if sys.platform == "darwin" else self._rusage.ru_maxrss
+        
+        log_path = self._spool.name if self._spool else None
+        note = f", full log: {log_path}" if log_path else ""
+        stderr = self.stderr.getvalue(note)
+        if error:
+            stderr = f"{error}\n{stderr}" if stderr else error
+        
+        end = self._end_time or time.monotonic()
+        result = ProcessResult(
+            returncode=self.proc.returncode if self.proc else None,
+            stdout=self.stdout.getvalue(note),
+            stderr=stderr,
+            duration_ms=int((end - self._start_time) * 1000),
+            timed_out=self.timed_out,
+            hung=self.hung,
+            error=error,
+            cpu_seconds=cpu_seconds,
+            max_rss_kb=max_rss_kb,
+            log_path=log_path,
+            stopped=self.stopped,
+        )
+        
+        if self._spool:
+            self._spool.write(
+                f"\n[exit {result.returncode}, {result.usage_summary()}]\n".encode()
+            )
+            self._spool.close()
+        return result
+
+
+def run_supervised(
+    command: Union[str, List[str]],
+    timeout: Optional[float] = None,
+    idle_timeout: Optional[float] = None,
+    **kwargs
+) -> ProcessResult:
+    """Run a command to completion under supervision (see SupervisedProcess)."""
+    return SupervisedProcess(command, **kwargs).start().wait(timeout, idle_timeout)
+
+
+class _PipeReader(asyncio.Protocol):
+    """Feeds one output pipe of an AsyncSupervisedProcess into its buffer."""
+    
+    def __init__(self, owner: "AsyncSupervisedProcess", buffer: OutputBuffer):
+        self.owner = owner
+        self.buffer = buffer
+        self.closed = asyncio.get_running_loop().create_future()
+    
+    def data_received(self, data: bytes):
+        self.owner._received(self.buffer, data)
+    
+    def connection_lost(self, exc):
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+
+class AsyncSupervisedProcess(SupervisedProcess):
+    """
+    SupervisedProcess driven by the event loop (POSIX only).
+    
+    Pipes are read by loop transports and exit is detected through a pidfd
+    where available (Linux), so a running command costs no thread. Without
+    pidfd_open (macOS) one thread per command blocks in wait4.
+    
+    Usage:
+        proc = await AsyncSupervisedProcess(cmd, input=prompt.encode()).start_async()
+        result = await proc.wait_async(timeout=300, idle_timeout=120)
+    """
+    
+    async def start_async(self) -> "AsyncSupervisedProcess":
+        """Spawn the command. Failures to start are reported by wait_async()."""
+        loop = asyncio.get_running_loop()
+        self._exit_future = loop.create_future()
+        self._transports = []
+        self._readers = []
+        if not self._popen():
+            self._exit_future.set_result(None)
+            return self
+        
+        for pipe, buffer in ((self.proc.stdout, self.stdout), (self.proc.stderr, self.stderr)):
+            reader = _PipeReader(self, buffer)
+            transport, _ = await loop.connect_read_pipe(lambda: reader, pipe)
+            self._transports.append(transport)
+            self._readers.append(reader.closed)
+        
+        if self.input is not None:
+            # Closing after the write flushes first; a command that exits
+            # without reading just loses the pipe
+            transport, _ = await loop.connect_write_pipe(asyncio.Protocol, self.proc.stdin)
+            transport.write(self.input)
+            transport.close()
+        
+        self._watch_exit(loop)
+        return self
+    
+    def _watch_exit(self, loop: asyncio.AbstractEventLoop):
+        """Resolve _exit_future once the leader exits, reaping it with wait4."""
+        def reaped(_=None):
+            if not self._exit_future.done():
+                self._exit_future.set_result(None)
+        
+        try:
+            pidfd = os.pidfd_open(self.proc.pid)
+        except (AttributeError, OSError):
+            loop.run_in_executor(None, self._reap).add_done_callback(reaped)
+            return
+        
+        def on_exit():
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+            self._reap()  # the leader has exited, so wait4 returns at once
+            reaped()
+        
+        loop.add_reader(pidfd, on_exit)
+    
+    async def wait_async(
+        self,
+        timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None
+    ) -> ProcessResult:
+        """Async wait(); cancelling it kills the process tree."""
+        try:
+            if self.proc is not None:
+                if not await self._wait_exit_async(timeout, idle_timeout):
+                    self.timed_out = True
+                    await self.kill_async()
+                else:
+                    # Leader is done; don't let stragglers outlive it
+                    kill_process_tree(self.proc.pid, signal.SIGKILL)
+                await self._drain()
+        except asyncio.CancelledError:
+            await self.kill_async()
+            await self._drain()
+            self._result(timeout, idle_timeout)  # closes the log
+            raise
+        return self._result(timeout, idle_timeout)
+    
+    async def _wait_exit_async(self, timeout: Optional[float], idle_timeout: Optional[float]) -> bool:
+        """Wait for the leader to exit; False on timeout or inactivity."""
+        deadline = None if timeout is None else self._start_time + timeout
+        while True:
+            now = time.monotonic()
+            wake = deadline
+            if idle_timeout:
+                idle_deadline = self._last_output + idle_timeout
+                if now >= idle_deadline:
+                    self.hung = True
+                    return False
+                wake = idle_deadline if wake is None else min(wake, idle_deadline)
+            if wake is not None and now >= wake:
+                return False
+            done, _ = await asyncio.wait(
+                {self._exit_future}, timeout=None if wake is None else wake - now
+            )
+            if done:
+                return True
+    
+    def _stop(self):
+        # on_stdout runs on the loop, so the kill can too
+        self._stop_task = asyncio.get_running_loop().create_task(self.kill_async())
+    
+    async def kill_async(self):
+        """Terminate the whole process tree without blocking the loop."""
+        if self._killed or self.proc is None:
+            return
+        self._killed = True
+        kill_process_tree(self.proc.pid, signal.SIGTERM)
+        await asyncio.wait({self._exit_future}, timeout=self.kill_grace)
+        kill_process_tree(self.proc.pid, signal.SIGKILL)
+        await asyncio.shield(self._exit_future)
+    
+    async def _drain(self):
+        """Let the readers finish (bounded: a daemonized grandchild may hold a pipe)."""
+        if self._readers:
+            await asyncio.wait(self._readers, timeout=5)
+        for transport in self._transports:
+            transport.close()
+
+
+async def run_supervised_async(
+    command: Union[str, List[str]],
+    timeout: Optional[float] = None,
+    idle_timeout: Optional[float] = None,
+    **kwargs
+) -> ProcessResult:
+    """
+    Async run_supervised. Cancelling the awaiting task kills the process tree.
+    
+    Event-loop native on POSIX; elsewhere the command is waited on in a
+    worker thread.
+    """
+    if os.name == "posix":
+        proc = await AsyncSupervisedProcess(command, **kwargs).start_async()
+        return await proc.wait_async(timeout, idle_timeout)
+    
+    proc = SupervisedProcess(command, **kwargs).start()
+    loop = asyncio.get_running_loop()
+    waiting = loop.run_in_executor(None, proc.wait, timeout, idle_timeout)
+    try:
+        return await asyncio.shield(waiting)
+    except asyncio.CancelledError:
+        await loop.run_in_executor(None, proc.kill)
+        await waiting
+        raise
@@ -0,0 +1,214 @@
+"""
+darkzloop Worktree Isolation for Concurrent Agents
+
+When several agents share one working tree they overwrite each other's
+edits, and gates for task A run against task B's half-finished changes.
+File locks avoid this by serializing tasks, which caps parallelism.
+
+Solution: one git worktree per in-flight task.
+- Each task gets its own checkout of HEAD and runs its gates there
+- Finished work is merged back into the main tree as a patch
+- A patch that no longer applies is reported as a conflict
+- Worktrees are pooled, so build caches (target/, node_modules/) stay warm
+
+Rule: "Agents never share a working tree. The main tree only ever
+       receives complete, gate-checked changes."
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from pathlib import Path
+from contextlib import contextmanager
+import subprocess
+import threading
+import re
+
+
+class WorktreeError(Exception):
+    """Raised when a worktree cannot be created or reset."""
+    pass
+
+
+@dataclass
+class MergeResult:
+    """Outcome of merging a worktree's changes into the main tree."""
+    success: bool
+    files: List[str] = field(default_factory=list)
+    conflicts: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+def _git(args: List[str], cwd: Path, input: bytes = None) -> subprocess.CompletedProcess:
+    """Run a git command, capturing output."""
+    return subprocess.run(
+        ["git"] + args,
+        cwd=cwd,
+        input=input,
+        capture_output=True,
+    )
+
+
+class WorktreePool:
+    """
+    A pool of reusable git worktrees rooted in the main repository.
+    
+    Worktrees live under <git common dir>/darkzloop-worktrees, so they are
+    never picked up by `git add -A` in the main tree. Thread-safe: acquire,
+    release and merge_back may be called from concurrent task workers.
+    
+    Usage:
+        pool = WorktreePool(project_root, max_size=4)
+        with pool.checkout() as path:
+            run_agent(..., cwd=path)
+            result = pool.merge_back(path)
+    """
+    
+    def __init__(self, project_root: Path, max_size: int = 4):
+        self.project_root = Path(project_root)
+        self.max_size = max(1, max_size)
+        
+        info = _git(
+            ["rev-parse", "--path-format=absolute", "--git-common-dir", "--show-toplevel", "--show-prefix"],
+            self.project_root,
+        )
+        if info.returncode != 0:
+            raise WorktreeError(f"Not a git repository: {self.project_root}")
+        git_dir, toplevel, *prefix = info.stdout.decode().splitlines()
+        self.base_dir = Path(git_dir) / "darkzloop-worktrees"
+        self.toplevel = Path(toplevel)
+        self.prefix = prefix[0] if prefix else ""  # project_root relative to the repo root
+        
+        self._lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._available = threading.Semaphore(self.max_size)
+        self._idle: List[Path] = []
+        self._all: List[Path] = []
+        
+        # Reuse worktrees left by a previous run
+        if self.base_dir.exists():
+            for path in sorted(self.base_dir.iterdir()):
+                if (path / ".git").exists() and len(self._all) < self.max_size:
+                    self._all.append(path)
+                    self._idle.append(path)
+    
+    def acquire(self) -> Path:
+        """
+        Check out a worktree at the main tree's current HEAD.
+        
+        Blocks while max_size worktrees are in use.
+        """
+        self._available.acquire()
+        try:
+            with self._lock:
+                path = self._idle.pop() if self._idle else self._create()
+            self._reset(path)
+            return path
+        except Exception:
+            self._available.release()
+            raise
+    
+    def release(self, path: Path):
+        """Return a worktree to the pool for reuse."""
+        with self._lock:
+            if path not in self._idle:
+                self._idle.append(path)
+        self._available.release()
+    
+    def project_dir(self, path: Path) -> Path:
+        """The directory inside a worktree that corresponds to project_root."""
+        return path / self.prefix if self.prefix else path
+    
+    @contextmanager
+    def checkout(self):
+        """Acquire a worktree for the duration of a with-block."""
+        path = self.acquire()
+        try:
+            yield path
+        finally:
+            self.release(path)
+    
+    def _create(self) -> Path:
+        """Create a new detached worktree. Caller holds self._lock."""
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        path = self.base_dir / f"wt-{len(self._all)}"
+        result = _git(["worktree", "add", "--detach", "--force", str(path), "HEAD"], self.toplevel)
+        if result.returncode != 0:
+            raise WorktreeError(f"git worktree add failed: {result.stderr.decode(errors='replace')}")
+        self._all.append(path)
+        return path
+    
+    def _reset(self, path: Path):
+        """Point a worktree at the main HEAD and drop leftover changes (ignored files are kept)."""
+        head = _git(["rev-parse", "HEAD"], self.project_root)
+        if head.returncode != 0:
+            raise WorktreeError("Main tree has no HEAD commit")
+        sha = head.stdout.decode().strip()
+        
+        for args in (["checkout", "--force", "--detach", sha], ["clean", "-fd"]):
+            result = _git(args, path)
+            if result.returncode != 0:
+                raise WorktreeError(
+                    f"git {args[0]} failed in {path}: {result.stderr.decode(errors='replace')}"
+                )
+    
+    def collect_changes(self, path: Path) -> Tuple[bytes, List[str]]:
+        """
+        Return (patch, changed files) for everything done in a worktree.
+        
+        New files are included; ignored files are not.
+        """
+        _git(["add", "-A"], path)
+        names = _git(["diff", "--cached", "--name-only"], path)
+        files = [f for f in names.stdout.decode(errors="replace").splitlines() if f]
+        patch = _git(["diff", "--cached", "--binary"], path).stdout if files else b""
+        return patch, files
+    
+    def merge_back(self, path: Path) -> MergeResult:
+        """
+        Apply a worktree's changes to the main working tree.
+        
+        Merges are serialized. If the patch does not apply cleanly (another
+        task already changed the same lines), nothing is written and the
+        conflicting files are reported.
+        """
+        patch, files = self.collect_changes(path)
+        if not files:
+            return MergeResult(success=True)
+        
+        with self._merge_lock:
+            check = _git(["apply", "--check", "-"], self.toplevel, input=patch)
+            if check.returncode != 0:
+                stderr = check.stderr.decode(errors="replace")
+                conflicts = sorted(set(
+                    re.findall(r"error: (?:patch failed: )?([^\s:]+):", stderr)
+                )) or files
+                return MergeResult(
+                    success=False,
+                    files=files,
+                    conflicts=conflicts,
+                    error=f"Merge conflict in {', '.join(conflicts)}",
+                )
+            
+            applied = _git(["apply", "-"], self.toplevel, input=patch)
+            if applied.returncode != 0:
+                return MergeResult(
+                    success=False,
+                    files=files,
+                    error=applied.stderr.decode(errors="replace").strip(),
+                )
+        
+        return MergeResult(success=True, files=files)
+    
+    def cleanup(self):
+        """Remove every pooled worktree."""
+        with self._lock:
+            for path in self._all:
+                _git(["worktree", "remove", "--force", str(path)], self.toplevel)
+            _git(["worktree", "prune"], self.toplevel)
+            self._all = []
+            self._idle = []
+
+
+def create_worktree_pool(project_root: Path, max_size: int = 4) -> WorktreePool:
+    """Factory function for a worktree pool."""
+    return WorktreePool(project_root, max_size)
@@ -63,6 +63,28 @@ class TestFSM:
         ctx.transition(LoopState.TASK_FAILURE, "Test failed")
         
         assert ctx.consecutive_failures == 1
+    
+    def test_hung_agent_is_distinct_retryable_failure(self):
+        """Failure kinds are recorded without changing retry semantics."""
+        from darkzloop.core.fsm import FSMContext, LoopState, FailureKind
+        
+        ctx = FSMContext()
+        ctx.start_task("1.1")
+        ctx.transition(LoopState.PLAN)
+        ctx.transition(LoopState.EXECUTE)
+        state, message = ctx.record_task_failure("No output for 180s", FailureKind.AGENT_HUNG)
+        
+        assert state == LoopState.TASK_FAILURE and message == "retry"
+        assert ctx.is_retryable_failure()
+        assert ctx.last_failure_kind == FailureKind.AGENT_HUNG
+        assert ctx.failure_counts == {"agent_hung": 1}
+        assert ctx.to_dict()["transitions"][-1]["failure_kind"] == "agent_hung"
+        
+        ctx.transition(LoopState.PLAN)
+        ctx.transition(LoopState.EXECUTE)
+        ctx.fail_task("Gate failed", kind=FailureKind.GATE_FAILED)
+        assert ctx.last_failure_kind == FailureKind.GATE_FAILED
+        assert FSMContext.from_dict(ctx.to_dict()).failure_counts == {"agent_hung": 1, "gate_failed": 1}
 
 
 # ============================================================================
@@ -201,6 +223,394 @@ class TestExecutors:
         
         assert isinstance(executor, MockExecutor)
     
+    def test_api_client_is_created_once(self):
+        """Every call and worker thread shares one API client."""
+        import threading
+        from darkzloop.core.executors import ExecutorConfig, ExecutorType
+        from darkzloop.core.executors.api import APIExecutor
+        
+        executor = APIExecutor(ExecutorConfig(type=ExecutorType.API, max_connections=16))
+        created = []
+        
+        def factory():
+            created.append(object())
+            return created[-1]
+        
+        clients = []
+        workers = [
+            threading.Thread(target=lambda: clients.append(executor._get_client(factory)))
+            for _ in range(16)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        assert len(created) == 1
+        assert all(client is created[0] for client in clients)
+    
+    def test_stream_stops_at_complete_action(self):
+        """The action is parsed mid-stream and the rest is never read."""
+        import time
+        from darkzloop.core.executors.streaming import ActionScanner, collect_stream
+        
+        text = (
+            'Example: {"not": "an action"} then ```json\n'
+            '{"thinking": "a } in a \\"string\\" {", "action": "edit", "parameters": {"path": "a.py"}}'
+            '\n``` and a long explanation nobody reads...'
+        )
+        
+        scanner = ActionScanner()
+        for i in range(0, len(text), 7):
+            action = scanner.feed(text[i:i + 7])
+            if action:
+                break
+        assert action == {"thinking": 'a } in a "string" {', "action": "edit", "parameters": {"path": "a.py"}}
+        assert i < text.index("long explanation")
+        
+        consumed = []
+        
+        def deltas():
+            for i in range(0, len(text), 5):
+                consumed.append(i)
+                yield text[i:i + 5]
+        
+        result = collect_stream(deltas(), time.time())
+        assert result.stopped_early
+        assert result.action["action"] == "edit"
+        assert result.ttft_ms is not None
+        assert len(consumed) < len(range(0, len(text), 5))
+        
+        full = collect_stream(iter([text]), time.time(), stop_on_action=False)
+        assert not full.stopped_early and full.content == text
+    
+    def test_execute_async_is_limited_per_executor(self):
+        """Hundreds of requests share one loop; max_concurrency bounds those in flight."""
+        import asyncio
+        import shutil
+        import threading
+        from darkzloop.core.executors import ExecutorConfig, ExecutorType
+        from darkzloop.core.executors.mock import MockExecutor
+        from darkzloop.core.executors.shell import ShellExecutor
+        
+        class ProbeExecutor(MockExecutor):
+            in_flight = peak = 0
+            
+            async def _execute_async(self, prompt, system_prompt=""):
+                self.in_flight += 1
+                self.peak = max(self.peak, self.in_flight)
+                try:
+                    return await super()._execute_async(prompt, system_prompt)
+                finally:
+                    self.in_flight -= 1
+        
+        executor = ProbeExecutor(ExecutorConfig(type=ExecutorType.MOCK, max_concurrency=8))
+        executor.set_latency(20)
+        threads = threading.active_count()
+        
+        async def main():
+            return await asyncio.gather(*(executor.execute_async(f"task {i}") for i in range(200)))
+        
+        responses = asyncio.run(main())
+        assert all(r.success for r in responses)
+        assert len(executor.get_captured_prompts()) == 200
+        assert executor.peak == 8
+        assert threading.active_count() == threads  # no worker threads were needed
+        
+        if shutil.which("cat"):
+            shell = ShellExecutor(ExecutorConfig(command="cat", args=[], adaptive_timeout=False))
+            
+            async def echo():
+                return await asyncio.gather(*(shell.execute_async(f"task {i}") for i in range(20)))
+            
+            echoed = asyncio.run(echo())
+            assert all(r.success and r.content.endswith(f"task {i}") for i, r in enumerate(echoed))
+    
+    def test_response_cache_reuses_and_replays(self, tmp_path):
+        """Identical requests are answered from disk; replay mode never calls the backend."""
+        import os
+        from darkzloop.core.executors import ExecutorConfig, ExecutorType
+        from darkzloop.core.executors.mock import MockExecutor
+        from darkzloop.core.response_cache import ResponseCache
+        
+        def mock(mode, **kw):
+            config = ExecutorConfig(type=ExecutorType.MOCK, response_cache=mode,
+                                    response_cache_dir=str(tmp_path / "cache"), **kw)
+            return MockExecutor(config)
+        
+        live = mock("on")
+        first = live.execute("task", "system")
+        again = live.execute("task", "system")
+        assert not first.cached and again.cached and again.action == first.action
+        assert len(live.get_captured_prompts()) == 1
+        
+        live.execute("task", "other system")
+        mock("on", temperature=0.7).execute("task", "system")
+        assert len(live.get_captured_prompts()) == 2
+        
+        replay = mock("replay")
+        assert replay.execute("task", "system").cached
+        miss = replay.execute("new task", "system")
+        assert not miss.success and "cache miss" in miss.error
+        assert replay.get_captured_prompts() == []
+        
+        # Eviction drops the least recently used entries first
+        cache = ResponseCache(tmp_path / "lru")
+        keys = [f"{i:02x}" * 32 for i in range(7)]
+        for i, key in enumerate(keys[:5]):
+            cache.put(key, first)
+            os.utime(cache._entry_path(key), (i, i))
+        cache.max_bytes = 6 * os.path.getsize(cache._entry_path(keys[0]))
+        assert cache.get(keys[0]) is not None  # refreshes the oldest entry
+        cache.put(keys[5], first)
+        cache.put(keys[6], first)  # over the cap: the two least recently used go
+        assert [cache.get(key) is not None for key in keys] == [True, False, False, True, True, True, True]
+        
+        # Overwriting an entry does not grow the accounted size
+        cache.max_bytes = 1 << 30
+        size = cache._size
+        for _ in range(10):
+            cache.put(keys[6], first)
+        assert cache._size == size
+    
+    def test_legacy_executor_overriding_execute(self, tmp_path):
+        """Subclasses that implement execute() directly still go through the cache."""
+        import asyncio
+        from darkzloop.core.executors import BaseExecutor, ExecutorConfig, ExecutorResponse
+        
+        calls = []
+        
+        class Legacy(BaseExecutor):
+            def execute(self, prompt, system_prompt=""):
+                calls.append(prompt)
+                return ExecutorResponse(success=True, content=prompt, raw_output=prompt)
+            
+            def is_available(self):
+                return True, "ok"
+        
+        legacy = Legacy(ExecutorConfig(response_cache="on", response_cache_dir=str(tmp_path)))
+        assert legacy.execute("task").content == "task"
+        assert legacy.execute("task").cached
+        assert asyncio.run(legacy.execute_async("task")).cached
+        assert calls == ["task"]
+        
+        class Bare(BaseExecutor):
+            def is_available(self):
+                return True, "ok"
+        
+        with pytest.raises(NotImplementedError, match="_execute"):
+            Bare(ExecutorConfig()).execute("task")
+    
+    def test_system_prompt_is_cached_prefix(self):
+        """The system prompt is sent once, marked cacheable; cache hits are counted."""
+        from types import SimpleNamespace
+        from darkzloop.core.executors import ExecutorConfig, ExecutorType
+        from darkzloop.core.executors.api import APIExecutor
+        
+        executor = APIExecutor(ExecutorConfig(type=ExecutorType.API, system_prompt_prefix="Be brief."))
+        system = executor._system_prompt("Protocols...")
+        params = executor._anthropic_params("Task 1.1", system)
+        assert params["system"] == [{
+            "type": "text",
+            "text": "Be brief.\n\nProtocols...",
+            "cache_control": {"type": "ephemeral"},
+        }]
+        assert params["messages"] == [{"role": "user", "content": "Task 1.1"}]
+        
+        usage = SimpleNamespace(input_tokens=50, cache_read_input_tokens=2000, cache_creation_input_tokens=0)
+        assert executor._anthropic_input(usage) == (2050, {"cache_read_tokens": 2000, "cache_write_tokens": 0})
+        
+        executor.config.prompt_cache = False
+        assert executor._anthropic_params("Task 1.1", system)["system"] == system
+    
+    def test_rate_limiter_queues_and_retries_throttled_calls(self):
+        """Calls queue at the budget; a 429's retry-after pauses every caller, then is retried."""
+        from types import SimpleNamespace
+        from darkzloop.core.rate_limit import RateLimiter, get_rate_limiter, classify_error
+        from darkzloop.core.executors import ExecutorConfig, ExecutorResponse, ExecutorType
+        from darkzloop.core.executors.mock import MockExecutor
+        
+        # A minute's budget is available at once, then callers queue at the rate
+        limiter = RateLimiter(requests_per_minute=60)
+        delays = [round(limiter.reserve(), 1) for _ in range(62)]
+        assert delays[-3:] == [0.0, 1.0, 2.0]
+        limiter.pause(5)
+        assert 4.9 < limiter.reserve() <= 5
+        
+        class RateLimitError(Exception):
+            status_code = 429
+            response = SimpleNamespace(headers={"retry-after": "7"})
+        
+        class APIConnectionError(Exception):
+            pass
+        
+        assert classify_error(RateLimitError()) == (True, 7.0)
+        assert classify_error(APIConnectionError()) == (True, None)
+        assert classify_error(ValueError()) == (False, None)
+        
+        class Throttled(MockExecutor):
+            failures = 2
+            
+            def _execute(self, prompt, system_prompt=""):
+                if self.failures:
+                    self.failures -= 1
+                    return ExecutorResponse(success=False, content="", raw_output="", error="429",
+                                            retryable=True, retry_after=0.01)
+                return super()._execute(prompt, system_prompt)
+        
+        config = dict(type=ExecutorType.MOCK, model="rate-limit-test", requests_per_minute=600)
+        executor = Throttled(ExecutorConfig(**config))
+        response = executor.execute("task")
+        assert response.success and response.attempts == 3 and response.queued_ms >= 10
+        assert executor.rate_limiter is get_rate_limiter("anthropic/rate-limit-test")
+        assert executor.rate_limiter.throttled == 2
+        
+        # Retries are bounded by retry_attempts
+        executor = Throttled(ExecutorConfig(**dict(config, retry_attempts=1)))
+        response = executor.execute("task")
+        assert not response.success and response.attempts == 2
+    
+    def test_hedged_executor_races_slow_primary(self, tmp_path):
+        """Past the primary's p95 the secondary is sent too; the first valid action wins."""
+        import time
+        from darkzloop.core.executors import ExecutorConfig, ExecutorType, create_executor
+        
+        executor = create_executor(ExecutorConfig(
+            type=ExecutorType.HEDGED,
+            cwd=str(tmp_path),
+            hedge_primary={"type": "mock"},
+            hedge_secondary={"type": "mock"},
+            hedge_budget=0.25,
+        ))
+        executor.secondary.set_default_response('{"action": "done", "reason": "secondary"}')
+        
+        # Nothing is hedged until the primary has a latency history
+        assert executor.execute("task").hedged is None
+        for _ in range(5):
+            executor.timeouts.record(executor.latency_key, 50)
+        
+        executor.primary.set_latency(300)
+        start = time.monotonic()
+        response = executor.execute("task")
+        assert response.hedged == "secondary" and response.action["reason"] == "secondary"
+        assert time.monotonic() - start < 0.25  # the slow primary was cancelled
+        
+        # One duplicate in three requests is over a 25% budget
+        response = executor.execute("task")
+        assert response.hedged is None and response.action["reason"] == "mock"
+        assert (executor.requests, executor.hedges) == (3, 1)
+    
+    def test_batch_jobs_against_local_server(self):
+        """run_batches chunks requests into jobs and yields each job's results once it ends."""
+        import json
+        from urllib.request import Request, urlopen
+        from darkzloop.core.executors import ExecutorResponse
+        from darkzloop.core.executors.batch import BatchRequest, BatchStatus, run_batches
+        from darkzloop.core.executors.batch_server import LocalBatchServer
+        
+        def respond(params):
+            return json.dumps({"action": "no_op", "reason": params["messages"][0]["content"]})
+        
+        class Client:
+            """Just enough of APIExecutor's batch methods, over plain HTTP."""
+            def __init__(self, url):
+                self.url = url + "/v1/messages/batches"
+            
+            def call(self, path="", body=None):
+                data = json.dumps(body).encode() if body is not None else None
+                with urlopen(Request(self.url + path, data=data)) as r:
+                    return r.read().decode()
+            
+            def submit_batch(self, requests):
+                params = [{"custom_id": r.custom_id, "params": {"messages": [{"content": r.prompt}]}}
+                          for r in requests if r.custom_id != "lost"]
+                return json.loads(self.call(body={"requests": params}))["id"]
+            
+            def batch_status(self, batch_id):
+                batch = json.loads(self.call(f"/{batch_id}"))
+                return BatchStatus(batch_id, batch["processing_status"] == "ended",
+                                   succeeded=batch["request_counts"]["succeeded"])
+            
+            def batch_results(self, batch_id):
+                for line in self.call(f"/{batch_id}/results").splitlines():
+                    entry = json.loads(line)
+                    text = entry["result"]["message"]["content"][0]["text"]
+                    yield entry["custom_id"], ExecutorResponse(True, text, text, action=json.loads(text))
+            
+            def cancel_batch(self, batch_id):
+                self.call(f"/{batch_id}/cancel", body={})
+        
+        polls = []
+        with LocalBatchServer(responder=respond, polls_to_finish=2) as server:
+            requests = [BatchRequest(f"file-{i}", f"prompt {i}") for i in range(5)] + [BatchRequest("lost", "x")]
+            results = dict(run_batches(Client(server.url), requests, chunk_size=2, sleep=polls.append))
+            assert len(server.batches) == 3
+        
+        assert results["file-3"].action["reason"] == "prompt 3"
+        assert all(results[f"file-{i}"].success for i in range(5))
+        assert not results["lost"].success and "No result" in results["lost"].error
+        assert len(polls) == 1  # every job ends on its second poll
+        
+        # An interrupted run cancels the jobs it left running
+        def interrupt(seconds):
+            raise KeyboardInterrupt
+        
+        with LocalBatchServer(polls_to_finish=100) as server:
+            with pytest.raises(KeyboardInterrupt):
+                list(run_batches(Client(server.url), requests[:4], chunk_size=2, sleep=interrupt))
+            assert len(server.batches) == 2
+            for batch in server.batches.values():
+                assert batch["status"] == "ended"
+                assert [r["result"]["type"] for r in batch["results"]] == ["canceled", "canceled"]
+    
+    def test_api_executor_batch_round_trip(self):
+        """APIExecutor submits, polls and reads a Message Batch (local stand-in server)."""
+        pytest.importorskip("anthropic")
+        from darkzloop.core.executors import ExecutorConfig, ExecutorType
+        from darkzloop.core.executors.api import APIExecutor
+        from darkzloop.core.executors.batch import BatchRequest, run_batches
+        from darkzloop.core.executors.batch_server import LocalBatchServer
+        
+        with LocalBatchServer() as server:
+            executor = APIExecutor(ExecutorConfig(type=ExecutorType.API, api_key="test", base_url=server.url))
+            requests = [BatchRequest(f"file-{i}", "Fix it") for i in range(3)]
+            results = dict(run_batches(executor, requests, poll_interval=0))
+        
+        assert sorted(results) == ["file-0", "file-1", "file-2"]
+        assert all(r.success and r.action["action"] == "no_op" for r in results.values())
+    
+    def test_shell_executor_streams_and_stops_at_action(self):
+        """Output is cleaned line by line as it arrives; the tool is stopped once its action is out."""
+        import asyncio
+        import sys
+        import time
+        from darkzloop.core.executors import ExecutorConfig, ExecutorType
+        from darkzloop.core.executors.shell import ShellExecutor
+        
+        script = (
+            "import time\n"
+            "print('\\x1b[32mLoading model...\\x1b[0m', flush=True)\n"
+            "print('\\x1b[1mworking on it\\x1b[0m', flush=True)\n"
+            "print('{\"action\": \"done\", \"reason\": \"ok\"}', flush=True)\n"
+            "time.sleep(30)\n"
+            "print('a long explanation nobody reads')\n"
+        )
+        executor = ShellExecutor(ExecutorConfig(
+            type=ExecutorType.SHELL, command=sys.executable, args=["-c", script], adaptive_timeout=False,
+        ))
+        progress = []
+        executor.on_progress = progress.append
+        
+        for run in (lambda: executor.execute("task"), lambda: asyncio.run(executor.execute_async("task"))):
+            progress.clear()
+            start = time.monotonic()
+            response = run()
+            assert time.monotonic() - start < 10
+            assert response.success and response.stopped_early
+            assert response.action == {"action": "done", "reason": "ok"}
+            assert progress == ["working on it", '{"action": "done", "reason": "ok"}']
+            assert "explanation" not in response.content
+    
     def test_preset_loading(self):
         """Presets load correctly."""
         from darkzloop.core.executors.presets import get_preset, list_presets
@@ -214,6 +624,872 @@ class TestExecutors:
         assert "--dangerously-skip-permissions" in claude.args
 
 
+# ============================================================================
+# DAG Tests
+# ============================================================================
+
+class TestDAG:
+    """Test DAG scheduling."""
+    
+    def test_async_launches_node_when_its_deps_finish(self):
+        """A slow node does not hold back unrelated nodes in the next level."""
+        import asyncio
+        import time
+        from darkzloop.core.dag import DAGExecutor
+        
+        dag = DAGExecutor(max_parallel=4)
+        dag.add_node("slow", {"sleep": 0.3})
+        dag.add_node("fast", {"sleep": 0.0})
+        dag.add_node("after_fast", {"sleep": 0.0}, ["fast"])
+        
+        finished = {}
+        
+        def run(node_id, data):
+            time.sleep(data["sleep"])
+            finished[node_id] = time.time()
+            return True, node_id, ""
+        
+        result = asyncio.run(dag.execute_async(run))
+        
+        assert result.success
+        assert set(result.completed_nodes) == {"slow", "fast", "after_fast"}
+        assert finished["after_fast"] < finished["slow"]
+    
+    def test_async_skips_descendants_of_failed_node(self):
+        """Dependents of a failed node are skipped."""
+        import asyncio
+        from darkzloop.core.dag import DAGExecutor, NodeStatus
+        
+        dag = DAGExecutor()
+        dag.add_node("a", {})
+        dag.add_node("b", {}, ["a"])
+        dag.add_node("c", {}, ["b"])
+        
+        result = asyncio.run(dag.execute_async(
+            lambda node_id, data: (node_id != "a", None, "boom"),
+            stop_on_failure=False,
+        ))
+        
+        assert result.failed_nodes == ["a"]
+        assert sorted(result.skipped_nodes) == ["b", "c"]
+        assert dag.nodes["c"].status == NodeStatus.SKIPPED
+    
+    def test_async_reuses_bounded_pool(self):
+        """Nodes share one pool and never exceed max_parallel."""
+        import asyncio
+        import threading
+        import time
+        from darkzloop.core.dag import DAGExecutor
+        
+        dag = DAGExecutor(max_parallel=2)
+        for i in range(6):
+            dag.add_node(f"n{i}", {})
+        
+        lock = threading.Lock()
+        running = []
+        peak = []
+        threads = set()
+        
+        def run(node_id, data):
+            with lock:
+                running.append(node_id)
+                peak.append(len(running))
+                threads.add(threading.get_ident())
+            time.sleep(0.02)
+            with lock:
+                running.remove(node_id)
+            return True, None, ""
+        
+        with dag:
+            asyncio.run(dag.execute_async(run))
+            pool = dag._pool
+            asyncio.run(dag.execute_async(run))
+            assert dag._pool is pool
+        
+        assert max(peak) == 2
+        assert len(threads) <= 2
+        assert dag._pool is None
+    
+    def test_critical_path_runs_first(self, tmp_path):
+        """With one slot, the node on the longest historical path starts first."""
+        import asyncio
+        from darkzloop.core.dag import DAGExecutor, DurationHistory
+        
+        history = DurationHistory(tmp_path)
+        history.record("short", 10)
+        history.record("long", 500)
+        history.record("after_long", 500)
+        history.save()
+        
+        dag = DAGExecutor(max_parallel=1, history=DurationHistory(tmp_path))
+        dag.add_node("short", {})
+        dag.add_node("long", {})
+        dag.add_node("after_long", {}, ["long"])
+        
+        priorities = dag.compute_priorities()
+        assert priorities["long"] == 1000
+        assert priorities["short"] == 10
+        
+        order = []
+        asyncio.run(dag.execute_async(lambda node_id, data: (order.append(node_id) or True, None, "")))
+        
+        assert order[0] == "long"
+        assert len(DurationHistory(tmp_path).samples["short"]) == 2
+    
+    def test_long_chain_validates_without_recursion(self):
+        """Plans deeper than the recursion limit validate and order in levels."""
+        import sys
+        from darkzloop.core.dag import DAGExecutor
+        
+        size = sys.getrecursionlimit() + 500
+        dag = DAGExecutor()
+        for i in range(size):
+            dag.add_node(f"t{i}", {}, [f"t{i - 1}"] if i else [])
+        
+        assert dag.validate() == (True, "")
+        assert len(dag.compute_execution_order()) == size
+    
+    def test_cycle_is_reported_with_path(self):
+        """validate names the nodes that form the cycle."""
+        from darkzloop.core.dag import DAGExecutor
+        
+        dag = DAGExecutor()
+        dag.add_node("root", {})
+        dag.add_node("a", {}, ["root", "c"])
+        dag.add_node("b", {}, ["a"])
+        dag.add_node("c", {}, ["b"])
+        
+        valid, message = dag.validate()
+        
+        assert not valid
+        assert message == "DAG contains a cycle: a -> c -> b -> a"
+        assert dag.compute_execution_order() == [["root"]]
+    
+    def test_plan_parser_reads_nested_blocks_for_both_id_styles(self):
+        """Modify/Dependencies bullets are captured for bold and comment IDs."""
+        import io
+        from darkzloop.core.dag import parse_plan_to_dag
+        
+        plan = io.StringIO(
+            "## Phase 1\n"
+            "- [ ] **Task 1.1**: Add model\n"
+            "  - Modify: `src/model.py`\n"
+            "- [x] Add routes <!-- id: api -->\n"
+            "  - New file: `src/routes.py`\n"
+            "  - [ ] wire up handlers\n"
+            "  - Dependencies: 1.1\n"
+            "- [ ] Untracked chore\n"
+            "  - Modify: `README.md`\n"
+            "## Phase 2\n"
+            "- [ ] **1.2**: Add tests\n"
+        )
+        
+        dag = parse_plan_to_dag(plan)
+        
+        assert list(dag.nodes) == ["1.1", "api", "1.2"]
+        assert dag.nodes["1.1"].task_data["files_to_modify"] == ["src/model.py"]
+        assert dag.nodes["api"].task_data["description"] == "Add routes"
+        assert dag.nodes["api"].task_data["files_to_create"] == ["src/routes.py"]
+        assert dag.nodes["api"].dependencies == ["1.1"]
+        assert dag.nodes["1.2"].dependencies == ["1.1"]
+        assert dag.nodes["1.2"].task_data["files_to_modify"] == []
+    
+    def test_shell_output_is_bounded_and_spooled(self, tmp_path):
+        """Huge or non-UTF-8 output keeps head and tail; the full log is on disk."""
+        import asyncio
+        import sys
+        from darkzloop.core.dag import run_shell_command_async, run_shell_command_sync
+        
+        script = tmp_path / "noisy.py"
+        script.write_text(
+            "import sys\n"
+            "sys.stdout.buffer.write(b'START' + b'x' * 1000000 + b'\\xff' + b'\\xe2\\x82' + b'END')\n"
+        )
+        command = f"{sys.executable} {script}"
+        log_dir = tmp_path / "logs"
+        
+        for result in (
+            run_shell_command_sync(command, log_dir=log_dir),
+            asyncio.run(run_shell_command_async(command, log_dir=log_dir)),
+        ):
+            success, stdout, stderr = result
+            assert success
+            if sys.platform != "win32":
+                assert result.cpu_seconds is not None and result.max_rss_kb > 0
+            assert stdout.startswith("START")
+            assert stdout.endswith("\ufffd\ufffdEND")
+            assert "chars truncated, full log:" in stdout
+            assert len(stdout) < 6000
+            assert stderr == ""
+        
+        logs = sorted(log_dir.glob("*.log"))
+        assert len(logs) == 2
+        assert all(log.stat().st_size > 1000000 for log in logs)
+    
+    @pytest.mark.skipif(not Path("/proc").exists(), reason="needs POSIX process groups and /proc")
+    def test_supervisor_kills_process_tree(self, tmp_path):
+        """Timeouts and cancellation kill grandchildren; usage is reported."""
+        import asyncio
+        import sys
+        import time
+        from darkzloop.core.supervisor import run_supervised, run_supervised_async
+        
+        def alive(pid):
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    return f.read().split(")")[-1].split()[0] != "Z"
+            except FileNotFoundError:
+                return False
+        
+        def spawn_sleeper(name):
+            pid_file = tmp_path / name
+            return pid_file, f"sleep 60 & echo $! > {pid_file}; wait"
+        
+        pid_file, command = spawn_sleeper("sync.pid")
+        result = run_supervised(command, timeout=1, kill_grace=0.5)
+        assert result.timed_out and not result.success
+        assert result.stderr.startswith("Command timed out after 1s")
+        grandchild = int(pid_file.read_text())
+        time.sleep(0.2)
+        assert not alive(grandchild)
+        
+        async def cancel_gate():
+            pid_file, command = spawn_sleeper("async.pid")
+            task = asyncio.ensure_future(run_supervised_async(command, kill_grace=0.5))
+            await asyncio.sleep(0.5)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return int(pid_file.read_text())
+        
+        grandchild = asyncio.run(cancel_gate())
+        time.sleep(0.2)
+        assert not alive(grandchild)
+        
+        busy = run_supervised([sys.executable, "-c", "sum(range(3000000)); print('ok')"])
+        assert busy.success and busy.stdout.strip() == "ok"
+        assert busy.cpu_seconds > 0
+        assert busy.max_rss_kb > 1000
+        assert "cpu" in busy.usage_summary()
+        
+        missing = run_supervised(["definitely-not-a-command-xyz"])
+        assert not missing.success
+        assert missing.error == "Command not found: definitely-not-a-command-xyz"
+    
+    def test_supervisor_idle_watchdog(self):
+        """Silent commands are killed as hung; chatty ones run to completion."""
+        import sys
+        import time
+        from darkzloop.core.supervisor import run_supervised, is_hung_error
+        
+        start = time.monotonic()
+        silent = run_supervised(
+            [sys.executable, "-c", "import time; print('thinking', flush=True); time.sleep(30)"],
+            timeout=30, idle_timeout=0.5, kill_grace=0.5,
+        )
+        assert silent.hung and silent.timed_out and not silent.success
+        assert is_hung_error(silent.error)
+        assert silent.stdout.strip() == "thinking"
+        assert time.monotonic() - start < 5
+        
+        chatty = run_supervised(
+            [sys.executable, "-c", "import time\nfor _ in range(6):\n    print('.', flush=True); time.sleep(0.2)"],
+            timeout=30, idle_timeout=0.5,
+        )
+        assert chatty.success and not chatty.hung
+        assert not is_hung_error(chatty.error)
+    
+    def test_async_awaits_coroutine_executor(self):
+        """A coroutine executor_fn runs on the event loop, not in the pool."""
+        import asyncio
+        from darkzloop.core.dag import DAGExecutor
+        
+        dag = DAGExecutor(max_parallel=4)
+        dag.add_node("a", {})
+        dag.add_node("b", {}, dependencies=["a"])
+        loops = []
+        
+        async def executor_fn(node_id, task_data):
+            loops.append(asyncio.get_running_loop())
+            await asyncio.sleep(0.01)
+            return True, node_id, ""
+        
+        result = asyncio.run(dag.execute_async(executor_fn))
+        assert result.success and result.completed_nodes == ["a", "b"]
+        assert len(loops) == 2 and loops[0] is loops[1]
+
+
+# ============================================================================
+# Runtime Tests
+# ============================================================================
+
+def _write_plan(root: Path, task_ids):
+    """Write a minimal plan with independent tasks."""
+    lines = ["# Plan", ""]
+    for task_id in task_ids:
+        lines.append(f"- [ ] **Task {task_id}**: Do {task_id}")
+    (root / "DARKZLOOP_PLAN.md").write_text("\n".join(lines) + "\n")
+
+
+class TestRuntime:
+    """Test the runtime engine."""
+    
+    def test_concurrent_group_overlaps_agent_calls(self, tmp_path):
+        """Concurrent mode runs a group's agents at the same time."""
+        import threading
+        import time
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig
+        
+        _write_plan(tmp_path, ["1.1", "2.1", "3.1"])
+        config = LoopConfig(
+            spec_path=Path("DARKZLOOP_SPEC.md"),
+            plan_path=Path("DARKZLOOP_PLAN.md"),
+            project_root=tmp_path,
+            enable_parallel=True,
+            concurrent_tasks=True,
+            max_parallel_tasks=3,
+            auto_update_viz=False,
+        )
+        runtime = DarkzloopRuntime(config)
+        
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+        
+        def agent(prompt, task):
+            with lock:
+                in_flight.append(task["id"])
+                peak.append(len(in_flight))
+            time.sleep(0.2)
+            with lock:
+                in_flight.remove(task["id"])
+            return True, "ok", ""
+        
+        runtime.set_agent_executor(agent)
+        results = runtime.run()
+        
+        assert sorted(r.task_id for r in results) == ["1.1", "2.1", "3.1"]
+        assert all(r.success for r in results)
+        assert max(peak) == 3
+        assert runtime.loop.fsm.iteration == 3
+        assert runtime.loop.fsm.is_terminal()
+    
+    def test_shared_tree_gates_wait_for_sibling_agents(self, tmp_path):
+        """Without worktrees, a task's gates never run while a sibling agent is editing."""
+        import sys
+        import time
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig, GateConfig
+        
+        _write_plan(tmp_path, ["1.1", "2.1", "3.1"])
+        # Fails if any agent is still mid-edit
+        gate = f"{sys.executable} -c \"import glob, sys; sys.exit(bool(glob.glob('editing-*')))\""
+        config = LoopConfig(
+            spec_path=Path("DARKZLOOP_SPEC.md"),
+            plan_path=Path("DARKZLOOP_PLAN.md"),
+            project_root=tmp_path,
+            enable_parallel=True,
+            concurrent_tasks=True,
+            max_parallel_tasks=3,
+            auto_update_viz=False,
+            cache_gates=False,
+            gates=[GateConfig("idle", gate, 1)],
+        )
+        runtime = DarkzloopRuntime(config)
+        
+        def agent(prompt, task):
+            marker = tmp_path / f"editing-{task['id']}"
+            marker.write_text("half-written\n")
+            time.sleep({"1.1": 0.05, "2.1": 0.3, "3.1": 0.6}[task["id"]])
+            marker.unlink()
+            return True, "ok", ""
+        
+        runtime.set_agent_executor(agent)
+        results = runtime.run()
+        
+        assert sorted(r.task_id for r in results) == ["1.1", "2.1", "3.1"]
+        assert all(r.success for r in results), [r.error for r in results]
+        assert all(r.gate_usage["idle"]["duration_ms"] >= 0 for r in results)
+    
+    def test_task_worker_commits_only_its_existing_claims(self, tmp_path):
+        """A worker stages the claimed files it can, and never sweeps up the whole tree."""
+        import subprocess
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig
+        from darkzloop.core.schemas import TaskDefinition
+        
+        _git_repo(tmp_path)
+        _write_plan(tmp_path, ["1.1"])
+        subprocess.run(["git", "add", "-A"], cwd=tmp_path, check=True)
+        subprocess.run(["git", "commit", "-qm", "plan"], cwd=tmp_path, check=True)
+        config = LoopConfig(
+            spec_path=Path("DARKZLOOP_SPEC.md"),
+            plan_path=Path("DARKZLOOP_PLAN.md"),
+            project_root=tmp_path,
+            auto_update_viz=False,
+        )
+        worker = DarkzloopRuntime(config)._spawn_task_worker()
+        
+        (tmp_path / "a.txt").write_text("edited\n")
+        (tmp_path / "sibling.txt").write_text("half-written\n")
+        task = TaskDefinition("1.1", "Edit a", ["a.txt"], ["never_created.txt"], [], [], "")
+        assert worker._commit_changes(task) is not None
+        
+        committed = subprocess.run(
+            ["git", "show", "--name-only", "--format=", "HEAD"],
+            cwd=tmp_path, capture_output=True, text=True,
+        ).stdout.split()
+        assert committed == ["a.txt"]
+        
+        # Claiming nothing commits nothing, rather than everything
+        assert worker._commit_changes(TaskDefinition("2.1", "Check", [], [], [], [], "")) is None
+        status = subprocess.run(["git", "status", "--porcelain"], cwd=tmp_path, capture_output=True, text=True)
+        assert "?? sibling.txt" in status.stdout
+    
+    def test_concurrent_group_respects_loop_limits(self, tmp_path):
+        """max_iterations and the failure breaker stop a group mid-way."""
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig
+        
+        def run(agent, **limits):
+            _write_plan(tmp_path, ["1.1", "2.1", "3.1", "4.1", "5.1"])
+            config = LoopConfig(
+                spec_path=Path("DARKZLOOP_SPEC.md"),
+                plan_path=Path("DARKZLOOP_PLAN.md"),
+                project_root=tmp_path,
+                enable_parallel=True,
+                concurrent_tasks=True,
+                auto_update_viz=False,
+                **limits,
+            )
+            runtime = DarkzloopRuntime(config)
+            runtime.set_agent_executor(agent)
+            return runtime, runtime.run()
+        
+        runtime, results = run(lambda prompt, task: (True, "ok", ""), max_iterations=2, max_parallel_tasks=3)
+        assert len(results) == 2 and runtime.loop.fsm.iteration == 2
+        
+        runtime, results = run(lambda prompt, task: (False, "", "boom"), max_consecutive_failures=2, max_parallel_tasks=1)
+        assert len(results) == 2 and not any(r.success for r in results)
+    
+    def test_prompt_prefix_is_stable_across_iterations(self, tmp_path):
+        """Only the suffix of the agent prompt changes between tasks."""
+        from darkzloop.core.executors import ExecutorConfig, ExecutorType
+        from darkzloop.core.executors.mock import MockExecutor
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig
+        
+        _write_plan(tmp_path, ["1.1", "2.1"])
+        config = LoopConfig(
+            spec_path=Path("DARKZLOOP_SPEC.md"),
+            plan_path=Path("DARKZLOOP_PLAN.md"),
+            project_root=tmp_path,
+            auto_update_viz=False,
+        )
+        executor = MockExecutor(ExecutorConfig(type=ExecutorType.MOCK))
+        prefixes = []
+        
+        def agent(prompt, task):
+            prefixes.append(task["prompt_prefix"])
+            assert prompt.startswith(task["prompt_prefix"])
+            return executor.agent_call(prompt, task)
+        
+        runtime = DarkzloopRuntime(config)
+        runtime.context.initialize("Build the thing", "## Spec")
+        runtime.set_agent_executor(agent)
+        results = runtime.run()
+        
+        assert all(r.success for r in results)
+        assert len(prefixes) == 2 and prefixes[0] == prefixes[1]
+        assert "=== GOAL ===" in prefixes[0]
+        suffixes = executor.get_captured_prompts()
+        assert "1.1" in suffixes[0] and "2.1" in suffixes[1]
+        assert not any("=== GOAL ===" in s for s in suffixes)
+    
+    def test_prompt_templates_render_stable_prefix(self, tmp_path):
+        """system.j2 and task.j2 are found and split the prompt; only the suffix varies."""
+        pytest.importorskip("jinja2")
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig, PROMPT_DIRS
+        from darkzloop.core.schemas import TaskDefinition
+        
+        assert any((d / "system.j2").exists() and (d / "task.j2").exists() for d in PROMPT_DIRS)
+        config = LoopConfig(
+            spec_path=Path("DARKZLOOP_SPEC.md"),
+            plan_path=Path("DARKZLOOP_PLAN.md"),
+            project_root=tmp_path,
+            auto_update_viz=False,
+        )
+        runtime = DarkzloopRuntime(config)
+        
+        def task(task_id, path):
+            return TaskDefinition(task_id, f"Change {path}", [path], [], [], [], "Tests pass")
+        
+        first = runtime.render_prompt_parts(task("1.1", "src/auth.py"))
+        runtime.loop.fsm.task_retries["2.1"] = 1
+        runtime.hints.append("Re-read src/db.py")
+        second = runtime.render_prompt_parts(task("2.1", "src/db.py"))
+        
+        # The prefix comes from system.j2, not the inline fallback
+        assert "CORE PROTOCOLS" in first.prefix
+        assert first.prefix == second.prefix
+        assert "CIRCUIT BREAKER" in first.suffix
+        assert "1.1" in first.suffix and "2.1" in second.suffix
+        assert "Re-read src/db.py" in second.suffix and "Re-read" not in second.prefix
+        assert first.suffix != second.suffix
+    
+    def test_resume_skips_journaled_tasks(self, tmp_path):
+        """A resumed run only schedules tasks the journal has not completed."""
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig
+        
+        _git_repo(tmp_path)
+        _write_plan(tmp_path, ["1.1", "2.1", "3.1"])
+        config = LoopConfig(
+            spec_path=Path("DARKZLOOP_SPEC.md"),
+            plan_path=Path("DARKZLOOP_PLAN.md"),
+            project_root=tmp_path,
+            auto_update_viz=False,
+        )
+        calls = []
+        
+        def agent(prompt, task):
+            calls.append(task["id"])
+            (tmp_path / f"{task['id']}.txt").write_text("done\n")
+            return True, "ok", ""
+        
+        def crashing_agent(prompt, task):
+            if task["id"] == "2.1":
+                calls.append(task["id"])
+                raise KeyboardInterrupt  # runner preempted mid-task
+            return agent(prompt, task)
+        
+        runtime = DarkzloopRuntime(config)
+        runtime.set_agent_executor(crashing_agent)
+        with pytest.raises(KeyboardInterrupt):
+            runtime.run()
+        
+        # A torn write from the crash must not hide later entries
+        with open(runtime.journal.path, "a") as f:
+            f.write('{"task": "2.1", "sta')
+        
+        calls.clear()
+        resumed = DarkzloopRuntime(config)
+        resumed.set_agent_executor(agent)
+        results = resumed.run(resume=True)
+        
+        assert calls == ["2.1", "3.1"]
+        assert all(r.success and r.commit_hash for r in results)
+        assert set(resumed.journal.completed_tasks()) == {"1.1", "2.1", "3.1"}
+        
+        # A fresh run starts the journal over
+        calls.clear()
+        fresh = DarkzloopRuntime(config)
+        fresh.set_agent_executor(agent)
+        fresh.run()
+        assert calls == ["1.1", "2.1", "3.1"]
+    
+    def test_resume_reruns_uncommitted_tasks(self, tmp_path):
+        """A task that succeeded without a commit is not skipped on resume."""
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig
+        
+        _write_plan(tmp_path, ["1.1", "2.1"])  # not a git repo: nothing can be committed
+        config = LoopConfig(
+            spec_path=Path("DARKZLOOP_SPEC.md"),
+            plan_path=Path("DARKZLOOP_PLAN.md"),
+            project_root=tmp_path,
+            auto_update_viz=False,
+        )
+        runtime = DarkzloopRuntime(config)
+        runtime.set_agent_executor(lambda prompt, task: (True, "ok", ""))
+        assert all(r.success and r.commit_hash is None for r in runtime.run())
+        assert runtime.journal.completed_tasks() == {}
+        assert [e["status"] for e in runtime.journal.entries() if "task" in e][-1] == "uncommitted"
+        
+        calls = []
+        resumed = DarkzloopRuntime(config)
+        resumed.set_agent_executor(lambda prompt, task: calls.append(task["id"]) or (True, "ok", ""))
+        resumed.run(resume=True)
+        assert calls == ["1.1", "2.1"]
+    
+    def test_gate_timeouts_follow_latency(self, tmp_path):
+        """Timeouts come from observed p99 x margin, within floor and ceiling."""
+        from darkzloop.core.latency import AdaptiveTimeouts, GATE_TIMEOUT_LIMITS
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig, GateConfig
+        
+        timeouts = AdaptiveTimeouts(tmp_path)
+        assert timeouts.timeout("gate:test", 300, 30, 3600) == 300  # no history yet
+        
+        for ms in [200_000] * 98 + [240_000, 250_000]:
+            timeouts.record("gate:test", ms)
+        p99 = timeouts.percentile("gate:test")
+        assert 240_000 <= p99 <= 250_000 * 1.2
+        assert timeouts.timeout("gate:test", 300, 30, 3600) == p99 / 1000 * 1.5
+        assert timeouts.timeout("gate:test", 300, 30, 120) == 300  # ceiling never below default
+        
+        # A gate that keeps hitting its timeout gets more time, up to the ceiling
+        for _ in range(300):
+            timeouts.record("gate:slow", timeouts.timeout("gate:slow", 300, 30, 3600) * 1000)
+        assert timeouts.timeout("gate:slow", 300, 30, 3600) == 3600
+        
+        # Persisted and shared
+        assert AdaptiveTimeouts(tmp_path).percentile("gate:test") == p99
+        
+        config = LoopConfig(
+            spec_path=Path("DARKZLOOP_SPEC.md"),
+            plan_path=Path("DARKZLOOP_PLAN.md"),
+            project_root=tmp_path,
+            gates=[GateConfig("lint", "true", 1)],
+            cache_gates=False,
+        )
+        runtime = DarkzloopRuntime(config)
+        assert runtime._gate_timeout("lint", 300) == 300
+        for _ in range(5):
+            assert runtime._run_tiered_gates()[0]
+        assert runtime._gate_timeout("lint", 300) == GATE_TIMEOUT_LIMITS[0]  # fast gate fails fast
+    
+    def test_gate_cache_skips_identical_tree(self, tmp_path):
+        """A gate that passed on identical bytes is not rerun."""
+        import subprocess
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig, GateConfig
+        
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        _git_repo(repo)
+        runs = tmp_path / "runs.log"
+        config = LoopConfig(
+            spec_path=Path("DARKZLOOP_SPEC.md"),
+            plan_path=Path("DARKZLOOP_PLAN.md"),
+            project_root=repo,
+            gates=[GateConfig("test", f"echo run >> {runs}", 1)],
+        )
+        runtime = DarkzloopRuntime(config)
+        
+        (repo / "a.txt").write_text("changed\n")
+        assert runtime._run_tiered_gates()[1] == ["test"]
+        assert runtime._run_tiered_gates()[1] == ["test (cached)"]
+        assert runs.read_text().count("run") == 1
+        
+        (repo / "new.txt").write_text("untracked\n")
+        assert runtime._run_tiered_gates()[1] == ["test"]
+        assert runs.read_text().count("run") == 2
+        
+        # The real index is left alone
+        status = subprocess.run(["git", "status", "--porcelain", "--", "*.txt"], cwd=repo, capture_output=True)
+        assert status.stdout.decode().splitlines() == [" M a.txt", "?? new.txt"]
+    
+    def test_concurrent_gates_fail_fast(self, tmp_path):
+        """A failing Tier 1 gate kills its running siblings and skips Tier 2."""
+        import time
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig, GateConfig
+        
+        marker = tmp_path / "slow_finished"
+        config = LoopConfig(
+            spec_path=Path("DARKZLOOP_SPEC.md"),
+            plan_path=Path("DARKZLOOP_PLAN.md"),
+            project_root=tmp_path,
+            cache_gates=False,
+            concurrent_gates=True,
+            gates=[
+                GateConfig("lint", "sleep 0.3", 1),
+                GateConfig("slow", f"sleep 5 && touch {marker}", 1),
+                GateConfig("types", "sleep 0.1 && exit 1", 1),
+                GateConfig("tests", "true", 2),
+            ],
+        )
+        runtime = DarkzloopRuntime(config)
+        
+        start = time.time()
+        all_passed, passed, failed, error = runtime._run_tiered_gates()
+        
+        assert time.time() - start < 3
+        assert not all_passed
+        assert failed == ["types"]
+        assert passed == []
+        assert error == "Gates failed: types"
+        time.sleep(0.2)
+        assert not marker.exists()
+        
+        # Passing gates of one tier overlap
+        config.gates = [GateConfig(f"g{i}", "sleep 0.5", 1) for i in range(3)]
+        start = time.time()
+        assert runtime._run_tiered_gates()[1] == ["g0", "g1", "g2"]
+        assert time.time() - start < 1.2
+
+
+# ============================================================================
+# Worktree Tests
+# ============================================================================
+
+def _git_repo(root: Path) -> Path:
+    """Create a git repo with one committed file."""
+    import subprocess
+    
+    subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+    # The runtime commits too, so the identity must be the repo's own
+    subprocess.run(["git", "config", "user.email", "t@t"], cwd=root, check=True)
+    subprocess.run(["git", "config", "user.name", "t"], cwd=root, check=True)
+    (root / "a.txt").write_text("base\n")
+    subprocess.run(["git", "add", "."], cwd=root, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=root, check=True)
+    return root
+
+
+class TestWorktree:
+    """Test worktree isolation."""
+    
+    def test_merge_back_detects_conflict(self, tmp_path):
+        """The second writer of the same lines gets a conflict, not a clobber."""
+        from darkzloop.core.worktree import WorktreePool
+        
+        repo = _git_repo(tmp_path)
+        pool = WorktreePool(repo, max_size=2)
+        
+        first, second = pool.acquire(), pool.acquire()
+        (first / "a.txt").write_text("first\n")
+        (second / "a.txt").write_text("second\n")
+        (second / "b.txt").write_text("new\n")
+        
+        assert pool.merge_back(first).success
+        result = pool.merge_back(second)
+        
+        assert not result.success
+        assert result.conflicts == ["a.txt"]
+        assert (repo / "a.txt").read_text() == "first\n"
+        assert not (repo / "b.txt").exists()
+        
+        pool.release(first)
+        pool.release(second)
+        pool.cleanup()
+    
+    def test_worktrees_are_reused_and_reset(self, tmp_path):
+        """A released worktree comes back clean and at the main HEAD."""
+        from darkzloop.core.worktree import WorktreePool
+        
+        repo = _git_repo(tmp_path)
+        pool = WorktreePool(repo, max_size=1)
+        
+        with pool.checkout() as path:
+            (path / "scratch.txt").write_text("leftover")
+        with pool.checkout() as again:
+            assert again == path
+            assert not (again / "scratch.txt").exists()
+        
+        pool.cleanup()
+
+# ============================================================================
+# Impact Analysis Tests
+# ============================================================================
+
+def _write_files(root: Path, files: dict):
+    """Write {relative path: content} under root."""
+    for rel, content in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+class TestImpact:
+    """Test change-impact test selection."""
+    
+    def test_pytest_runs_tests_that_import_the_change(self, tmp_path):
+        """Only test files that (transitively) import a changed module run."""
+        from darkzloop.core.impact import ImpactAnalyzer
+        
+        _write_files(tmp_path, {
+            "app/__init__.py": "",
+            "app/models.py": "X = 1\n",
+            "app/views.py": "from .models import X\n",
+            "app/other.py": "Y = 2\n",
+            "tests/test_models.py": "from app.models import X\n",
+            "tests/test_views.py": "import app.views\n",
+            "tests/test_other.py": "from app import other\n",
+            "tests/conftest.py": "",
+        })
+        analyzer = ImpactAnalyzer(tmp_path, full_run_every=2)
+        
+        selection = analyzer.select("pytest -x", ["app/models.py", "README.md"])
+        assert selection.narrowed
+        assert selection.command == "pytest -x tests/test_models.py tests/test_views.py"
+        
+        assert analyzer.select("pytest -x", ["app/other.py"]).targets == ["tests/test_other.py"]
+        
+        # Every Nth run is a full run
+        assert analyzer.select("pytest -x", ["app/other.py"]).command == "pytest -x"
+        
+        # Changes the import map can't see run everything
+        assert not analyzer.select("pytest -x", ["tests/conftest.py"]).narrowed
+        assert not analyzer.select("pytest -x", ["app/data.json"]).narrowed
+        assert not analyzer.select("pytest -x tests/", ["app/other.py"]).narrowed
+    
+    def test_cargo_workspace_selects_dependent_crates(self, tmp_path):
+        """cargo test is narrowed to the changed crate and its dependents."""
+        from darkzloop.core.impact import ImpactAnalyzer
+        
+        _write_files(tmp_path, {
+            "Cargo.toml": '[workspace]\nmembers = ["core", "api", "cli"]\n',
+            "core/Cargo.toml": '[package]\nname = "core"\n',
+            "api/Cargo.toml": '[package]\nname = "api"\n\n[dependencies]\ncore = { path = "../core" }\n',
+            "cli/Cargo.toml": '[package]\nname = "cli"\n',
+        })
+        analyzer = ImpactAnalyzer(tmp_path)
+        
+        selection = analyzer.select("cargo test", ["core/src/lib.rs"])
+        assert selection.command == "cargo test -p api -p core"
+        assert analyzer.select("cargo test", ["cli/src/main.rs"]).targets == ["cli"]
+        assert not analyzer.select("cargo test", ["core/Cargo.toml"]).narrowed
+    
+    def test_changed_scope_lints_only_changed_files(self, tmp_path):
+        """scope=changed gates get the changed files, with periodic full runs."""
+        from darkzloop.core.impact import scope_to_files
+        from darkzloop.core.runtime import DarkzloopRuntime, LoopConfig, GateConfig
+        
+        repo = tmp_path / "repo"
+        repo.mkdir()
+        _git_repo(repo)
+        log = tmp_path / "lint.log"
+        config = LoopConfig(
+            spec_path=Path("DARKZLOOP_SPEC.md"),
+            plan_path=Path("DARKZLOOP_PLAN.md"),
+            project_root=repo,
+            cache_gates=False,
+            gates=[GateConfig("lint", f"echo {{files}} >> {log}", 1, scope="changed", full_run_every=2)],
+        )
+        runtime = DarkzloopRuntime(config)
+        (repo / "a.txt").write_text("changed\n")
+        (repo / "b.py").write_text("x = 1\n")
+        
+        for _ in range(3):
+            assert runtime._run_tiered_gates()[0]
+        assert log.read_text().splitlines() == ["a.txt b.py", "a.txt b.py", "."]
+        
+        assert scope_to_files("ruff check .", ["b.py", "a.txt", "gone.py"], repo) == "ruff check b.py"
+        assert scope_to_files("ruff check .", ["a.txt"], repo) is None
+    
+    def test_package_lint_script_is_scoped_to_its_linter(self, tmp_path):
+        """npm run lint is resolved through package.json and narrowed to JS/TS files."""
+        import json
+        from darkzloop.core.impact import scope_to_files
+        
+        _write_files(tmp_path, {
+            "package.json": json.dumps({"scripts": {
+                "lint": "eslint . --max-warnings 0",
+                "lint:all": "eslint . && tsc --noEmit",
+                "format": "prettier --check .",
+            }}),
+            "src/app.ts": "export {};\n",
+            "src/util.js": "module.exports = {};\n",
+            "README.md": "# Readme\n",
+            "tools/gen.py": "x = 1\n",
+        })
+        changed = ["README.md", "src/app.ts", "src/util.js", "tools/gen.py"]
+        
+        assert (scope_to_files("npm run lint", changed, tmp_path)
+                == "npm exec -- eslint src/app.ts src/util.js --max-warnings 0")
+        assert (scope_to_files("yarn lint -- --fix", changed, tmp_path)
+                == "yarn run eslint src/app.ts src/util.js --max-warnings 0 --fix")
+        assert scope_to_files("pnpm run format", ["README.md"], tmp_path) == "pnpm exec prettier --check README.md"
+        # Nothing the linter handles changed
+        assert scope_to_files("npm run lint", ["README.md", "tools/gen.py"], tmp_path) is None
+        # Compound or unknown scripts run in full
+        assert scope_to_files("npm run lint:all", changed, tmp_path) == "npm run lint:all"
+        assert scope_to_files("npm run missing", changed, tmp_path) == "npm run missing"
+
+
 # ============================================================================
 # Integration Tests
 # ============================================================================